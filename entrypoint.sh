@@ -13,26 +13,75 @@ fi
 
 cd /github/action/
 
-python3 src/main.py \
-    --github-api-token ${GITHUB_ACCESS_TOKEN} \
-    --go-getter-tool ${GO_GETTER_TOOL} \
-    --infra-repo-name ${GITHUB_REPOSITORY} \
-    --infra-repo-dir ${INFRA_REPO_DIR} \
-    --infra-terraform-dirs "${INFRA_TERRAFORM_DIRS}" \
-    --vendoring-enabled ${VENDORING_ENABLED} \
-    --max-number-of-prs ${MAX_NUMBER_OF_PRS} \
-    --include "${INCLUDE}" \
-    --exclude "${EXCLUDE}" \
-    --log-level ${LOG_LEVEL} \
-    --dry-run ${DRY_RUN} \
-    --pr-labels "${PR_LABELS}" \
-    --pr-title-template "${PR_TITLE_TEMPLATE}" \
-    --pr-body-template "${PR_BODY_TEMPLATE}" \
-    --affected-components-file 'affected-components.json'
-
-cat affected-components.json
-affected=$(jq -c '.' < affected-components.json)
+AFFECTED_COMPONENTS_FILE="${AFFECTED_COMPONENTS_FILE:-affected-components.json}"
+AFFECTED_STACKS_FILE="${AFFECTED_STACKS_FILE:-affected-stacks.json}"
+
+if [ -n "$MERGE_AFFECTED_COMPONENTS_FILES" ]; then
+    # Merge outputs of sharded runs
+    python3 src/main.py merge \
+        --log-level ${LOG_LEVEL} \
+        --affected-components-files "${MERGE_AFFECTED_COMPONENTS_FILES}" \
+        --journal-files "${MERGE_JOURNAL_FILES}" \
+        --journal-file "${JOURNAL_FILE}" \
+        --affected-stacks-files "${MERGE_AFFECTED_STACKS_FILES}" \
+        --affected-stacks-file "${AFFECTED_STACKS_FILE}" \
+        --affected-components-file "${AFFECTED_COMPONENTS_FILE}"
+else
+    python3 src/main.py \
+        --github-api-token ${GITHUB_ACCESS_TOKEN} \
+        --go-getter-tool ${GO_GETTER_TOOL} \
+        --infra-repo-name ${GITHUB_REPOSITORY} \
+        --infra-repo-dir ${INFRA_REPO_DIR} \
+        --infra-terraform-dirs "${INFRA_TERRAFORM_DIRS}" \
+        --vendoring-enabled ${VENDORING_ENABLED} \
+        --max-number-of-prs ${MAX_NUMBER_OF_PRS} \
+        --include "${INCLUDE}" \
+        --exclude "${EXCLUDE}" \
+        --log-level ${LOG_LEVEL} \
+        --dry-run ${DRY_RUN} \
+        --pr-labels "${PR_LABELS}" \
+        --pr-title-template "${PR_TITLE_TEMPLATE}" \
+        --pr-body-template "${PR_BODY_TEMPLATE}" \
+        --vendoring-batch-size ${VENDORING_BATCH_SIZE} \
+        --tool-timeout ${TOOL_TIMEOUT} \
+        --tool-concurrency ${TOOL_CONCURRENCY} \
+        --fetch-mode ${FETCH_MODE} \
+        --journal-file "${JOURNAL_FILE}" \
+        --resume ${RESUME} \
+        --shard-index ${SHARD_INDEX} \
+        --shard-count ${SHARD_COUNT} \
+        --schedule ${SCHEDULE} \
+        --priority "${PRIORITY}" \
+        --plan ${PLAN} \
+        --plan-file "${PLAN_FILE}" \
+        --plan-format ${PLAN_FORMAT} \
+        --workspace-dir "${WORKSPACE_DIR}" \
+        --workspace-quota ${WORKSPACE_QUOTA} \
+        --repos-file "${REPOS_FILE}" \
+        --check-remote-branches ${CHECK_REMOTE_BRANCHES} \
+        --outcome-cache-file "${OUTCOME_CACHE_FILE}" \
+        --revalidate ${REVALIDATE} \
+        --publish-mode ${PUBLISH_MODE} \
+        --pr-creation-mode ${PR_CREATION_MODE} \
+        --group-by ${GROUP_BY} \
+        --group-patterns "${GROUP_PATTERNS}" \
+        --tag-lookup "${TAG_LOOKUP}" \
+        --affected-stacks-file "${AFFECTED_STACKS_FILE}" \
+        --stack-index-cache-file "${STACK_INDEX_CACHE_FILE}" \
+        --report-file "${REPORT_FILE}" \
+        --affected-components-file "${AFFECTED_COMPONENTS_FILE}"
+fi
+
+cat "${AFFECTED_COMPONENTS_FILE}"
+affected=$(jq -c '.' < "${AFFECTED_COMPONENTS_FILE}")
 echo "affected=$affected" >> $GITHUB_OUTPUT
 
-[[ "$affected" == "[]" ]] && has_affected_stacks=true || has_affected_stacks=false
+# merge of shards without stacks files leaves no stacks file behind
+[[ -f "${AFFECTED_STACKS_FILE}" ]] || echo "[]" > "${AFFECTED_STACKS_FILE}"
+
+cat "${AFFECTED_STACKS_FILE}"
+affected_stacks=$(jq -c '.' < "${AFFECTED_STACKS_FILE}")
+echo "affected-stacks=$affected_stacks" >> $GITHUB_OUTPUT
+
+[[ "$affected_stacks" != "[]" ]] && has_affected_stacks=true || has_affected_stacks=false
 echo "has-affected-stacks=$has_affected_stacks" >> $GITHUB_OUTPUT
@@ -1,38 +1,53 @@
 import logging
 import re
 import os
+from functools import lru_cache
 from typing import Tuple
-import yaml
-import semver
 
+import component_yaml
 from utils import io
 
 VERSION_PATTERN = r"(?<=source:)(?<!mixins:)(.*?)(version:\s*['\"]?v?\d+\.\d+\.\d+['\"]?)"
 URI_PATTERN = r"(?<=source:)(?<!mixins:)(.*?)(uri:\s*[^\n]*)"
+# go-getter forced getter and scheme, e.g. 'git::https://' or 'file://'
+URI_SCHEME_PATTERN = r"^(?:[\w+.-]+::)?[a-zA-Z][\w+.-]*://"
 COMPONENT_YAML = 'component.yaml'
 README_EXTENTION = '.md'
 MONOREPO_MAXIMUM_VERSION = '1.532.0'
 
 
+@lru_cache(maxsize=None)
+def load_migration_config() -> dict:
+    config_path = os.path.join(os.path.dirname(__file__), "assets", "config.yaml")
+    return component_yaml.load(io.read_file_to_string(config_path))
+
+
 class AtmosComponent:
     def __init__(self, infra_repo_dir: str, infra_terraform_dir: str, component_file: str):
         self.__infra_repo_dir = infra_repo_dir
         self.__infra_terraform_dir = infra_terraform_dir
         self.__component_file = component_file
-        self.__content = ''
-        self.__yaml_content = {}
+        self.__editor = component_yaml.ComponentYamlEditor('')
         self.__initialize()
 
     @property
     def version(self):
-        version = self.__yaml_content.get('spec', {}).get('source', {}).get('version')
+        version = self.__editor.source.get('version')
         return version.strip().lstrip("v") if version else None
 
     @property
     def raw_version(self):
-        version = self.__yaml_content.get('spec', {}).get('source', {}).get('version')
+        version = self.__editor.source.get('version')
         return version.strip() if version else None
     
+    @property
+    def source(self) -> dict:
+        return dict(self.__editor.source)
+
+    @property
+    def has_mixins(self) -> bool:
+        return self.__editor.has_mixins
+
     @property
     def uri_repo(self) -> str:
         return self.__uri_repo
@@ -73,7 +88,7 @@ class AtmosComponent:
         attributes = []
 
         for key, value in vars(self).items():
-            if not key.endswith(('__content', '__yaml_content')):
+            if not key.endswith(('__editor',)):
                 attributes.append(f"- {key}={value!r}")
 
         return "\n".join(attributes)
@@ -81,12 +96,13 @@ class AtmosComponent:
     def __initialize(self):
         self.__relative_path: str = os.path.relpath(self.__component_file, self.__infra_repo_dir)
         self.__name: str = self.__fetch_name()
-        self.__content: str = self.__load_file()
-        self.__yaml_content = self.__load_yaml_content()
+        self.__editor = component_yaml.ComponentYamlEditor(self.__load_file())
         (self.__uri_repo, self.__uri_path) = self.__parse_uri()
         self.__migrate_new_org()
 
     def __migrate_new_org(self):
+        import semver  # pylint: disable=import-outside-toplevel
+
         if self.has_version() and semver.compare(self.version, MONOREPO_MAXIMUM_VERSION) != -1:
             self.migrate()
 
@@ -95,17 +111,15 @@ class AtmosComponent:
                 self.has_valid_uri() and
                 self.__uri_repo == 'github.com/cloudposse/terraform-aws-components.git'):
             component_name = '/'.join(self.__uri_path.split('/')[1:])
-            config_path = os.path.join(os.path.dirname(__file__), "assets", "config.yaml")
-            migration_config = yaml.load(io.read_file_to_string(config_path), Loader=yaml.FullLoader)
+            migration_config = load_migration_config()
             prefix = migration_config.get('repo_settings').get('prefix')
             new_component_name = migration_config.get('component_map').get(component_name)
             if new_component_name:
                 destination = new_component_name.replace('/', '-')
                 self.__uri_repo = f"github.com/cloudposse-terraform-components/{prefix}-{destination}.git"
                 self.__uri_path = "src"
-                template = f"\g<1>uri: {self.__uri_repo}//{self.__uri_path}?ref={{{{ .Version }}}}"
-                self.__content = re.sub(URI_PATTERN, template, self.__content, flags=re.DOTALL)
-                self.__yaml_content = self.__load_yaml_content()
+                uri = f"{self.__uri_repo}//{self.__uri_path}?ref={{{{ .Version }}}}"
+                self.__set_source_value('uri', uri, URI_PATTERN, f"\g<1>uri: {uri}")
 
     def __fetch_name(self) -> str:
         return os.path.dirname(os.path.relpath(self.__component_file, os.path.join(self.__infra_repo_dir, self.__infra_terraform_dir)))
@@ -114,25 +128,27 @@ class AtmosComponent:
         return io.read_file_to_string(self.__component_file)
 
     def __parse_uri(self) -> Tuple[str, str]:
-        uri = self.__yaml_content.get('spec', {}).get('source', {}).get('uri')
+        uri = self.__editor.source.get('uri')
 
         if not uri:
             return None, None  # type: ignore
 
-        uri_parts = uri.split('//')
+        # '//' of the scheme (e.g. 'file://' or 'git::https://') is not a subdirectory separator
+        scheme_match = re.match(URI_SCHEME_PATTERN, uri)
+        scheme = scheme_match.group(0) if scheme_match else ''
+        uri_parts = uri[len(scheme):].split('//')
 
         if len(uri_parts) < 2:
-            return uri_parts[0], None  # type: ignore
+            return scheme + uri_parts[0], None  # type: ignore
 
-        uri_repo = uri_parts[0]
+        uri_repo = scheme + uri_parts[0]
         uri_path = uri_parts[1].split('?')[0]
 
         return uri_repo, uri_path
 
-    def __load_yaml_content(self):
-        return yaml.load(self.__content, Loader=yaml.FullLoader)
-
     def has_version(self) -> bool:
+        import semver  # pylint: disable=import-outside-toplevel
+
         try:
             return bool(semver.parse(self.version))
         except Exception:
@@ -143,10 +159,17 @@ class AtmosComponent:
         return bool(self.uri_repo and self.uri_path)
 
     def update_version(self, new_version: str):
-        self.__content = re.sub(VERSION_PATTERN, f"\g<1>version: {new_version}", self.__content, flags=re.DOTALL)
-        self.__yaml_content = self.__load_yaml_content()
+        self.__set_source_value('version', new_version, VERSION_PATTERN, f"\g<1>version: {new_version}")
+
+    def __set_source_value(self, key: str, value: str, fallback_pattern: str, fallback_template: str):
+        if self.__editor.set_source_value(key, value):
+            return
+
+        # value is not a single line scalar, fall back to rewriting the content with regex and parsing it again
+        content = re.sub(fallback_pattern, fallback_template, self.__editor.content, flags=re.DOTALL)
+        self.__editor = component_yaml.ComponentYamlEditor(content)
 
     def persist(self, output_file=None):
         output_file = output_file if output_file else self.__component_file
 
-        io.save_string_to_file(output_file, self.__content)
+        io.save_string_to_file(output_file, self.__editor.content)
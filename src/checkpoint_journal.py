@@ -0,0 +1,74 @@
+import os
+import json
+import logging
+import threading
+from typing import Dict, List, Optional
+
+
+class CheckpointJournal:
+    """Append-only journal of component update outcomes, one JSON record per line.
+
+    Every record is flushed to disk as soon as it's appended, so the journal survives job timeouts and crashes.
+    When the same key is recorded several times, the last record wins.
+    """
+
+    def __init__(self, journal_file: str, resume: bool = False):
+        self.__journal_file = journal_file
+        self.__records: Dict[str, dict] = {}
+        self.__lock = threading.Lock()
+
+        if resume:
+            self.__load()
+        elif os.path.exists(journal_file):
+            os.remove(journal_file)
+
+    @property
+    def journal_file(self) -> str:
+        return self.__journal_file
+
+    @property
+    def records(self) -> List[dict]:
+        with self.__lock:
+            return list(self.__records.values())
+
+    def reset(self):
+        """Forgets all records and starts the journal from scratch"""
+        with self.__lock:
+            self.__records.clear()
+
+            if os.path.exists(self.__journal_file):
+                os.remove(self.__journal_file)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self.__lock:
+            return self.__records.get(key)
+
+    def append(self, key: str, record: dict):
+        record = dict(record, key=key)
+
+        with self.__lock:
+            with open(self.__journal_file, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+
+            self.__records[key] = record
+
+    def __load(self):
+        if not os.path.exists(self.__journal_file):
+            logging.info(f"Journal '{self.__journal_file}' doesn't exist. Starting from scratch")
+            return
+
+        with open(self.__journal_file, "r", encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+
+                try:
+                    record = json.loads(line)
+                    self.__records[record['key']] = record
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    # last line might be incomplete if previous run was killed while writing it
+                    logging.warning(f"Skipping malformed journal record at {self.__journal_file}:{line_number}")
+
+        logging.info(f"Loaded {len(self.__records)} records from journal '{self.__journal_file}'")
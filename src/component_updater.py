@@ -1,18 +1,33 @@
 import copy
 import os
 import sys
+import shutil
 import logging
 import fnmatch
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 from enum import Enum
 from tools_manager import ToolsManager, ToolExecutionError
 from utils import io
 from atmos_component import AtmosComponent, COMPONENT_YAML, README_EXTENTION
-from github_provider import GitHubProvider, PullRequestCreationResponse
-from config import Config
+from github_provider import GitHubProvider, PullRequestCreationResponse, normalize_branch_component_name
+from config import Config, PUBLISH_MODE_GIT, PR_CREATION_MODE_GRAPHQL
+from checkpoint_journal import CheckpointJournal
+from sharding import get_shard, get_shard_budget
+from scheduler import ComponentScheduler, VersionGap
+from plan_report import ComponentPlan
+from workspace_manager import WorkspaceManager
+from upstream_cache import UpstreamCache
+from vendor_cache import VendorCache
+from tree_snapshot import TreeSnapshot
+from outcome_cache import OutcomeCache
+from git_publisher import GitPublisher
+from update_report import UpdateReportWriter, AffectedComponentsWriter
+from grouping import ComponentGrouper, GROUP_BRANCH_PREFIX, build_group_digest
 
 
 COMMIT_MESSAGE_TEMPLATE = "Updated component '{component_name}' to version '{component_version}'"
+GROUP_COMMIT_MESSAGE_TEMPLATE = "Updated {num_components} components of group '{group_name}'"
 MAX_NUMBER_OF_DIFF_TO_SHOW = 3
 
 
@@ -36,6 +51,29 @@ class ComponentUpdaterResponseState(Enum):
     MAX_PRS_REACHED = 11
     PR_FOR_BRANCH_ALREADY_EXISTS = 12
     COMPONENT_VENDORED_BUT_VENDORING_DISABLED = 13
+    FAILED_TO_PUSH_BRANCH = 14
+
+
+# states that won't change if component is processed again, so resumed runs skip such components
+SETTLED_STATES = [
+    ComponentUpdaterResponseState.UPDATED,
+    ComponentUpdaterResponseState.NO_VERSION_FOUND_IN_SOURCE_YAML,
+    ComponentUpdaterResponseState.NOT_VALID_URI_FOUND_IN_SOURCE_YAML,
+    ComponentUpdaterResponseState.URI_IS_NOT_GIT_REPO,
+    ComponentUpdaterResponseState.ALREADY_UP_TO_DATE,
+    ComponentUpdaterResponseState.REMOTE_BRANCH_FOR_COMPONENT_UPDATER_ALREADY_EXISTS,
+    ComponentUpdaterResponseState.NO_CHANGES_FOUND,
+    ComponentUpdaterResponseState.PR_FOR_BRANCH_ALREADY_EXISTS,
+    ComponentUpdaterResponseState.COMPONENT_VENDORED_BUT_VENDORING_DISABLED,
+]
+
+# states reached after vendoring or branch checks that will repeat until 'component.yaml' or latest upstream tag changes
+CACHEABLE_STATES = [
+    ComponentUpdaterResponseState.REMOTE_BRANCH_FOR_COMPONENT_UPDATER_ALREADY_EXISTS,
+    ComponentUpdaterResponseState.NO_CHANGES_FOUND,
+    ComponentUpdaterResponseState.PR_FOR_BRANCH_ALREADY_EXISTS,
+    ComponentUpdaterResponseState.COMPONENT_VENDORED_BUT_VENDORING_DISABLED,
+]
 
 
 class ComponentUpdaterResponse:
@@ -43,33 +81,190 @@ class ComponentUpdaterResponse:
         self.component = component
         self.state: ComponentUpdaterResponseState = ComponentUpdaterResponseState.UNDEFINED
         self.component_path: str
-        self.branch_name: str
+        self.branch_name: Optional[str] = None
         self.pull_request_creation_response: Optional[PullRequestCreationResponse] = None
 
 
+def build_response_record(response: ComponentUpdaterResponse) -> dict:
+    record = {
+        'component': response.component.name,
+        'state': response.state.name,
+        'version': response.component.version,
+        'branch': response.branch_name,
+        'pull_request': None,
+    }
+
+    pull_request_creation_response = response.pull_request_creation_response
+
+    if pull_request_creation_response and pull_request_creation_response.pull_request:
+        record['pull_request'] = {
+            'number': pull_request_creation_response.pull_request.number,
+            'url': pull_request_creation_response.pull_request.html_url,
+        }
+
+    return record
+
+
+class ComponentUpdateContext:
+    """Component update that is waiting for original and updated components to be vendored"""
+    def __init__(self,
+                 response: ComponentUpdaterResponse,
+                 original_component: AtmosComponent,
+                 updated_component: AtmosComponent,
+                 original_vendored_component: AtmosComponent,
+                 updated_vendored_component: AtmosComponent):
+        self.response = response
+        self.original_component = original_component
+        self.updated_component = updated_component
+        self.original_vendored_component = original_vendored_component
+        self.updated_vendored_component = updated_vendored_component
+
+
+class ComponentUpdateCandidate:
+    """Component with resolved latest tag that is waiting to be scheduled for update"""
+    def __init__(self,
+                 response: ComponentUpdaterResponse,
+                 original_component: AtmosComponent,
+                 migrated_component: AtmosComponent,
+                 latest_tag: str):
+        self.response = response
+        self.original_component = original_component
+        self.migrated_component = migrated_component
+        self.latest_tag = latest_tag
+        self.version_gap = VersionGap(original_component.version, latest_tag)
+
+
+class ComponentUpdateGroup:
+    """Updated components published together in one branch and PR. Changes of all members are gathered in the infra repo copy of the first one"""
+    def __init__(self, name: str):
+        self.name = name
+        self.contexts: List[ComponentUpdateContext] = []
+        self.files_to_update: List[str] = []
+        self.files_to_remove: List[str] = []
+        self.pull_request_creation_response: Optional[PullRequestCreationResponse] = None
+
+    @property
+    def repo_dir(self) -> str:
+        return self.contexts[0].updated_component.infra_repo_dir
+
+    @property
+    def responses(self) -> List[ComponentUpdaterResponse]:
+        return [context.response for context in self.contexts]
+
+    def add(self, context: ComponentUpdateContext, files_to_update: List[str], files_to_remove: List[str]):
+        if self.contexts:
+            for file in files_to_update:
+                target_file = os.path.join(self.repo_dir, file)
+                io.create_dirs(os.path.dirname(target_file))
+                shutil.copy(os.path.join(context.updated_component.infra_repo_dir, file), target_file)
+
+            for file in files_to_remove:
+                target_file = os.path.join(self.repo_dir, file)
+
+                if os.path.isfile(target_file):
+                    os.remove(target_file)
+
+        self.contexts.append(context)
+        self.files_to_update.extend(files_to_update)
+        self.files_to_remove.extend(files_to_remove)
+
+
 class ComponentUpdater:
     def __init__(self,
-                 github_provider: GitHubProvider,
+                 github_provider: Optional[GitHubProvider],
                  tools_manager: ToolsManager,
                  infra_terraform_dirs: List[str],
-                 config: Config):
+                 config: Config,
+                 workspace_manager: Optional[WorkspaceManager] = None,
+                 upstream_cache: Optional[UpstreamCache] = None,
+                 vendor_cache: Optional[VendorCache] = None):
         self.__github_provider = github_provider
+        self.__workspace_manager = workspace_manager or WorkspaceManager(config.workspace_dir, config.workspace_quota * 1024 * 1024)
+        self.__upstream_cache = upstream_cache or UpstreamCache(tools_manager, config, self.__workspace_manager)
+        self.__vendor_cache = vendor_cache or VendorCache(self.__workspace_manager)
         self.__infra_terraform_dirs = infra_terraform_dirs
         self.__config = config
         self.__tools_manager = tools_manager
-        self.__num_pr_created = len(github_provider.get_open_prs_for_component(""))
+        self.__max_number_of_prs = get_shard_budget(config.max_number_of_prs, config.shard_index, config.shard_count)
+        self.__num_pr_created: Optional[int] = None
+        self.__journal = CheckpointJournal(config.journal_file, config.resume) if config.journal_file else None
+        self.__outcome_cache = OutcomeCache(config.outcome_cache_file, config.revalidate) if config.outcome_cache_file else None
+        self.__git_publisher = GitPublisher(tools_manager, config.infra_repo_dir) if config.publish_mode == PUBLISH_MODE_GIT else None
+        # updates waiting for their PRs to be opened in a batch
+        self.__pending_prs: List[ComponentUpdateContext] = []
+        self.__grouper = ComponentGrouper(config.group_by, config.group_patterns)
+        self.__groups: Dict[str, ComponentUpdateGroup] = {}
+        self.__scheduler = ComponentScheduler(config.schedule, config.priority)
+        self.__components: Dict[str, Tuple[Tuple[int, int], AtmosComponent]] = {}
+        self.__report = UpdateReportWriter(config.report_file) if config.report_file else None
+        self.__affected: Optional[AffectedComponentsWriter] = None
 
     def update(self) -> List[ComponentUpdaterResponse]:
-        responses = []
+        """Updates all components. Unlike 'iter_updates', responses are returned in the order components were found"""
+        dir_prefixes = [os.path.join(os.path.normpath(infra_terraform_dir), '') for infra_terraform_dir in self.__infra_terraform_dirs]
+
+        def get_order(response: ComponentUpdaterResponse) -> Tuple[int, str]:
+            relative_path = response.component.relative_path
+            dir_index = next((index for index, prefix in enumerate(dir_prefixes) if relative_path.startswith(prefix)), len(dir_prefixes))
+            return dir_index, relative_path
+
+        return sorted(self.iter_updates(), key=get_order)
+
+    def refresh(self):
+        """Prepares the next run of a long-running process. Outcomes journaled by previous runs are not reused, so settled components are checked again"""
+        if self.__journal:
+            self.__journal.reset()
+
+    def iter_updates(self) -> Iterator[ComponentUpdaterResponse]:
+        """Yields response of every component as soon as its outcome is final.
+
+        Affected components file and report are updated with every response, so progress of the run is visible while it goes.
+        """
+        # repo state is loaded in background while components are resolved, and isn't waited for if nothing needs update
+        self.__github_provider.prefetch()
+        self.__num_pr_created = None
+        self.__affected = AffectedComponentsWriter(self.__config.affected_components_file)
+
+        # infra repo may have been pulled since the previous run of the same updater, e.g. in service mode
+        if self.__git_publisher:
+            self.__git_publisher.refresh()
+
+        try:
+            if self.__report:
+                self.__report.open()
+
+            for infra_terraform_dir in self.__infra_terraform_dirs:
+                yield from self.__update_terraform_dir(infra_terraform_dir)
+        finally:
+            if self.__report:
+                self.__report.close()
+
+    def plan(self) -> List[ComponentPlan]:
+        """Resolves latest versions of components without vendoring and GitHub calls. Outdated components are returned in update order"""
+        candidates = []
 
         for infra_terraform_dir in self.__infra_terraform_dirs:
-            responses.extend(self.__update_terraform_dir(infra_terraform_dir))
+            infra_components_dir = os.path.join(self.__config.infra_repo_dir, infra_terraform_dir)
+            component_files = self.__get_components(infra_components_dir)
 
-        return responses
+            self.__prefetch_tag_indexes(infra_terraform_dir, component_files)
 
-    def __update_terraform_dir(self, infra_terraform_dir) -> List[ComponentUpdaterResponse]:
-        responses = []
+            for component_file in component_files:
+                _, candidate = self.__resolve_component(infra_terraform_dir, component_file)
+
+                if candidate:
+                    candidates.append(candidate)
+
+        candidates = self.__scheduler.schedule(candidates,
+                                               lambda candidate: candidate.original_component.name,
+                                               lambda candidate: candidate.version_gap)
+
+        return [ComponentPlan(candidate.original_component.name,
+                              candidate.original_component.version,
+                              candidate.latest_tag,
+                              candidate.version_gap.bump.name.lower()) for candidate in candidates]
 
+    def __update_terraform_dir(self, infra_terraform_dir) -> Iterator[ComponentUpdaterResponse]:
         infra_components_dir = os.path.join(self.__config.infra_repo_dir, infra_terraform_dir)
 
         logging.debug(f"Looking for components in: {infra_components_dir}")
@@ -78,23 +273,146 @@ class ComponentUpdater:
 
         logging.info(f"Found {len(component_files)} components")
 
-        affected = []
+        if self.__config.resume and self.__journal:
+            component_files, affected = self.__skip_settled_components(component_files)
+
+            for component_name in affected:
+                self.__affected.add(component_name)
+
+        # without batch vendoring, components of a chunk are vendored concurrently
+        batch_size = self.__config.vendoring_batch_size if self.__config.vendoring_batch_size > 0 else max(self.__config.tool_concurrency, 1)
 
         try:
+            candidates = []
+
+            self.__prefetch_tag_indexes(infra_terraform_dir, component_files)
+
+            # resolving latest tags is cheap, so all components are resolved before spending the PR budget
             for component_file in component_files:
-                response = self.__update_component(infra_terraform_dir, component_file)
-                logging.debug(f"Response state after component update: {response.state.name}")
-                responses.append(response)
+                response, candidate = self.__resolve_component(infra_terraform_dir, component_file)
+
+                if candidate and self.__apply_cached_outcome(candidate):
+                    candidate = None
+
+                if candidate:
+                    candidates.append(candidate)
+                else:
+                    self.__record_response(response)
+                    yield self.__emit_response(response)
+
+            pending = self.__scheduler.schedule(candidates,
+                                                lambda candidate: candidate.original_component.name,
+                                                lambda candidate: candidate.version_gap)
+
+            if pending and self.__num_pr_created is None:
+                self.__num_pr_created = self.__count_open_prs()
+
+            while pending:
+                remaining_budget = self.__max_number_of_prs - self.__num_pr_created
+
+                if remaining_budget <= 0:
+                    logging.info(f"Max number of PRs ({self.__max_number_of_prs}) reached. Skipping {len(pending)} remaining components")
+                    for candidate in pending:
+                        candidate.response.state = ComponentUpdaterResponseState.MAX_PRS_REACHED
+                        self.__record_response(candidate.response)
+                        yield self.__emit_response(candidate.response)
+                    break
+
+                # no point to vendor more components than PRs we are still allowed to open, unless many of them can share a PR
+                chunk_size = batch_size if self.__grouper.enabled else min(batch_size, remaining_budget)
+                chunk, pending = pending[:chunk_size], pending[chunk_size:]
+                responses = self.__update_components(infra_terraform_dir, chunk)
+
+                self.__cache_outcomes(chunk)
+
+                # members of groups and updates waiting for batched PRs are final once they are published
+                deferred = {id(context.response) for context in self.__pending_prs}
+                deferred.update(id(response) for group in self.__groups.values() for response in group.responses)
+
+                for response in responses:
+                    logging.debug(f"Response state after component update: {response.state.name}")
+                    self.__record_response(response)
+
+                    if id(response) not in deferred:
+                        yield self.__emit_response(response)
 
-                if response.state == ComponentUpdaterResponseState.UPDATED:
-                    affected.append(response.component.name)
+            for response in self.__publish_groups() + self.__open_pending_prs():
+                self.__record_response(response)
+                yield self.__emit_response(response)
         except (ComponentUpdaterError, ToolExecutionError) as error:
             logging.error(error.message)
             sys.exit(1)
         finally:
-            io.serialize_to_json_file(self.__config.affected_components_file, affected)
+            if self.__outcome_cache:
+                self.__outcome_cache.save()
 
-        return responses
+    def __emit_response(self, response: ComponentUpdaterResponse) -> ComponentUpdaterResponse:
+        if response.state == ComponentUpdaterResponseState.UPDATED:
+            self.__affected.add(response.component.name)
+
+        if self.__report:
+            self.__report.write(dict(build_response_record(response), path=response.component.relative_path))
+
+        return response
+
+    def __apply_cached_outcome(self, candidate: ComponentUpdateCandidate) -> bool:
+        """Settles candidate with outcome of previous run, if neither 'component.yaml' nor latest upstream tag changed since"""
+        if not self.__outcome_cache:
+            return False
+
+        original_component = candidate.original_component
+        state = self.__outcome_cache.get(original_component.relative_path, original_component.component_file, candidate.latest_tag, self.__config.vendoring_enabled)
+
+        if not state or state not in ComponentUpdaterResponseState.__members__:
+            return False
+
+        logging.info(f"Component '{original_component.name}' ended with state '{state}' for version '{candidate.latest_tag}' in previous run and didn't change since. Skipping")
+        candidate.response.state = ComponentUpdaterResponseState[state]
+
+        return True
+
+    def __cache_outcomes(self, candidates: List[ComponentUpdateCandidate]):
+        if not self.__outcome_cache:
+            return
+
+        for candidate in candidates:
+            original_component = candidate.original_component
+
+            if candidate.response.state in CACHEABLE_STATES:
+                self.__outcome_cache.put(original_component.relative_path,
+                                         original_component.component_file,
+                                         candidate.latest_tag,
+                                         self.__config.vendoring_enabled,
+                                         candidate.response.state.name)
+            else:
+                self.__outcome_cache.remove(original_component.relative_path)
+
+    def __count_open_prs(self) -> int:
+        return sum(self.__github_provider.get_num_open_prs(component_name) for component_name in self.__github_provider.get_open_prs_components()
+                   if self.__is_in_shard(component_name))
+
+    def __skip_settled_components(self, component_files: List[str]) -> Tuple[List[str], List[str]]:
+        """Filters out components settled by previous runs. Returns components to process and components updated by previous runs"""
+        pending = []
+        affected = []
+
+        for component_file in component_files:
+            record = self.__journal.get(os.path.relpath(component_file, self.__config.infra_repo_dir))
+
+            if not record or ComponentUpdaterResponseState[record['state']] not in SETTLED_STATES:
+                pending.append(component_file)
+                continue
+
+            logging.info(f"Component '{record['component']}' was settled by previous run with state '{record['state']}'. Skipping")
+
+            if record['state'] == ComponentUpdaterResponseState.UPDATED.name:
+                affected.append(record['component'])
+
+        return pending, affected
+
+    def __record_response(self, response: ComponentUpdaterResponse):
+        if self.__journal:
+            self.__journal.append(response.component.relative_path, build_response_record(response))
 
     def __get_components(self, infra_components_dir: str) -> List[str]:
         component_yaml_paths = []
@@ -106,6 +424,8 @@ class ComponentUpdater:
                         component_name = os.path.relpath(root, infra_components_dir)
                         if not self.__should_component_be_processed(component_name):
                             continue
+                        if not self.__is_in_shard(normalize_branch_component_name(component_name.replace('/', '-'))):
+                            continue
                         component_yaml_paths.append(os.path.join(root, file))
         except FileNotFoundError as error:
             logging.error(f"Could not get components from '{infra_components_dir}': {error}")
@@ -113,20 +433,102 @@ class ComponentUpdater:
 
         return sorted(component_yaml_paths)
 
-    def __is_vendored(self, component: AtmosComponent, vendored_component: AtmosComponent) -> bool:
+    def __is_vendored(self, component_snapshot: TreeSnapshot, vendored_component_snapshot: TreeSnapshot) -> bool:
         """Checks if component has subset of files that vendored component does. This way we will be able to detect if component was pulled or not"""
-        component_files = set([os.path.relpath(f, component.component_dir) for f in io.get_filenames_in_dir(component.component_dir, ['**/*'])])
-        vendored_component_files = set([os.path.relpath(f, vendored_component.component_dir) for f in io.get_filenames_in_dir(vendored_component.component_dir, ['**/*'])])
-        return vendored_component_files.issubset(component_files)
+        return vendored_component_snapshot.paths <= component_snapshot.paths
 
-    def __update_component(self, infra_terraform_dir, component_file: str) -> ComponentUpdaterResponse:
-        original_component = AtmosComponent(self.__config.infra_repo_dir, infra_terraform_dir, component_file)
-        response = ComponentUpdaterResponse(original_component)
+    def __update_components(self, infra_terraform_dir, candidates: List[ComponentUpdateCandidate]) -> List[ComponentUpdaterResponse]:
+        # vendored workspaces are needed only while chunk is processed, updated components are kept for responses,
+        # workspaces gathering changes of groups are pinned until groups are published and everything else is released
+        with self.__workspace_manager.scope():
+            responses = self.__update_components_in_scope(infra_terraform_dir, candidates)
+
+            for response in responses:
+                if response.state == ComponentUpdaterResponseState.UPDATED and response.component.infra_repo_dir != self.__config.infra_repo_dir:
+                    self.__workspace_manager.retain(response.component.infra_repo_dir)
+
+        return responses
+
+    def __update_components_in_scope(self, infra_terraform_dir, candidates: List[ComponentUpdateCandidate]) -> List[ComponentUpdaterResponse]:
+        responses = []
+        contexts = []
+
+        for candidate in candidates:
+            context = self.__prepare_component_update(infra_terraform_dir, candidate)
+            responses.append(candidate.response)
+
+            if context:
+                contexts.append(context)
+
+        if not contexts:
+            return responses
+
+        components_to_vendor = []
+
+        for context in contexts:
+            components_to_vendor.extend([context.original_vendored_component, context.updated_vendored_component])
+
+        vendoring_errors = self.__vendor_components(components_to_vendor)
+
+        for context in contexts:
+            errors = [vendoring_errors.get(component.component_file) for component in (context.original_vendored_component, context.updated_vendored_component)]
+            errors = [error for error in errors if error]
+
+            if errors:
+                logging.error(f"Failed to vendor component: {errors[0]}")
+                context.response.state = ComponentUpdaterResponseState.FAILED_TO_VENDOR_COMPONENT
+                continue
+
+            self.__complete_component_update(context)
 
-        if self.__num_pr_created >= self.__config.max_number_of_prs:
-            logging.info(f"Max number of PRs ({self.__config.max_number_of_prs}) reached. Skipping component update for '{original_component.name}'")
-            response.state = ComponentUpdaterResponseState.MAX_PRS_REACHED
-            return ComponentUpdaterResponse(original_component)
+        self.__open_prs(contexts)
+
+        return responses
+
+    def __vendor_components(self, components: List[AtmosComponent]) -> Dict[str, Optional[ToolExecutionError]]:
+        errors: Dict[str, Optional[ToolExecutionError]] = {}
+        components_to_vendor = []
+
+        for component in components:
+            if self.__vendor_cache.restore(component):
+                errors[component.component_file] = None
+            else:
+                components_to_vendor.append(component)
+
+        if not components_to_vendor:
+            return errors
+
+        vendoring_errors = self.__vendor_components_with_atmos(components_to_vendor)
+
+        for component in components_to_vendor:
+            if vendoring_errors.get(component.component_file) is None:
+                self.__vendor_cache.store(component)
+
+        errors.update(vendoring_errors)
+
+        return errors
+
+    def __vendor_components_with_atmos(self, components: List[AtmosComponent]) -> Dict[str, Optional[ToolExecutionError]]:
+        if self.__config.vendoring_batch_size > 0:
+            return self.__tools_manager.atmos_vendor_components(components)
+
+        errors: Dict[str, Optional[ToolExecutionError]] = {}
+
+        with ThreadPoolExecutor(max_workers=max(self.__config.tool_concurrency, 1)) as executor:
+            futures = {component.component_file: executor.submit(self.__tools_manager.atmos_vendor_component, component) for component in components}
+
+        for component_file, future in futures.items():
+            try:
+                future.result()
+                errors[component_file] = None
+            except ToolExecutionError as error:
+                errors[component_file] = error
+
+        return errors
+
+    def __resolve_component(self, infra_terraform_dir, component_file: str) -> Tuple[ComponentUpdaterResponse, Optional[ComponentUpdateCandidate]]:
+        original_component = self.__load_component(infra_terraform_dir, component_file)
+        response = ComponentUpdaterResponse(original_component)
 
         logging.info(f"Processing component: {original_component.name}")
         logging.debug(f"Original component:\n{str(original_component)}")
@@ -134,35 +536,73 @@ class ComponentUpdater:
         if not original_component.has_version():
             logging.error(f"Component '{original_component.name}' doesn't have 'version' specified. Skipping")
             response.state = ComponentUpdaterResponseState.NO_VERSION_FOUND_IN_SOURCE_YAML
-            return response
+            return response, None
 
         if not original_component.has_valid_uri():
             logging.error(f"Component '{original_component.name}' doesn't have valid 'uri' specified. Skipping")
             response.state = ComponentUpdaterResponseState.NOT_VALID_URI_FOUND_IN_SOURCE_YAML
-            return response
+            return response, None
 
         migrated_component = copy.deepcopy(original_component)
         migrated_component.migrate()
 
-        repo_dir = self.__fetch_component_repo(migrated_component) if not self.__config.skip_component_repo_fetching else self.__config.components_download_dir
+        tag_index = self.__upstream_cache.get_tag_index(migrated_component)
 
-        if not self.__tools_manager.is_git_repo(repo_dir):
+        if tag_index is None:
             logging.error(f"Component '{original_component.name}' uri is not git repo. Can't figure out latest version. Skipping")
             response.state = ComponentUpdaterResponseState.URI_IS_NOT_GIT_REPO
-            return response
+            return response, None
 
-        latest_tag = self.__tools_manager.git_get_latest_tag(repo_dir)
+        latest_tag = tag_index.latest
         logging.info(f"Latest tag for component '{original_component.name}' is '{latest_tag}'")
 
         if not latest_tag:
             logging.error(f"Unable to figure out latest tag for component '{original_component.name}' source uri. Skipping")
             response.state = ComponentUpdaterResponseState.NO_LATEST_TAG_FOUND_IN_COMPONENT_REPO
-            return response
+            return response, None
 
-        if original_component.version == latest_tag:
+        if original_component.version == latest_tag.strip().lstrip("v"):
             logging.info(f"Component '{original_component.name}' already updated. Skipping")
             response.state = ComponentUpdaterResponseState.ALREADY_UP_TO_DATE
-            return response
+            return response, None
+
+        return response, ComponentUpdateCandidate(response, original_component, migrated_component, latest_tag)
+
+    def __prefetch_tag_indexes(self, infra_terraform_dir, component_files: List[str]):
+        """Looks up tags of upstream repos of all components at once, instead of one repo at a time while components are resolved"""
+        uri_repos = []
+
+        for component_file in component_files:
+            component = self.__load_component(infra_terraform_dir, component_file)
+
+            if not component.has_version() or not component.has_valid_uri():
+                continue
+
+            migrated_component = copy.deepcopy(component)
+            migrated_component.migrate()
+            uri_repos.append(migrated_component.uri_repo)
+
+        self.__upstream_cache.prefetch(uri_repos)
+
+    def __load_component(self, infra_terraform_dir, component_file: str) -> AtmosComponent:
+        """Parses component file, reusing the previous parse if file didn't change since the previous run"""
+        stat = os.stat(component_file)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self.__components.get(component_file)
+
+        if cached and cached[0] == key:
+            return cached[1]
+
+        component = AtmosComponent(self.__config.infra_repo_dir, infra_terraform_dir, component_file)
+        self.__components[component_file] = (key, component)
+
+        return component
+
+    def __prepare_component_update(self, infra_terraform_dir, candidate: ComponentUpdateCandidate) -> Optional[ComponentUpdateContext]:
+        response = candidate.response
+        original_component = candidate.original_component
+        migrated_component = candidate.migrated_component
+        latest_tag = candidate.latest_tag
 
         updated_component = self.__clone_infra_for_component(infra_terraform_dir, migrated_component)
         updated_component.migrate()
@@ -178,12 +618,12 @@ class ComponentUpdater:
         if self.__github_provider.branch_exists(branch_name):
             logging.warning(f"Branch '{branch_name}' already exists. Skipping")
             response.state = ComponentUpdaterResponseState.REMOTE_BRANCH_FOR_COMPONENT_UPDATER_ALREADY_EXISTS
-            return response
+            return None
 
         if self.__github_provider.pr_for_branch_exists(branch_name):
             logging.warning(f"PR for branch '{branch_name}' already exists. Skipping")
             response.state = ComponentUpdaterResponseState.PR_FOR_BRANCH_ALREADY_EXISTS
-            return response
+            return None
 
         updated_component.update_version(latest_tag)
         updated_component.persist()
@@ -194,13 +634,14 @@ class ComponentUpdater:
         logging.debug(f"Original re-vendored component:\n{str(original_vendored_component)}")
         logging.debug(f"Updated re-vendored component:\n{str(updated_vendored_component)}")
 
-        try:
-            self.__tools_manager.atmos_vendor_component(original_vendored_component)
-            self.__tools_manager.atmos_vendor_component(updated_vendored_component)
-        except ToolExecutionError as error:
-            logging.error(f"Failed to vendor component: {error}")
-            response.state = ComponentUpdaterResponseState.FAILED_TO_VENDOR_COMPONENT
-            return response
+        return ComponentUpdateContext(response, original_component, updated_component, original_vendored_component, updated_vendored_component)
+
+    def __complete_component_update(self, context: ComponentUpdateContext):
+        response = context.response
+        original_component = context.original_component
+        updated_component = context.updated_component
+        original_vendored_component = context.original_vendored_component
+        updated_vendored_component = context.updated_vendored_component
 
         # - vendoring_enabled = true
         #   - component vendored     => do vendor
@@ -208,114 +649,145 @@ class ComponentUpdater:
         # - vendoring_enabled = false
         #   - component vendored     => skip component
         #   - component not vendored => do not vendor
-        needs_update, files_to_update, files_to_remove = self.__does_component_needs_to_be_updated(original_vendored_component, updated_vendored_component, original_component)
+        # each tree is scanned once and shared by the diff and the vendoring check
+        original_snapshot = TreeSnapshot(original_vendored_component.component_dir)
+        updated_snapshot = TreeSnapshot(updated_vendored_component.component_dir)
+        source_snapshot = TreeSnapshot(original_component.component_dir)
+
+        needs_update, files_to_update, files_to_remove = self.__does_component_needs_to_be_updated(original_component, original_snapshot, updated_snapshot, source_snapshot)
+        group_name = self.__grouper.get_group(updated_component) if needs_update else None
+
         if needs_update:
+            # groups take PR budget when they are published
+            if not group_name and self.__num_pr_created >= self.__max_number_of_prs:
+                logging.info(f"Max number of PRs ({self.__max_number_of_prs}) reached. Skipping component update for '{original_component.name}'")
+                response.state = ComponentUpdaterResponseState.MAX_PRS_REACHED
+                return
+
             if self.__config.vendoring_enabled:
-                self.__tools_manager.atmos_vendor_component(updated_component)
+                # updated vendored component was pulled from the same 'component.yaml', reuse it instead of vendoring again
+                io.remove_dir_content(updated_component.component_dir, [COMPONENT_YAML])
+                io.copy_dirs(updated_vendored_component.component_dir, updated_component.component_dir)
             else:
-                if self.__is_vendored(original_component, original_vendored_component):
+                if self.__is_vendored(source_snapshot, original_snapshot):
                     logging.error(f"Component '{original_component.name}' is vendored but vendoring disabled. Skipping")
                     response.state = ComponentUpdaterResponseState.COMPONENT_VENDORED_BUT_VENDORING_DISABLED
-                    return response
+                    return
 
-            pull_request_creation_response: PullRequestCreationResponse = self.__create_branch_and_pr(updated_component.infra_repo_dir,
-                                                                                                      files_to_update,
-                                                                                                      files_to_remove,
-                                                                                                      original_component,
-                                                                                                      updated_component,
-                                                                                                      branch_name)
-            response.pull_request_creation_response = pull_request_creation_response
+            if group_name:
+                logging.info(f"Component '{original_component.name}' will be updated with group '{group_name}'")
+                group = self.__groups.setdefault(group_name, ComponentUpdateGroup(group_name))
+                group.add(context, files_to_update, files_to_remove)
 
-            response.state = ComponentUpdaterResponseState.UPDATED
+                # changes of the whole group are gathered in this workspace until the group is published
+                if len(group.contexts) == 1:
+                    self.__workspace_manager.pin(group.repo_dir)
+                return
+
+            self.__create_branch(updated_component.infra_repo_dir,
+                                 files_to_update,
+                                 files_to_remove,
+                                 response.branch_name,
+                                 COMMIT_MESSAGE_TEMPLATE.format(component_name=updated_component.name, component_version=updated_component.version))
 
-            if self.__config.dry_run or (response.pull_request_creation_response and response.pull_request_creation_response.pull_request):
-                self.__num_pr_created += 1
+            response.state = ComponentUpdaterResponseState.UPDATED
 
-            return response
+            # budget is taken when branch is created, PR is opened once branches of the whole chunk are pushed
+            self.__num_pr_created += 1
         else:
             logging.info("Looking good. No changes found")
             response.state = ComponentUpdaterResponseState.NO_CHANGES_FOUND
-            return response
-
-    def __fetch_component_repo(self, component: AtmosComponent):
-        normalized_repo_path = component.uri_repo.replace('/', '-') if component.uri_repo else ''
-        self.__tools_manager.go_getter_pull_component_repo(component, normalized_repo_path, self.__config.components_download_dir)
-        return os.path.join(self.__config.components_download_dir, normalized_repo_path)
 
     def __clone_infra_for_component(self, infra_terraform_dir: str, component: AtmosComponent):
-        update_infra_repo_dir = io.create_tmp_dir()
+        update_infra_repo_dir = self.__workspace_manager.create()
         io.copy_dirs(component.infra_repo_dir, update_infra_repo_dir)
         component_file = os.path.join(update_infra_repo_dir, component.relative_path)
         return AtmosComponent(update_infra_repo_dir, infra_terraform_dir, component_file)
 
-    def __does_component_needs_to_be_updated(self, original_component: AtmosComponent, updated_component: AtmosComponent, original_component_source: AtmosComponent) -> (bool, List[str], List[str]):
-        updated_files = io.get_filenames_in_dir(updated_component.component_dir, ['**/*'])
-        original_files = io.get_filenames_in_dir(original_component.component_dir, ['**/*'])
+    def __does_component_needs_to_be_updated(self,
+                                             original_component: AtmosComponent,
+                                             original_snapshot: TreeSnapshot,
+                                             updated_snapshot: TreeSnapshot,
+                                             source_snapshot: TreeSnapshot) -> (bool, List[str], List[str]):
+        component_dir = os.path.relpath(original_component.component_dir, original_component.infra_repo_dir)
 
-        logging.debug(f"Original files: {original_files}")
-        logging.debug(f"Updated files: {updated_files}")
+        logging.debug(f"Original files: {sorted(original_snapshot.paths)}")
+        logging.debug(f"Updated files: {sorted(updated_snapshot.paths)}")
 
-        needs_update = False
-        num_diffs = 0
+        updated_paths = frozenset(path for path in updated_snapshot.paths if not path.endswith(COMPONENT_YAML))
+        new_paths = updated_paths - original_snapshot.paths
+        changed_paths = updated_snapshot.changed_paths(original_snapshot) & updated_paths
+        removed_paths = (original_snapshot.paths & source_snapshot.paths) - updated_snapshot.paths
 
-        files_to_update = []
-        files_to_remove = []
+        for path in sorted(new_paths):
+            logging.info(f"New file: {os.path.join(component_dir, path)}")
 
-        for updated_file in updated_files:
-            # skip "component.yaml"
-            if updated_file.endswith(COMPONENT_YAML):
-                continue
+        for num_diffs, path in enumerate(sorted(changed_paths)):
+            logging.info(f"File changed: {os.path.join(component_dir, path)}")
+            if num_diffs < MAX_NUMBER_OF_DIFF_TO_SHOW:
+                logging.info(f"diff: {self.__tools_manager.diff(original_snapshot.get(path).path, updated_snapshot.get(path).path)}")
 
-            # skip folders
-            if not os.path.isfile(updated_file):
-                continue
+        for path in sorted(removed_paths):
+            logging.info(f"Remove file: {os.path.join(component_dir, path)}")
 
-            relative_path = os.path.relpath(updated_file, updated_component.infra_repo_dir)
-            original_file = os.path.join(original_component.infra_repo_dir, relative_path)
+        # Adding *.md file does not require component update, but still should be included into a PR
+        needs_update = any(not path.endswith(README_EXTENTION) for path in new_paths | changed_paths | removed_paths)
 
-            files_to_update.append(relative_path)
-            if not os.path.isfile(original_file):
-                logging.info(f"New file: {relative_path}")
-                # Adding *.md file does not require component update, but still should be included into a PR
-                needs_update = needs_update or not relative_path.endswith(README_EXTENTION)
-                continue
-
-            if io.calc_file_md5_hash(original_file) != io.calc_file_md5_hash(updated_file):
-                logging.info(f"File changed: {relative_path}")
-                if num_diffs < MAX_NUMBER_OF_DIFF_TO_SHOW:
-                    logging.info(f"diff: {self.__tools_manager.diff(original_file, updated_file)}")
-                    num_diffs += 1
-                # Adding *.md file does not require component update, but still should be included into a PR
-                needs_update = needs_update or not relative_path.endswith(README_EXTENTION)
-
-        for original_file in original_files:
-            relative_path = os.path.relpath(original_file, original_component.infra_repo_dir)
-            updated_file = os.path.join(updated_component.infra_repo_dir, relative_path)
-            source_file = os.path.join(original_component_source.infra_repo_dir, relative_path)
-
-            if os.path.isfile(source_file) and not os.path.isfile(updated_file):
-                logging.info(f"Remove file: {relative_path}")
-                files_to_remove.append(relative_path)
-                # Adding *.md file does not require component update, but still should be included into a PR
-                needs_update = needs_update or not relative_path.endswith(README_EXTENTION)
-                continue
+        files_to_update = [os.path.join(component_dir, path) for path in sorted(updated_paths)]
+        files_to_remove = [os.path.join(component_dir, path) for path in sorted(removed_paths)]
 
         if needs_update:
-            logging.info(f"Component '{os.path.relpath(original_component.component_file, original_component.infra_repo_dir)}' needs to be updated")
-            files_to_update.append(os.path.relpath(original_component.component_file, original_component.infra_repo_dir))
+            logging.info(f"Component '{original_component.relative_path}' needs to be updated")
+            files_to_update.append(original_component.relative_path)
 
         return (needs_update, files_to_update, files_to_remove)
 
-    def __create_branch_and_pr(self, repo_dir, files_to_update, files_to_remove, original_component: AtmosComponent, updated_component: AtmosComponent, branch_name: str) -> PullRequestCreationResponse:
+    def __create_branch(self, repo_dir, files_to_update, files_to_remove, branch_name: str, commit_message: str):
+        if self.__git_publisher and not self.__config.dry_run:
+            self.__git_publisher.commit(repo_dir, files_to_update, files_to_remove, branch_name, commit_message)
+            logging.info(f"Committed changes for branch: {branch_name}")
+            return
+
         self.__github_provider.create_branch_and_push_all_changes(repo_dir,
                                                                   files_to_update,
                                                                   files_to_remove,
                                                                   branch_name,
-                                                                  COMMIT_MESSAGE_TEMPLATE.format(
-                                                                      component_name=updated_component.name,
-                                                                      component_version=updated_component.version))
+                                                                  commit_message)
 
         logging.info(f"Created branch: {branch_name} in 'origin'")
+
+    def __open_prs(self, contexts: List[ComponentUpdateContext]):
+        contexts = [context for context in contexts if context.response.state == ComponentUpdaterResponseState.UPDATED]
+
+        if not contexts:
+            return
+
+        push_errors = self.__git_publisher.push() if self.__git_publisher and not self.__config.dry_run else {}
+
+        for context in contexts:
+            response = context.response
+            error = push_errors.get(response.branch_name)
+
+            if error:
+                logging.error(f"Failed to push branch '{response.branch_name}': {error}")
+                response.state = ComponentUpdaterResponseState.FAILED_TO_PUSH_BRANCH
+                self.__num_pr_created -= 1
+                continue
+
+            if response.branch_name in push_errors:
+                logging.info(f"Created branch: {response.branch_name} in 'origin'")
+                self.__github_provider.add_branch(response.branch_name)
+
+            if self.__config.pr_creation_mode == PR_CREATION_MODE_GRAPHQL:
+                self.__pending_prs.append(context)
+                continue
+
+            response.pull_request_creation_response = self.__open_pr(context.updated_component.infra_repo_dir,
+                                                                     context.original_component,
+                                                                     context.updated_component,
+                                                                     response.branch_name)
+
+    def __open_pr(self, repo_dir, original_component: AtmosComponent, updated_component: AtmosComponent, branch_name: str) -> PullRequestCreationResponse:
         logging.info(f"Opening PR for branch {branch_name}")
 
         pull_request_creation_response: PullRequestCreationResponse = self.__github_provider.open_pr(repo_dir,
@@ -323,19 +795,151 @@ class ComponentUpdater:
                                                                                                      original_component,
                                                                                                      updated_component)
         if not self.__config.dry_run and pull_request_creation_response.pull_request:
-            pull_request = pull_request_creation_response.pull_request
+            self.__close_superseded_prs(pull_request_creation_response, [updated_component.normalized_name])
+
+        return pull_request_creation_response
 
-            logging.info(f"Opened PR #{pull_request.number}")
+    def __open_pending_prs(self) -> List[ComponentUpdaterResponse]:
+        contexts, self.__pending_prs = self.__pending_prs, []
 
-            opened_prs = self.__github_provider.get_open_prs_for_component(updated_component.normalized_name)
+        if not contexts:
+            return []
+
+        logging.info(f"Opening {len(contexts)} PRs")
+
+        pull_request_creation_responses = self.__github_provider.open_prs(self.__config.infra_repo_dir,
+                                                                          [(context.response.branch_name, context.original_component, context.updated_component)
+                                                                           for context in contexts])
+
+        for context, pull_request_creation_response in zip(contexts, pull_request_creation_responses):
+            context.response.pull_request_creation_response = pull_request_creation_response
+
+            if pull_request_creation_response.error:
+                logging.error(f"Failed to open PR for branch '{pull_request_creation_response.branch}': {pull_request_creation_response.error}")
+                self.__num_pr_created -= 1
+            elif not self.__config.dry_run and pull_request_creation_response.pull_request:
+                self.__close_superseded_prs(pull_request_creation_response, [context.updated_component.normalized_name])
+
+        return [context.response for context in contexts]
+
+    def __publish_groups(self) -> List[ComponentUpdaterResponse]:
+        """Publishes every group of updated components in one branch and PR. Each group takes one PR from the budget"""
+        groups, self.__groups = list(self.__groups.values()), {}
+        published = []
+
+        for group in groups:
+            members = [(context.updated_component.name, context.updated_component.version) for context in group.contexts]
+            branch_name = self.__github_provider.build_component_branch_name(f'{GROUP_BRANCH_PREFIX}{group.name}', build_group_digest(members))
+            state = ComponentUpdaterResponseState.UPDATED
+
+            if self.__num_pr_created >= self.__max_number_of_prs:
+                logging.info(f"Max number of PRs ({self.__max_number_of_prs}) reached. Skipping update of group '{group.name}'")
+                state = ComponentUpdaterResponseState.MAX_PRS_REACHED
+            elif self.__github_provider.branch_exists(branch_name):
+                logging.warning(f"Branch '{branch_name}' already exists. Skipping")
+                state = ComponentUpdaterResponseState.REMOTE_BRANCH_FOR_COMPONENT_UPDATER_ALREADY_EXISTS
+            elif self.__github_provider.pr_for_branch_exists(branch_name):
+                logging.warning(f"PR for branch '{branch_name}' already exists. Skipping")
+                state = ComponentUpdaterResponseState.PR_FOR_BRANCH_ALREADY_EXISTS
+
+            for response in group.responses:
+                response.branch_name = branch_name
+                response.state = state
+
+            if state != ComponentUpdaterResponseState.UPDATED:
+                continue
 
-            for opened_pr in opened_prs:
+            commit_lines = [GROUP_COMMIT_MESSAGE_TEMPLATE.format(num_components=len(members), group_name=group.name), ""]
+            commit_lines.extend(COMMIT_MESSAGE_TEMPLATE.format(component_name=name, component_version=version) for name, version in members)
+            commit_message = "\n".join(commit_lines)
+
+            self.__create_branch(group.repo_dir, group.files_to_update, group.files_to_remove, branch_name, commit_message)
+            self.__num_pr_created += 1
+            published.append(group)
+
+        push_errors = self.__git_publisher.push() if self.__git_publisher and not self.__config.dry_run else {}
+        to_open = []
+
+        for group in published:
+            branch_name = group.responses[0].branch_name
+            error = push_errors.get(branch_name)
+
+            if error:
+                logging.error(f"Failed to push branch '{branch_name}': {error}")
+                for response in group.responses:
+                    response.state = ComponentUpdaterResponseState.FAILED_TO_PUSH_BRANCH
+                self.__num_pr_created -= 1
+                continue
+
+            if branch_name in push_errors:
+                logging.info(f"Created branch: {branch_name} in 'origin'")
+                self.__github_provider.add_branch(branch_name)
+
+            group.pull_request_creation_response = self.__github_provider.render_group_pull_request(branch_name,
+                                                                                                    group.name,
+                                                                                                    [(context.original_component, context.updated_component)
+                                                                                                     for context in group.contexts])
+            to_open.append(group)
+
+        if self.__config.pr_creation_mode == PR_CREATION_MODE_GRAPHQL:
+            self.__github_provider.create_pull_requests(self.__config.infra_repo_dir, [group.pull_request_creation_response for group in to_open])
+        else:
+            for group in to_open:
+                logging.info(f"Opening PR for branch {group.pull_request_creation_response.branch}")
+                self.__github_provider.create_pull_request(group.repo_dir, group.pull_request_creation_response)
+
+        for group in to_open:
+            pull_request_creation_response = group.pull_request_creation_response
+
+            for response in group.responses:
+                response.pull_request_creation_response = pull_request_creation_response
+
+            if pull_request_creation_response.error:
+                logging.error(f"Failed to open PR for branch '{pull_request_creation_response.branch}': {pull_request_creation_response.error}")
+                self.__num_pr_created -= 1
+            elif not self.__config.dry_run and pull_request_creation_response.pull_request:
+                # group PR replaces older PRs of the group and PRs of its components
+                component_names = [f'{GROUP_BRANCH_PREFIX}{group.name}'] + [context.updated_component.normalized_name for context in group.contexts]
+                self.__close_superseded_prs(pull_request_creation_response, component_names)
+
+        # published groups are kept like updated components, workspaces of skipped ones are no longer needed
+        for group in groups:
+            if group.responses[0].state == ComponentUpdaterResponseState.UPDATED:
+                self.__workspace_manager.unpin(group.repo_dir)
+            else:
+                self.__workspace_manager.release(group.repo_dir)
+
+        return [response for group in groups for response in group.responses]
+
+    def __close_superseded_prs(self, pull_request_creation_response: PullRequestCreationResponse, component_names: List[str]):
+        pull_request = pull_request_creation_response.pull_request
+
+        logging.info(f"Opened PR #{pull_request.number}")
+
+        superseded_prs = {}
+
+        for component_name in component_names:
+            for opened_pr in self.__github_provider.get_open_prs_for_component(component_name):
                 if opened_pr.number != pull_request.number:
-                    closing_message = f"Closing in favor of PR #{pull_request.number}"
-                    self.__github_provider.close_pr(opened_pr, closing_message)
-                    logging.info(f"Closed pr {opened_pr.number} in favor of #{pull_request.number}")
+                    superseded_prs[opened_pr.number] = opened_pr
 
-        return pull_request_creation_response
+        superseded_prs = list(superseded_prs.values())
+
+        closing_message = f"Closing in favor of PR #{pull_request.number}"
+        pull_request_creation_response.superseded_pull_requests = self.__github_provider.close_prs(superseded_prs, closing_message)
+
+        for result in pull_request_creation_response.superseded_pull_requests:
+            if result.closed:
+                logging.info(f"Closed pr {result.pull_request.number} in favor of #{pull_request.number}")
+            else:
+                logging.warning(f"Failed to close pr {result.pull_request.number} in favor of #{pull_request.number}: {result.error}")
+
+    def __is_in_shard(self, branch_component_name: str) -> bool:
+        # sharded by the component segment of update branch name, so open PRs can be attributed to shards as well
+        if self.__config.shard_count <= 1:
+            return True
+
+        return get_shard(branch_component_name, self.__config.shard_count) == self.__config.shard_index
 
     def __should_component_be_processed(self, component_name: str) -> bool:
         if len(self.__config.include) == 0 and len(self.__config.exclude) == 0:
@@ -0,0 +1,130 @@
+from typing import Dict, NamedTuple, Optional, Tuple
+import yaml
+
+# libyaml-backed safe loader is an order of magnitude faster than the pure Python one.
+# Fall back to the pure Python loader when PyYAML was built without libyaml.
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.FullLoader)
+
+# (start, end, style) of a single line scalar value in the content
+Span = Tuple[int, int, str]
+
+
+class ParsedSource(NamedTuple):
+    values: dict
+    spans: Dict[str, Span]
+    has_mixins: bool
+
+
+def load(content: str):
+    return yaml.load(content, Loader=YAML_LOADER)
+
+
+def load_source(content: str) -> dict:
+    return parse_source(content).values
+
+
+def parse_source(content: str) -> ParsedSource:
+    """Loads only 'spec.source' from component.yaml content.
+
+    The document is composed into a node graph (in C when libyaml is available), but only the
+    'spec.source' subtree is constructed into Python objects. Along with the values, returns
+    character spans of every single line scalar value of 'spec.source' so they can be edited in place,
+    and whether 'spec.mixins' are defined.
+    """
+    loader = YAML_LOADER(content)
+
+    try:
+        root = loader.get_single_node()
+        spec_node = find_mapping_value(root, 'spec')
+        source_node = find_mapping_value(spec_node, 'source')
+        mixins_node = find_mapping_value(spec_node, 'mixins')
+        has_mixins = isinstance(mixins_node, yaml.SequenceNode) and len(mixins_node.value) > 0
+
+        if not isinstance(source_node, yaml.MappingNode):
+            return ParsedSource({}, {}, has_mixins)
+
+        spans = {}
+
+        for key_node, value_node in source_node.value:
+            if not isinstance(key_node, yaml.ScalarNode) or not isinstance(value_node, yaml.ScalarNode):
+                continue
+
+            # block and multiline scalars can't be safely replaced with a plain value
+            if value_node.style in ('|', '>') or value_node.start_mark.line != value_node.end_mark.line:
+                spans.pop(key_node.value, None)
+                continue
+
+            spans[key_node.value] = (value_node.start_mark.index, value_node.end_mark.index, value_node.style or '')
+
+        return ParsedSource(loader.construct_object(source_node, deep=True), spans, has_mixins)
+    finally:
+        loader.dispose()
+
+
+def find_mapping_value(node: Optional[yaml.Node], key: str) -> Optional[yaml.Node]:
+    if not isinstance(node, yaml.MappingNode):
+        return None
+
+    # the last occurrence wins for duplicated keys, same as in yaml.load()
+    for key_node, value_node in reversed(node.value):
+        if isinstance(key_node, yaml.ScalarNode) and key_node.value == key:
+            return value_node
+
+    return None
+
+
+class ComponentYamlEditor:
+    """Edits 'spec.source' scalar values of component.yaml content by splicing them in place.
+
+    Content is parsed once. Quoting, comments and the rest of the formatting are preserved, and
+    values and spans are updated after each edit without re-parsing the document.
+    """
+
+    def __init__(self, content: str):
+        self.__content = content
+        self.__source, self.__spans, self.__has_mixins = parse_source(content)
+
+    @property
+    def content(self) -> str:
+        return self.__content
+
+    @property
+    def source(self) -> dict:
+        return self.__source
+
+    @property
+    def has_mixins(self) -> bool:
+        return self.__has_mixins
+
+    def set_source_value(self, key: str, value: str) -> bool:
+        """Replaces 'spec.source.<key>' value. Returns False if the value has no editable span"""
+        span = self.__spans.get(key)
+
+        if not span:
+            return False
+
+        start, end, style = span
+        replacement = self.__quote(value, style)
+
+        self.__content = self.__content[:start] + replacement + self.__content[end:]
+        self.__source[key] = value
+
+        delta = len(replacement) - (end - start)
+
+        for other_key, (other_start, other_end, other_style) in self.__spans.items():
+            if other_start >= end:
+                self.__spans[other_key] = (other_start + delta, other_end + delta, other_style)
+
+        self.__spans[key] = (start, start + len(replacement), style)
+
+        return True
+
+    @staticmethod
+    def __quote(value: str, style: str) -> str:
+        if style == "'":
+            return "'" + value.replace("'", "''") + "'"
+
+        if style == '"':
+            return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+        return value
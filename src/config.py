@@ -1,6 +1,25 @@
 import os
 from typing import List
 from utils import io, utils
+from scheduler import SCHEDULE_VERSION_GAP
+from plan_report import PLAN_FORMAT_JSON
+from grouping import GROUP_BY_NONE
+
+FETCH_MODE_GO_GETTER = 'go-getter'
+FETCH_MODE_PARTIAL_CLONE = 'partial-clone'
+FETCH_MODES = [FETCH_MODE_GO_GETTER, FETCH_MODE_PARTIAL_CLONE]
+
+PUBLISH_MODE_API = 'api'
+PUBLISH_MODE_GIT = 'git'
+PUBLISH_MODES = [PUBLISH_MODE_API, PUBLISH_MODE_GIT]
+
+PR_CREATION_MODE_REST = 'rest'
+PR_CREATION_MODE_GRAPHQL = 'graphql'
+PR_CREATION_MODES = [PR_CREATION_MODE_REST, PR_CREATION_MODE_GRAPHQL]
+
+TAG_LOOKUP_GIT = 'git'
+TAG_LOOKUP_GRAPHQL = 'graphql'
+TAG_LOOKUPS = [TAG_LOOKUP_GIT, TAG_LOOKUP_GRAPHQL]
 
 
 class Config:
@@ -18,7 +37,37 @@ class Config:
                  affected_components_file: str = '',
                  pr_title_template: str = '',
                  pr_body_template: str = '',
-                 pr_labels: str = 'component-update'):
+                 pr_labels: str = 'component-update',
+                 vendoring_batch_size: int = 0,
+                 tool_timeout: int = 900,
+                 tool_concurrency: int = 4,
+                 fetch_mode: str = FETCH_MODE_GO_GETTER,
+                 journal_file: str = '',
+                 resume: bool = False,
+                 shard_index: int = 0,
+                 shard_count: int = 1,
+                 schedule: str = SCHEDULE_VERSION_GAP,
+                 priority: str = '',
+                 plan: bool = False,
+                 plan_file: str = 'plan.json',
+                 plan_format: str = PLAN_FORMAT_JSON,
+                 workspace_dir: str = '',
+                 workspace_quota: int = 0,
+                 service: bool = False,
+                 service_interval: int = 0,
+                 service_port: int = 0,
+                 service_queue_dir: str = '',
+                 check_remote_branches: bool = False,
+                 outcome_cache_file: str = '',
+                 revalidate: bool = False,
+                 publish_mode: str = PUBLISH_MODE_API,
+                 pr_creation_mode: str = PR_CREATION_MODE_REST,
+                 group_by: str = GROUP_BY_NONE,
+                 group_patterns: str = '',
+                 tag_lookup: str = TAG_LOOKUP_GIT,
+                 affected_stacks_file: str = '',
+                 stack_index_cache_file: str = '',
+                 report_file: str = ''):
         self.infra_repo_name: str = infra_repo_name
         self.infra_repo_dir: str = infra_repo_dir
         self.infra_terraform_dirs: List[str] = utils.parse_comma_or_new_line_separated_list(infra_terraform_dirs)
@@ -28,11 +77,41 @@ class Config:
         self.exclude: List[str] = utils.parse_comma_or_new_line_separated_list(exclude)
         self.go_getter_tool: str = go_getter_tool
         self.dry_run: bool = dry_run
-        self.components_download_dir: str = io.create_tmp_dir()
+        # empty download dir is replaced by a workspace of the run
+        self.components_download_dir: str = ''
         self.skip_component_repo_fetching: bool = False
         self.pr_title_template: str = pr_title_template
         self.pr_body_template: str = pr_body_template
         self.pr_labels: List[str] = utils.parse_comma_or_new_line_separated_list(pr_labels)
+        self.vendoring_batch_size: int = vendoring_batch_size
+        self.tool_timeout: int = tool_timeout
+        self.tool_concurrency: int = tool_concurrency
+        self.fetch_mode: str = fetch_mode
+        self.journal_file: str = journal_file
+        self.resume: bool = resume
+        self.shard_index: int = shard_index
+        self.shard_count: int = shard_count
+        self.schedule: str = schedule
+        self.priority: List[str] = utils.parse_comma_or_new_line_separated_list(priority)
+        self.plan: bool = plan
+        self.plan_file: str = plan_file
+        self.plan_format: str = plan_format
+        self.workspace_dir: str = workspace_dir
+        self.workspace_quota: int = workspace_quota
+        self.service: bool = service
+        self.service_interval: int = service_interval
+        self.service_port: int = service_port
+        self.service_queue_dir: str = service_queue_dir
+        self.check_remote_branches: bool = check_remote_branches
+        self.outcome_cache_file: str = outcome_cache_file
+        self.revalidate: bool = revalidate
+        self.publish_mode: str = publish_mode
+        self.pr_creation_mode: str = pr_creation_mode
+        self.group_by: str = group_by
+        self.group_patterns: List[str] = utils.parse_comma_or_new_line_separated_list(group_patterns)
+        self.tag_lookup: str = tag_lookup
+        self.stack_index_cache_file: str = stack_index_cache_file
+        self.report_file: str = report_file
 
         if affected_components_file:
             self.affected_components_file = affected_components_file
@@ -40,6 +119,11 @@ class Config:
             tmp_dir = io.create_tmp_dir()
             self.affected_components_file = os.path.join(tmp_dir, 'affected_components.json')
 
+        if affected_stacks_file:
+            self.affected_stacks_file = affected_stacks_file
+        else:
+            self.affected_stacks_file = os.path.join(os.path.dirname(self.affected_components_file), 'affected_stacks.json')
+
     def __repr__(self):
         attributes = "\n".join(f"- {key}={value!r}" for key, value in vars(self).items())
         return f"{self.__class__.__name__}({attributes})"
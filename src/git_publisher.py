@@ -0,0 +1,142 @@
+import os
+import shutil
+import logging
+import tempfile
+import threading
+from typing import Dict, List, Optional
+from tools_manager import ToolsManager, ToolExecutionError
+
+REMOTE_NAME = 'origin'
+NULL_SHA = '0' * 40
+# used when infra repo has no git identity configured, e.g. in a fresh CI checkout
+DEFAULT_AUTHOR_NAME = 'github-actions[bot]'
+DEFAULT_AUTHOR_EMAIL = '41898282+github-actions[bot]@users.noreply.github.com'
+# 'git push --porcelain' flags of refs that were pushed or already were up to date
+PUSHED_FLAGS = [' ', '+', '*', '=']
+
+
+class GitPublisher:
+    """Publishes update branches with local git instead of GitHub API.
+
+    Commits are created with git plumbing in the object database of the infra repo, on top of its HEAD commit and
+    through a temporary index, so neither working tree nor index of the repo are touched. Commits are not referenced
+    by local branches, 'push' sends all of them to the remote in a single 'git push'.
+    """
+
+    def __init__(self, tools_manager: ToolsManager, repo_dir: str, remote: str = REMOTE_NAME):
+        self.__tools_manager = tools_manager
+        self.__repo_dir = repo_dir
+        self.__remote = remote
+        self.__pending: Dict[str, str] = {}
+        self.__lock = threading.Lock()
+        self.__base_commit: Optional[str] = None
+        self.__identity_env: Optional[Dict[str, str]] = None
+
+    @property
+    def pending_branches(self) -> List[str]:
+        with self.__lock:
+            return list(self.__pending)
+
+    def refresh(self):
+        """Forgets the base commit, so commits of the next run are created on top of the current HEAD of the infra repo"""
+        with self.__lock:
+            self.__base_commit = None
+
+    def commit(self, worktree_dir: str, files_to_update: List[str], files_to_remove: List[str], branch_name: str, commit_message: str) -> str:
+        """Commits files of 'worktree_dir' on top of the base commit. The commit waits for 'push' to become 'branch_name'"""
+        base_commit = self.__get_base_commit()
+        index_dir = tempfile.mkdtemp()
+        env = dict(os.environ, GIT_INDEX_FILE=os.path.join(index_dir, 'index'), **self.__get_identity_env())
+
+        try:
+            self.__git(['read-tree', base_commit], env)
+
+            index_info = []
+            files = [file for file in files_to_update if os.path.isfile(os.path.join(worktree_dir, file))]
+
+            if files:
+                paths = [os.path.join(worktree_dir, file) for file in files]
+                blobs = self.__git(['hash-object', '-w', '--no-filters', '--stdin-paths'], env, '\n'.join(paths)).split()
+
+                for file, path, blob in zip(files, paths, blobs):
+                    mode = '100755' if os.stat(path).st_mode & 0o111 else '100644'
+                    index_info.append(f"{mode} {blob}\t{file}")
+
+            for file in files_to_remove:
+                logging.debug(f"Delete file {file}")
+                index_info.append(f"0 {NULL_SHA}\t{file}")
+
+            if index_info:
+                self.__git(['update-index', '--index-info'], env, '\n'.join(index_info) + '\n')
+
+            tree = self.__git(['write-tree'], env).strip()
+            commit = self.__git(['commit-tree', tree, '-p', base_commit, '-m', commit_message], env).strip()
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+        with self.__lock:
+            self.__pending[branch_name] = commit
+
+        logging.debug(f"Committed '{commit}' for branch '{branch_name}'")
+
+        return commit
+
+    def push(self) -> Dict[str, Optional[str]]:
+        """Pushes all pending commits to their branches in one 'git push'. Returns error of every branch, None if it was pushed"""
+        with self.__lock:
+            pending, self.__pending = self.__pending, {}
+
+        if not pending:
+            return {}
+
+        refspecs = [f"{commit}:refs/heads/{branch_name}" for branch_name, commit in pending.items()]
+        response = self.__tools_manager.run(['git', 'push', '--porcelain', self.__remote] + refspecs,
+                                            cwd=self.__repo_dir,
+                                            env=dict(os.environ, GIT_TERMINAL_PROMPT='0'))
+
+        # branches that are not reported failed together with the whole push, e.g. because of authentication
+        errors: Dict[str, Optional[str]] = {branch_name: response.error_message.strip() or 'push failed' for branch_name in pending}
+
+        # e.g. '*\t<sha>:refs/heads/component-update/vpc/1.2.3\t[new branch]'
+        for line in response.stdout.decode('utf-8').splitlines():
+            parts = line.split('\t')
+
+            if len(parts) < 3 or ':refs/heads/' not in parts[1]:
+                continue
+
+            branch_name = parts[1].split(':refs/heads/', 1)[1]
+
+            if branch_name in errors:
+                errors[branch_name] = None if parts[0] in PUSHED_FLAGS else parts[2]
+
+        logging.info(f"Pushed {len([error for error in errors.values() if error is None])} of {len(errors)} branches to '{self.__remote}'")
+
+        return errors
+
+    def __get_base_commit(self) -> str:
+        with self.__lock:
+            if self.__base_commit is None:
+                self.__base_commit = self.__git(['rev-parse', 'HEAD']).strip()
+
+            return self.__base_commit
+
+    def __get_identity_env(self) -> Dict[str, str]:
+        with self.__lock:
+            if self.__identity_env is None:
+                self.__identity_env = {}
+
+                if self.__tools_manager.run(['git', 'config', 'user.name'], cwd=self.__repo_dir).returncode != 0:
+                    self.__identity_env.update(GIT_AUTHOR_NAME=DEFAULT_AUTHOR_NAME, GIT_COMMITTER_NAME=DEFAULT_AUTHOR_NAME)
+
+                if self.__tools_manager.run(['git', 'config', 'user.email'], cwd=self.__repo_dir).returncode != 0:
+                    self.__identity_env.update(GIT_AUTHOR_EMAIL=DEFAULT_AUTHOR_EMAIL, GIT_COMMITTER_EMAIL=DEFAULT_AUTHOR_EMAIL)
+
+            return self.__identity_env
+
+    def __git(self, arguments: List[str], env: Optional[Dict[str, str]] = None, stdin: Optional[str] = None) -> str:
+        response = self.__tools_manager.run(['git'] + arguments, cwd=self.__repo_dir, env=env, stdin=stdin.encode('utf-8') if stdin is not None else None)
+
+        if response.returncode != 0:
+            raise ToolExecutionError(f"'git {arguments[0]}' failed in '{self.__repo_dir}': {response.error_message}")
+
+        return response.stdout.decode('utf-8')
@@ -1,21 +1,61 @@
+from __future__ import annotations
+
 import re
 import logging
 import os
 import base64
-from typing import Optional, Tuple, List
-import jinja2
-import git.repo
-from github import Github, InputGitTreeElement
-from github.PullRequest import PullRequest
-from jinja2 import FileSystemLoader, Template
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Optional, Set, Tuple, List
 from atmos_component import AtmosComponent
 from config import Config
+from utils.utils import LazyValue
+
+# PyGithub, GitPython and Jinja2 take a while to import, they are imported when first needed
+if TYPE_CHECKING:
+    from github import Github
+    from github.PullRequest import PullRequest
 
 
 BRANCH_PREFIX = 'component-update'
+REMOTE_NAME = 'origin'
 TEMPLATES_DIR = 'src/templates'
 DEFAULT_PR_TITLE_TEMPLATE = 'pr_title.j2.md'
 DEFAULT_PR_BODY_TEMPLATE = 'pr_body.j2.md'
+PR_CLOSE_CONCURRENCY = 4
+# PRs created by one GraphQL mutation, the same mutation labels PRs created by the previous one
+GRAPHQL_PR_BATCH_SIZE = 10
+# color GitHub gives to labels created implicitly by REST API
+DEFAULT_LABEL_COLOR = 'ededed'
+GROUP_PR_TITLE_TEMPLATE = "Update {num_components} components of group `{group_name}`"
+GROUP_PR_BODY_TEMPLATE = "This is an auto-generated PR that updates components {components} of group `{group_name}`.\n\n"
+GROUP_PR_SECTION_SEPARATOR = "\n\n---\n\n"
+# PRs updated shortly before the previous refresh are applied again, in case of clock skew with GitHub
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+def normalize_branch_component_name(component_name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9-_]+', '', component_name)
+
+
+def get_branch_component_name(branch_name: str) -> Optional[str]:
+    """Component segment of 'component-update/<component>/<tag>' branch"""
+    parts = branch_name.split('/')
+    return parts[1] if len(parts) > 2 and parts[0] == BRANCH_PREFIX else None
+
+
+class PullRequestCloseResult:
+    def __init__(self, pull_request: PullRequest, error: Optional[str] = None):
+        self.pull_request: PullRequest = pull_request
+        self.error: Optional[str] = error
+
+    @property
+    def closed(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(pull_request={self.pull_request.number!r}, error={self.error!r})"
 
 
 class PullRequestCreationResponse:
@@ -30,6 +70,8 @@ class PullRequestCreationResponse:
         self.body: str = body
         self.labels: List[str] = labels
         self.pull_request: Optional[PullRequest] = pull_request
+        self.superseded_pull_requests: List[PullRequestCloseResult] = []
+        self.error: Optional[str] = None
 
     def __repr__(self):
         attributes = "\n".join(f"- {key}={value!r}" for key, value in vars(self).items())
@@ -40,19 +82,33 @@ class GitHubProvider:
     def __init__(self, config: Config, github: Github):
         self.__config = config
         self.__github = github
-        self.__repo = self.__github.get_repo(config.infra_repo_name)
-        self.__branches = self.get_branches(config.infra_repo_dir)
-        self.__branch_to_pr_map = self.build_branch_to_pr_map()
-        self.__pull_requests = None
+        self.__lazy_repo = LazyValue(lambda: self.__github.get_repo(config.infra_repo_name))
+        self.__branches = LazyValue(lambda: self.get_branches(config.infra_repo_dir))
+        self.__refreshed_at: Optional[datetime] = None
+        self.__branch_to_pr_map = LazyValue(self.build_branch_to_pr_map)
+        self.__open_prs_index: Optional[Dict[str, Dict[int, PullRequest]]] = None
+        self.__open_prs_index_lock = threading.Lock()
+        self.__graphql_ids = LazyValue(self.__resolve_graphql_ids)
         self.__pr_title_template = self.__load_template(self.__config.pr_title_template, DEFAULT_PR_TITLE_TEMPLATE)
         self.__pr_body_template = self.__load_template(self.__config.pr_body_template, DEFAULT_PR_BODY_TEMPLATE)
 
+    @property
+    def __repo(self):
+        return self.__lazy_repo.get()
+
+    def prefetch(self):
+        """Starts loading repo, branches and PRs in background"""
+        self.__lazy_repo.prefetch()
+        self.__branches.prefetch()
+        self.__branch_to_pr_map.prefetch()
+        threading.Thread(target=self.__prefetch_open_prs_index, daemon=True).start()
+
     def build_component_branch_name(self, component_name: str, tag: str):
-        normalized_component_name: str = re.sub(r'[^a-zA-Z0-9-_]+', '', component_name)
-        return f'{BRANCH_PREFIX}/{normalized_component_name}/{tag}'
+        return f'{BRANCH_PREFIX}/{normalize_branch_component_name(component_name)}/{tag}'
 
     def build_branch_to_pr_map(self):
         branch_to_pr_map = {}
+        self.__refreshed_at = datetime.now(timezone.utc)
 
         for pull_request in self.__repo.get_pulls(state='all'):
             logging.debug(f"Found PR: '{pull_request.title}' for branch '{pull_request.head.ref}'")
@@ -60,31 +116,70 @@ class GitHubProvider:
 
         return branch_to_pr_map
 
+    def refresh(self):
+        """Applies PRs changed since previous refresh to PR indexes and re-reads branches of infra repo"""
+        self.__branches.reset()
+        self.__graphql_ids.reset()
+
+        if not self.__branch_to_pr_map.is_loaded:
+            # nothing was loaded yet, everything will be loaded fresh on first use
+            with self.__open_prs_index_lock:
+                self.__open_prs_index = None
+            return
+
+        branch_to_pr_map = self.__branch_to_pr_map.get()
+        since = self.__refreshed_at - REFRESH_OVERLAP
+        self.__refreshed_at = datetime.now(timezone.utc)
+        num_changed = 0
+
+        for pull_request in self.__repo.get_pulls(state='all', sort='updated', direction='desc'):
+            if pull_request.updated_at < since:
+                break
+
+            num_changed += 1
+            branch_to_pr_map[pull_request.head.ref] = pull_request
+
+            if pull_request.state == 'open':
+                with self.__open_prs_index_lock:
+                    if self.__open_prs_index is not None:
+                        self.__add_to_open_prs_index(pull_request)
+            else:
+                self.__remove_from_open_prs_index(pull_request)
+
+        logging.info(f"Refreshed {num_changed} PRs changed since {since.isoformat()}")
+
     def pr_for_branch_exists(self, branch_name: str):
         logging.info(f"Looking for PR with branch: {branch_name}")
-        return branch_name in self.__branch_to_pr_map
+        return branch_name in self.__branch_to_pr_map.get()
 
-    def get_branches(self, repo_dir: str):
-        branches = []
+    def get_branches(self, repo_dir: str) -> Set[str]:
+        """Update branches of infra repo. Local branches are named 'component-update/...', remote ones 'origin/component-update/...'
 
-        try:
-            repo = git.repo.Repo(repo_dir)
+        Only refs under update branch prefix are read, in a single 'git for-each-ref' that handles both loose and packed refs.
+        """
+        import git.cmd  # pylint: disable=import-outside-toplevel
 
-            for branch in repo.heads:
-                logging.debug(f"Found branch: {branch.name}")
-                branches.append(branch.name)
+        branches = set()
 
-            remote_branches = repo.remote().refs
+        try:
+            output = git.cmd.Git(repo_dir).for_each_ref('--format=%(refname)', f'refs/heads/{BRANCH_PREFIX}/', f'refs/remotes/{REMOTE_NAME}/{BRANCH_PREFIX}/')
 
-            for branch in remote_branches:
-                logging.debug(f"Found branch: {branch.name}")
-                branches.append(branch.name)
+            for ref in output.splitlines():
+                if ref.startswith('refs/heads/'):
+                    branches.add(ref[len('refs/heads/'):])
+                elif ref.startswith('refs/remotes/'):
+                    branches.add(ref[len('refs/remotes/'):])
         except Exception as exception:  # pylint: disable=broad-exception-caught
             logging.error(str(exception))
 
-        return set(branches)
+        logging.debug(f"Found {len(branches)} update branches")
+
+        return branches
 
     def create_branch_and_push_all_changes(self, repo_dir, files_to_update, files_to_remove, branch_name: str, commit_message: str):
+        import git.repo  # pylint: disable=import-outside-toplevel
+        from github import InputGitTreeElement  # pylint: disable=import-outside-toplevel
+
         repo = git.repo.Repo(repo_dir)
 
         base_branch = self.__repo.get_branch(repo.active_branch.name)
@@ -139,16 +234,55 @@ class GitHubProvider:
 
         self.__repo.create_git_ref(ref=f"refs/heads/{branch_name}", sha=commit.sha)
 
+        self.add_branch(branch_name)
+
+    def add_branch(self, branch_name: str):
+        """Adds branch pushed to remote during the run to the branch index"""
+        self.__branches.get().add(f'{REMOTE_NAME}/{branch_name}')
+
     def branch_exists(self, branch_name: str):
-        remote_branch_name = f'origin/{branch_name}'
+        remote_branch_name = f'{REMOTE_NAME}/{branch_name}'
+
+        branches = self.__branches.get()
+
+        if branch_name in branches or remote_branch_name in branches:
+            return True
+
+        # branches pushed after infra repo was checked out are visible only remotely
+        if self.__config.check_remote_branches and self.remote_branch_exists(branch_name):
+            branches.add(remote_branch_name)
+            return True
+
+        return False
 
-        return branch_name in self.__branches or remote_branch_name in self.__branches
+    def remote_branch_exists(self, branch_name: str) -> bool:
+        from github import GithubException  # pylint: disable=import-outside-toplevel
+
+        try:
+            self.__repo.get_branch(branch_name)
+            return True
+        except GithubException as error:
+            if error.status == 404:
+                return False
+            raise
 
     def open_pr(self,
                 repo_dir,
                 branch_name: str,
                 original_component: AtmosComponent,
                 updated_component: AtmosComponent) -> PullRequestCreationResponse:
+        response = self.render_pull_request(branch_name, original_component, updated_component)
+        self.create_pull_request(repo_dir, response)
+        return response
+
+    def open_prs(self, repo_dir, updates: List[Tuple[str, AtmosComponent, AtmosComponent]]) -> List[PullRequestCreationResponse]:
+        """Opens PRs of (branch name, original component, updated component) updates with batched GraphQL mutations"""
+        responses = [self.render_pull_request(branch_name, original_component, updated_component)
+                     for branch_name, original_component, updated_component in updates]
+        self.create_pull_requests(repo_dir, responses)
+        return responses
+
+    def render_pull_request(self, branch_name: str, original_component: AtmosComponent, updated_component: AtmosComponent) -> PullRequestCreationResponse:
         original_component_version_link = self.__build_component_version_link(original_component)
         updated_component_version_link = self.__build_component_version_link(updated_component)
 
@@ -175,16 +309,30 @@ class GitHubProvider:
                                               old_component_release_link=original_component_release_link,
                                               new_component_release_link=updated_component_release_link)
 
-        response = PullRequestCreationResponse(branch_name, title, body, self.__config.pr_labels)
+        return PullRequestCreationResponse(branch_name, title, body, self.__config.pr_labels)
+
+    def render_group_pull_request(self, branch_name: str, group_name: str, members: List[Tuple[AtmosComponent, AtmosComponent]]) -> PullRequestCreationResponse:
+        """PR of (original component, updated component) updates of a group. Body has a section of every component rendered from PR body template"""
+        sections = [self.render_pull_request(branch_name, original_component, updated_component).body for original_component, updated_component in members]
+        components = ', '.join(f'`{updated_component.name}`' for _, updated_component in members)
 
+        title = GROUP_PR_TITLE_TEMPLATE.format(group_name=group_name, num_components=len(members))
+        body = GROUP_PR_BODY_TEMPLATE.format(group_name=group_name, components=components) + GROUP_PR_SECTION_SEPARATOR.join(sections)
+
+        return PullRequestCreationResponse(branch_name, title, body, self.__config.pr_labels)
+
+    def create_pull_request(self, repo_dir, response: PullRequestCreationResponse):
+        """Opens rendered PR through REST API"""
         if self.__config.dry_run:
             logging.info("Skipping pull request creation in dry-run mode")
-            return response
+            return
 
-        branch = self.__repo.get_branch(branch_name)
+        import git.repo  # pylint: disable=import-outside-toplevel
+
+        branch = self.__repo.get_branch(response.branch)
         repo = git.repo.Repo(repo_dir)
-        pull_request: PullRequest = self.__repo.create_pull(title=title,
-                                                            body=body,
+        pull_request: PullRequest = self.__repo.create_pull(title=response.title,
+                                                            body=response.body,
                                                             base=repo.active_branch.name,
                                                             head=branch.name)
 
@@ -192,29 +340,230 @@ class GitHubProvider:
 
         response.pull_request = pull_request
 
-        return response
+        with self.__open_prs_index_lock:
+            if self.__open_prs_index is not None:
+                self.__add_to_open_prs_index(pull_request)
+
+    def create_pull_requests(self, repo_dir, responses: List[PullRequestCreationResponse]):
+        """Opens rendered PRs with batched GraphQL mutations.
+
+        Every mutation creates up to GRAPHQL_PR_BATCH_SIZE PRs and labels PRs created by the previous mutation, label IDs are
+        resolved once. PRs that weren't created have 'error' set, also when the whole mutation of their batch failed.
+        """
+        if self.__config.dry_run:
+            logging.info("Skipping pull request creation in dry-run mode")
+            return
+
+        if not responses:
+            return
 
-    def get_open_prs_for_component(self, component_name: str):
-        open_prs = []
+        import git.repo  # pylint: disable=import-outside-toplevel
 
-        if not self.__pull_requests:
-            self.__pull_requests = self.__repo.get_pulls(state='open')
+        base_branch = git.repo.Repo(repo_dir).active_branch.name
+        repository_id, label_ids = self.__graphql_ids.get()
+        batches = [responses[index:index + GRAPHQL_PR_BATCH_SIZE] for index in range(0, len(responses), GRAPHQL_PR_BATCH_SIZE)]
+        to_label: List[PullRequestCreationResponse] = []
 
-        for pull_request in self.__pull_requests:
-            pr_branch_name = pull_request.head.ref
-            branch_prefixs = list(filter(None, [ BRANCH_PREFIX, component_name]))
-            branch_prefix = '/'.join(branch_prefixs) + '/'
-            # e.g. component-update/component-name/
-            if pr_branch_name.startswith(branch_prefix): 
-                open_prs.append(pull_request)
+        # extra empty batch labels PRs of the last one
+        for batch in batches + [[]]:
+            if not batch and not to_label:
+                break
 
-        return open_prs
+            try:
+                data, errors = self.__run_pr_mutation(repository_id, base_branch, batch, to_label, label_ids)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                # branches are pushed already, failure of one mutation must not leave branches of next batches without PRs
+                logging.error(f"Failed to run pull requests mutation: {error}")
+                data = {}
+                errors = {f'pr{index}': str(error) for index in range(len(batch))}
+                errors.update({f'labels{index}': str(error) for index in range(len(to_label))})
+
+            for index, response in enumerate(to_label):
+                if f'labels{index}' in errors:
+                    logging.warning(f"Failed to label PR #{response.pull_request.number}: {errors[f'labels{index}']}")
+
+            for index, response in enumerate(batch):
+                created = (data.get(f'pr{index}') or {}).get('pullRequest')
+
+                if not created:
+                    response.error = errors.get(f'pr{index}', 'pull request was not created')
+                    continue
+
+                response.pull_request = self.__build_pull_request(created, response.branch)
+
+                with self.__open_prs_index_lock:
+                    if self.__open_prs_index is not None:
+                        self.__add_to_open_prs_index(response.pull_request)
+
+            to_label = [response for response in batch if response.pull_request] if label_ids else []
+
+    def get_open_prs_for_component(self, component_name: str) -> List[PullRequest]:
+        """Open update PRs of a component. Empty component name returns open update PRs of all components"""
+        index = self.__get_open_prs_index()
+
+        with self.__open_prs_index_lock:
+            if not component_name:
+                return [pull_request for pull_requests in index.values() for pull_request in pull_requests.values()]
+
+            return list(index.get(normalize_branch_component_name(component_name), {}).values())
+
+    def get_open_prs_components(self) -> List[str]:
+        """Component segments of branches that have open update PRs"""
+        index = self.__get_open_prs_index()
+
+        with self.__open_prs_index_lock:
+            return list(index.keys())
+
+    def get_num_open_prs(self, component_name: str = '') -> int:
+        index = self.__get_open_prs_index()
+
+        with self.__open_prs_index_lock:
+            if not component_name:
+                return sum(len(pull_requests) for pull_requests in index.values())
+
+            return len(index.get(normalize_branch_component_name(component_name), {}))
 
     def close_pr(self, pull_request: PullRequest, message: str):
         pull_request.edit(state='closed')
         pull_request.create_issue_comment(message)
         self.__repo.get_git_ref(f'heads/{pull_request.head.ref}').delete()
+        self.__remove_from_open_prs_index(pull_request)
+
+    def close_prs(self, pull_requests: List[PullRequest], message: str) -> List[PullRequestCloseResult]:
+        """Closes PRs concurrently. Failure to close one PR doesn't prevent closing others"""
+        if not pull_requests:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(PR_CLOSE_CONCURRENCY, len(pull_requests))) as executor:
+            futures = [(pull_request, executor.submit(self.close_pr, pull_request, message)) for pull_request in pull_requests]
+
+        results = []
+
+        for pull_request, future in futures:
+            try:
+                future.result()
+                results.append(PullRequestCloseResult(pull_request))
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                results.append(PullRequestCloseResult(pull_request, str(error)))
+
+        return results
+
+    def __prefetch_open_prs_index(self):
+        try:
+            self.__get_open_prs_index()
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            logging.debug(f"Failed to prefetch open PRs: {error}")
+
+    def __get_open_prs_index(self) -> Dict[str, Dict[int, PullRequest]]:
+        with self.__open_prs_index_lock:
+            if self.__open_prs_index is None:
+                self.__open_prs_index = {}
+
+                # single listing of open PRs, later changes of this run are applied in memory
+                for pull_request in self.__repo.get_pulls(state='open'):
+                    self.__add_to_open_prs_index(pull_request)
+
+                logging.debug(f"Indexed open PRs of {len(self.__open_prs_index)} components")
+
+            return self.__open_prs_index
 
+    def __add_to_open_prs_index(self, pull_request: PullRequest):
+        component_name = get_branch_component_name(pull_request.head.ref)
+
+        if component_name is not None:
+            self.__open_prs_index.setdefault(component_name, {})[pull_request.number] = pull_request
+
+    def __remove_from_open_prs_index(self, pull_request: PullRequest):
+        component_name = get_branch_component_name(pull_request.head.ref)
+
+        with self.__open_prs_index_lock:
+            if self.__open_prs_index is None or component_name not in self.__open_prs_index:
+                return
+
+            self.__open_prs_index[component_name].pop(pull_request.number, None)
+
+            if not self.__open_prs_index[component_name]:
+                del self.__open_prs_index[component_name]
+
+
+    def __resolve_graphql_ids(self) -> Tuple[str, List[str]]:
+        """Node IDs of infra repo and PR labels. Missing labels are created, same as REST API does when labeling"""
+        owner, name = self.__config.infra_repo_name.split('/', 1)
+        labels = self.__config.pr_labels
+
+        definitions = ['$owner: String!', '$name: String!'] + [f'$label{index}: String!' for index in range(len(labels))]
+        fields = ' '.join(f'label{index}: label(name: $label{index}) {{ id }}' for index in range(len(labels)))
+        query = f"query({', '.join(definitions)}) {{ repository(owner: $owner, name: $name) {{ id {fields} }} }}"
+        variables = dict({'owner': owner, 'name': name}, **{f'label{index}': label for index, label in enumerate(labels)})
+
+        _, result = self.__github.requester.graphql_query(query, variables)
+        repository = result['data']['repository']
+        label_ids = []
+
+        for index, label in enumerate(labels):
+            found = repository.get(f'label{index}')
+
+            if found:
+                label_ids.append(found['id'])
+            else:
+                logging.info(f"Creating label '{label}'")
+                label_ids.append(self.__repo.create_label(label, DEFAULT_LABEL_COLOR).node_id)
+
+        return repository['id'], label_ids
+
+    def __run_pr_mutation(self,
+                          repository_id: str,
+                          base_branch: str,
+                          to_create: List[PullRequestCreationResponse],
+                          to_label: List[PullRequestCreationResponse],
+                          label_ids: List[str]) -> Tuple[dict, Dict[str, str]]:
+        """Runs aliased 'createPullRequest' and 'addLabelsToLabelable' mutations. Returns data and errors by alias"""
+        definitions = []
+        fields = []
+        variables = {}
+
+        for index, response in enumerate(to_create):
+            definitions.append(f'$pr{index}: CreatePullRequestInput!')
+            fields.append(f'pr{index}: createPullRequest(input: $pr{index}) {{ pullRequest {{ id number url title }} }}')
+            variables[f'pr{index}'] = {'repositoryId': repository_id, 'baseRefName': base_branch, 'headRefName': response.branch, 'title': response.title, 'body': response.body}
+
+        for index, response in enumerate(to_label):
+            definitions.append(f'$labels{index}: AddLabelsToLabelableInput!')
+            fields.append(f'labels{index}: addLabelsToLabelable(input: $labels{index}) {{ clientMutationId }}')
+            variables[f'labels{index}'] = {'labelableId': response.pull_request.node_id, 'labelIds': label_ids}
+
+        query = f"mutation({', '.join(definitions)}) {{ {' '.join(fields)} }}"
+        requester = self.__github.requester
+
+        # errors of single mutations don't fail the others, so the response is read without 'graphql_query' that raises on any error
+        _, result = requester.requestJsonAndCheck("POST", requester.graphql_url, input={'query': query, 'variables': variables})
+        errors = {}
+
+        for error in result.get('errors') or []:
+            path = error.get('path') or []
+
+            if path:
+                errors[path[0]] = error.get('message')
+            else:
+                # whole document was rejected
+                errors.update({alias: error.get('message') for alias in variables})
+
+        return result.get('data') or {}, errors
+
+    def __build_pull_request(self, created: dict, branch_name: str) -> PullRequest:
+        from github.PullRequest import PullRequest  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        raw_data = {
+            'number': created['number'],
+            'node_id': created['id'],
+            'title': created['title'],
+            'html_url': created['url'],
+            'url': f"{self.__repo.url}/pulls/{created['number']}",
+            'state': 'open',
+            'head': {'ref': branch_name},
+        }
+
+        return self.__github.create_from_raw_data(PullRequest, raw_data)
 
     def __build_component_version_link(self, component: AtmosComponent):
         component_version_link = None
@@ -269,10 +618,12 @@ class GitHubProvider:
         return repo_uri
 
     def __load_template(self, explicit_template: str, default_template_file: str):
+        import jinja2  # pylint: disable=import-outside-toplevel
+
         if explicit_template:
-            template = Template(explicit_template)
+            template = jinja2.Template(explicit_template)
         else:
-            jenv = jinja2.Environment(loader=FileSystemLoader(TEMPLATES_DIR))
+            jenv = jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATES_DIR))
             template = jenv.get_template(default_template_file)
 
         return template
@@ -0,0 +1,65 @@
+import re
+import fnmatch
+import hashlib
+from typing import List, Optional, Tuple
+from atmos_component import AtmosComponent
+
+GROUP_BY_NONE = 'none'
+GROUP_BY_UPSTREAM = 'upstream'
+GROUP_BY_GLOB = 'glob'
+GROUP_BY_ALL = 'all'
+GROUP_BY_OPTIONS = [GROUP_BY_NONE, GROUP_BY_UPSTREAM, GROUP_BY_GLOB, GROUP_BY_ALL]
+
+# component segment of group branches is 'group-<name>', so it never clashes with component names
+GROUP_BRANCH_PREFIX = 'group-'
+GROUP_DIGEST_LENGTH = 12
+
+
+def normalize_group_name(name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9]+', '-', name).strip('-').lower()
+
+
+def build_group_digest(members: List[Tuple[str, str]]) -> str:
+    """Identifies set of (component name, version) updates, so the same group update gets the same branch in every run"""
+    content = '\n'.join(sorted(f'{name}@{version}' for name, version in members))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:GROUP_DIGEST_LENGTH]
+
+
+class ComponentGrouper:
+    """Assigns updated components to groups that are published in one branch and PR.
+
+    'upstream' groups components pulled from the same repo, 'glob' groups components matching the same pattern,
+    first matching pattern wins, and 'all' puts every component into one group. Components without a group get their own PR.
+    """
+
+    def __init__(self, group_by: str = GROUP_BY_NONE, patterns: Optional[List[str]] = None):
+        self.__group_by = group_by
+        self.__patterns = patterns or []
+
+    @property
+    def enabled(self) -> bool:
+        return self.__group_by != GROUP_BY_NONE
+
+    def get_group(self, component: AtmosComponent) -> Optional[str]:
+        if self.__group_by == GROUP_BY_ALL:
+            return GROUP_BY_ALL
+
+        if self.__group_by == GROUP_BY_UPSTREAM:
+            return self.__get_upstream_group(component.uri_repo)
+
+        if self.__group_by == GROUP_BY_GLOB:
+            for index, pattern in enumerate(self.__patterns):
+                if fnmatch.fnmatch(component.name, pattern):
+                    return normalize_group_name(pattern) or f'pattern-{index}'
+
+        return None
+
+    @staticmethod
+    def __get_upstream_group(uri_repo: str) -> Optional[str]:
+        # e.g. 'git::https://github.com/cloudposse/terraform-aws-components.git' => 'cloudposse-terraform-aws-components'
+        uri = re.sub(r'^[a-z]+::', '', uri_repo or '')
+        uri = re.sub(r'^[a-z]+://', '', uri)
+        uri = re.sub(r'^(git@)?[^/:]+[/:]', '', uri)
+        uri = re.sub(r'\.git$', '', uri)
+
+        return normalize_group_name(uri) or None
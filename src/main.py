@@ -1,18 +1,88 @@
+import sys
+import json
 import logging
+from typing import List
 import click
-from github import Github
-from component_updater import ComponentUpdater
+from component_updater import ComponentUpdater, ComponentUpdaterResponseState
 from github_provider import GitHubProvider
 from tools_manager import ToolsManager
-from config import Config
+from workspace_manager import WorkspaceManager
+from upstream_cache import UpstreamCache
+from tag_resolver import GitHubTagResolver
+from service import ComponentUpdaterService, install_signal_handlers
+from config import Config, FETCH_MODES, FETCH_MODE_GO_GETTER, PUBLISH_MODES, PUBLISH_MODE_API, PR_CREATION_MODES, PR_CREATION_MODE_REST, TAG_LOOKUPS, TAG_LOOKUP_GIT, TAG_LOOKUP_GRAPHQL
+from utils import io, utils
+import sharding
+import multi_repo
+from multi_repo import MultiRepoError
+from scheduler import SCHEDULES, SCHEDULE_VERSION_GAP
+from plan_report import PLAN_FORMATS, PLAN_FORMAT_JSON, write_plan
+from stack_indexer import write_affected_stacks
+from grouping import GROUP_BY_OPTIONS, GROUP_BY_NONE, GROUP_BY_GLOB
 
 
 def main(github_api_token: str, config: Config):
-    github_provider = GitHubProvider(config, Github(github_api_token, per_page=100, retry=3))
-    tools_manager = ToolsManager(config.go_getter_tool)
+    from github import Github  # pylint: disable=import-outside-toplevel
 
-    component_updater = ComponentUpdater(github_provider, tools_manager, config.infra_terraform_dirs, config)
-    component_updater.update()
+    github = Github(github_api_token, per_page=100, retry=3)
+    # plan mode doesn't write to GitHub, it only may look up tags of upstream repos
+    github_provider = GitHubProvider(config, github) if not config.plan else None
+    tools_manager = ToolsManager(config.go_getter_tool, config.tool_timeout, config.tool_concurrency)
+    workspace_manager = WorkspaceManager(config.workspace_dir, config.workspace_quota * 1024 * 1024)
+    tag_resolver = GitHubTagResolver(github) if config.tag_lookup == TAG_LOOKUP_GRAPHQL else None
+
+    upstream_cache = UpstreamCache(tools_manager, config, workspace_manager, tag_resolver)
+
+    component_updater = ComponentUpdater(github_provider, tools_manager, config.infra_terraform_dirs, config, workspace_manager, upstream_cache)
+
+    try:
+        if config.service:
+            service = ComponentUpdaterService(component_updater, github_provider, tools_manager, upstream_cache, workspace_manager, config)
+            install_signal_handlers(service)
+            service.run()
+        elif config.plan:
+            plans = component_updater.plan()
+            write_plan(plans, config.plan_file, config.plan_format)
+            # nothing is updated by plan, but callers still expect affected components file
+            io.serialize_to_json_file(config.affected_components_file, [])
+            io.serialize_to_json_file(config.affected_stacks_file, [])
+            logging.info(f"Found {len(plans)} outdated components. Plan saved to '{config.plan_file}'")
+        else:
+            num_updated = 0
+            num_components = 0
+
+            # responses are consumed as they finish, nothing keeps them in memory
+            for response in component_updater.iter_updates():
+                num_components += 1
+                num_updated += response.state == ComponentUpdaterResponseState.UPDATED
+
+            logging.info(f"Updated {num_updated} of {num_components} components")
+            write_affected_stacks(config.infra_repo_dir,
+                                  json.loads(io.read_file_to_string(config.affected_components_file)),
+                                  config.affected_stacks_file,
+                                  config.stack_index_cache_file)
+    finally:
+        tools_manager.log_statistics()
+        workspace_manager.cleanup()
+        workspace_manager.log_statistics()
+
+
+def main_multi_repo(github_api_token: str, configs: List[Config]):
+    from github import Github  # pylint: disable=import-outside-toplevel
+
+    # tools and workspaces are shared by all repos and use settings of the first one
+    tools_manager = ToolsManager(configs[0].go_getter_tool, configs[0].tool_timeout, configs[0].tool_concurrency)
+    workspace_manager = WorkspaceManager(configs[0].workspace_dir, configs[0].workspace_quota * 1024 * 1024)
+
+    try:
+        succeeded = multi_repo.update_repos(Github(github_api_token, per_page=100, retry=3), tools_manager, workspace_manager, configs)
+    finally:
+        tools_manager.log_statistics()
+        workspace_manager.cleanup()
+        workspace_manager.log_statistics()
+
+    if not succeeded:
+        sys.exit(1)
 
 
 @click.command()
@@ -21,11 +91,13 @@ def main(github_api_token: str, config: Config):
               required=True,
               help="GitHub API token")
 @click.option('--infra-repo-name',
-              required=True,
-              help="Organization and repo in format '<organization>/<infra-repo-name>' for infra. For example 'cloudposse/infra-live'")
+              required=False,
+              default="",
+              help="Organization and repo in format '<organization>/<infra-repo-name>' for infra. For example 'cloudposse/infra-live'. Required unless --repos-file is set")
 @click.option('--infra-repo-dir',
-              required=True,
-              help="Path to cloned infra/repo")
+              required=False,
+              default="",
+              help="Path to cloned infra/repo. Required unless --repos-file is set")
 @click.option('--infra-terraform-dirs',
               required=True,
               show_default=True,
@@ -84,6 +156,174 @@ def main(github_api_token: str, config: Config):
               show_default=True,
               default="component-update",
               help="Comma or new line separated list of labels that will added on PR creation. Default: component-update")
+@click.option('--vendoring-batch-size',
+              required=False,
+              show_default=True,
+              default=0,
+              help="Number of components to vendor with a single 'atmos vendor pull' using a generated vendor manifest. Requires atmos with vendor manifest support. 0 vendors components one by one")
+@click.option('--tool-timeout',
+              required=False,
+              show_default=True,
+              default=900,
+              help="Timeout in seconds for a single execution of atmos, go-getter, git or diff. 0 disables the timeout")
+@click.option('--tool-concurrency',
+              required=False,
+              show_default=True,
+              default=4,
+              help="Maximum number of concurrently running processes per tool. Components are vendored concurrently up to this limit")
+@click.option('--fetch-mode',
+              required=False,
+              show_default=True,
+              default=FETCH_MODE_GO_GETTER,
+              type=click.Choice(FETCH_MODES),
+              help="How component repos are fetched. 'go-getter' pulls the whole repo, 'partial-clone' makes a blobless git clone with sparse checkout of the component's path only")
+@click.option('--journal-file',
+              required=False,
+              show_default=True,
+              default="",
+              help="Path to append-only journal of component update outcomes. Required by --resume")
+@click.option('--resume',
+              required=False,
+              show_default=True,
+              default=False,
+              help="Skip components settled by previous run recorded in --journal-file and include components it updated into --affected-components-file")
+@click.option('--shard-index',
+              required=False,
+              show_default=True,
+              default=0,
+              help="Index of the shard to process, from 0 to --shard-count - 1. Components are assigned to shards by hash of their name")
+@click.option('--shard-count',
+              required=False,
+              show_default=True,
+              default=1,
+              help="Number of shards. --max-number-of-prs is split across shards")
+@click.option('--schedule',
+              required=False,
+              show_default=True,
+              default=SCHEDULE_VERSION_GAP,
+              type=click.Choice(SCHEDULES),
+              help="Order in which components spend --max-number-of-prs. 'version-gap' updates major bumps first, then minor and patch ones, 'alphabetical' keeps component names order")
+@click.option('--priority',
+              required=False,
+              show_default=True,
+              default="",
+              help="Comma or new line separated list of component names to update before others, in order of importance. For example: 'vpc,eks/*'")
+@click.option('--plan',
+              required=False,
+              show_default=True,
+              default=False,
+              help="Only resolve latest versions of components and save outdated ones to --plan-file. Nothing is vendored and nothing is written to GitHub")
+@click.option('--plan-file',
+              required=False,
+              show_default=True,
+              default="plan.json",
+              help="Path to output file of --plan")
+@click.option('--plan-format',
+              required=False,
+              show_default=True,
+              default=PLAN_FORMAT_JSON,
+              type=click.Choice(PLAN_FORMATS),
+              help="Format of --plan-file, JSON list or Markdown table")
+@click.option('--workspace-dir',
+              required=False,
+              show_default=True,
+              default="",
+              help="Directory for temporary workspaces. Workspaces are removed at the end of the run, leftovers of crashed runs are removed on start. By default system temporary directory is used")
+@click.option('--workspace-quota',
+              required=False,
+              show_default=True,
+              default=0,
+              help="Disk quota for temporary workspaces in MB. When exceeded, workspaces of already processed components are evicted, oldest first. 0 means no quota")
+@click.option('--service',
+              required=False,
+              show_default=True,
+              default=False,
+              help="Keep running and update components on every trigger: --service-interval, --service-port or --service-queue-dir. Caches are kept warm between runs")
+@click.option('--service-interval',
+              required=False,
+              show_default=True,
+              default=0,
+              help="Seconds between runs in --service mode. 0 disables interval trigger")
+@click.option('--service-port',
+              required=False,
+              show_default=True,
+              default=0,
+              help="Port of local webhook in --service mode. POST to http://127.0.0.1:<port>/ triggers a run. 0 disables webhook trigger")
+@click.option('--service-queue-dir',
+              required=False,
+              show_default=True,
+              default="",
+              help="Directory watched in --service mode. Every file dropped into it triggers a run and is removed")
+@click.option('--check-remote-branches',
+              required=False,
+              show_default=True,
+              default=False,
+              help="Check update branches that are not in local clone of infra repo on GitHub, e.g. branches pushed after the repo was checked out")
+@click.option('--outcome-cache-file',
+              required=False,
+              show_default=True,
+              default="",
+              help="Path to file with outcomes of component updates kept between runs. Components whose 'component.yaml' and latest upstream tag didn't change since "
+                   "they ended with no changes, existing branch or existing PR are skipped without vendoring")
+@click.option('--revalidate',
+              required=False,
+              show_default=True,
+              default=False,
+              help="Ignore outcomes saved in --outcome-cache-file and process every component again. The cache is refreshed with new outcomes")
+@click.option('--publish-mode',
+              required=False,
+              show_default=True,
+              default=PUBLISH_MODE_API,
+              type=click.Choice(PUBLISH_MODES),
+              help="How update branches are published. 'api' creates every commit through GitHub API, 'git' commits in local clone of infra repo "
+                   "and pushes all branches of a batch in one 'git push'. 'git' requires push access of 'origin' remote")
+@click.option('--pr-creation-mode',
+              required=False,
+              show_default=True,
+              default=PR_CREATION_MODE_REST,
+              type=click.Choice(PR_CREATION_MODES),
+              help="How PRs are opened. 'rest' opens and labels every PR right after its branch is published, 'graphql' opens PRs of all components "
+                   "of an infra terraform dir at its end with batched GraphQL mutations")
+@click.option('--group-by',
+              required=False,
+              show_default=True,
+              default=GROUP_BY_NONE,
+              type=click.Choice(GROUP_BY_OPTIONS),
+              help="Update several components in one branch and PR. 'upstream' groups components of the same upstream repo, 'glob' groups components matching "
+                   "the same --group-patterns pattern and 'all' groups all components. Every group takes one PR from --max-number-of-prs")
+@click.option('--group-patterns',
+              required=False,
+              show_default=True,
+              default="",
+              help="Comma or new line separated list of component name patterns for '--group-by glob'. Components not matching any pattern get their own PRs. For example: 'eks/*,rds*'")
+@click.option('--tag-lookup',
+              required=False,
+              show_default=True,
+              default=TAG_LOOKUP_GIT,
+              type=click.Choice(TAG_LOOKUPS),
+              help="How latest tags of upstream repos are found. 'git' fetches every upstream repo, 'graphql' looks up tags of up to 100 GitHub repos per GraphQL query "
+                   "and fetches only repos that are not on GitHub")
+@click.option('--affected-stacks-file',
+              required=False,
+              show_default=True,
+              default="affected_stacks.json",
+              help="Path to output file that will contain list of stacks deploying affected components in json format. Stacks are found in stacks dir of atmos.yaml")
+@click.option('--stack-index-cache-file',
+              required=False,
+              show_default=True,
+              default="",
+              help="Path to file with parsed stack files kept between runs. Only stack files whose content changed are parsed again")
+@click.option('--report-file',
+              required=False,
+              show_default=True,
+              default="",
+              help="Path to NDJSON report with outcome of every component. Records are appended as soon as components are done")
+@click.option('--repos-file',
+              required=False,
+              show_default=True,
+              default="",
+              help="YAML file with 'repos' list of infra repos to update in one run. Every repo sets at least 'infra-repo-name' and 'infra-repo-dir' and can override any other option. "
+                   "Upstream repos and vendored components are shared between repos, PR budget is per repo")
 def cli_main(github_api_token,
              infra_repo_name,
              infra_repo_dir,
@@ -98,11 +338,78 @@ def cli_main(github_api_token,
              affected_components_file,
              pr_title_template,
              pr_body_template,
-             pr_labels):
+             pr_labels,
+             vendoring_batch_size,
+             tool_timeout,
+             tool_concurrency,
+             fetch_mode,
+             journal_file,
+             resume,
+             shard_index,
+             shard_count,
+             schedule,
+             priority,
+             plan,
+             plan_file,
+             plan_format,
+             workspace_dir,
+             workspace_quota,
+             service,
+             service_interval,
+             service_port,
+             service_queue_dir,
+             check_remote_branches,
+             outcome_cache_file,
+             revalidate,
+             publish_mode,
+             pr_creation_mode,
+             group_by,
+             group_patterns,
+             tag_lookup,
+             affected_stacks_file,
+             stack_index_cache_file,
+             report_file,
+             repos_file):
+    if resume and not journal_file:
+        raise click.UsageError("'--resume' requires '--journal-file'")
+
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise click.UsageError("'--shard-index' should be between 0 and '--shard-count' - 1")
+
+    if not repos_file and not (infra_repo_name and infra_repo_dir):
+        raise click.UsageError("'--infra-repo-name' and '--infra-repo-dir' are required unless '--repos-file' is set")
+
+    if repos_file and (service or plan):
+        raise click.UsageError("'--repos-file' can't be used with '--service' or '--plan'")
+
+    if service and not (service_interval or service_port or service_queue_dir):
+        raise click.UsageError("'--service' requires at least one of '--service-interval', '--service-port' or '--service-queue-dir'")
+
+    if service and plan:
+        raise click.UsageError("'--service' and '--plan' can't be used together")
+
+    if group_by == GROUP_BY_GLOB and not group_patterns:
+        raise click.UsageError("'--group-by glob' requires '--group-patterns'")
+
+    if group_by != GROUP_BY_NONE and shard_count > 1:
+        raise click.UsageError("'--group-by' can't be used with '--shard-count' greater than 1")
+
     logging.basicConfig(format='[%(asctime)s] %(levelname)-7s %(message)s',
                         datefmt='%d-%m-%Y %H:%M:%S',
                         level=logging.getLevelName(log_level))
 
+    if repos_file:
+        try:
+            configs = multi_repo.load_repo_configs(repos_file, click.get_current_context().params)
+        except MultiRepoError as error:
+            raise click.UsageError(error.message)
+
+        for config in configs:
+            logging.info(f'Using configuration: {config}')
+
+        main_multi_repo(github_api_token, configs)
+        return
+
     config = Config(infra_repo_name,
                     infra_repo_dir,
                     infra_terraform_dirs,
@@ -115,13 +422,103 @@ def cli_main(github_api_token,
                     affected_components_file,
                     pr_title_template,
                     pr_body_template,
-                    pr_labels)
+                    pr_labels,
+                    vendoring_batch_size,
+                    tool_timeout,
+                    tool_concurrency,
+                    fetch_mode,
+                    journal_file,
+                    resume,
+                    shard_index,
+                    shard_count,
+                    schedule,
+                    priority,
+                    plan,
+                    plan_file,
+                    plan_format,
+                    workspace_dir,
+                    workspace_quota,
+                    service,
+                    service_interval,
+                    service_port,
+                    service_queue_dir,
+                    check_remote_branches,
+                    outcome_cache_file,
+                    revalidate,
+                    publish_mode,
+                    pr_creation_mode,
+                    group_by,
+                    group_patterns,
+                    tag_lookup,
+                    affected_stacks_file,
+                    stack_index_cache_file,
+                    report_file)
 
     logging.info(f'Using configuration: {config}')
 
     main(github_api_token, config)
 
 
+@click.command()
+@click.option('--affected-components-file',
+              required=True,
+              default="affected_components.json",
+              show_default=True,
+              help="Path to output file with merged list of affected components")
+@click.option('--affected-components-files',
+              required=True,
+              help="Comma or new line separated list of glob patterns of per-shard affected components files")
+@click.option('--affected-stacks-file',
+              required=False,
+              default="affected_stacks.json",
+              show_default=True,
+              help="Path to output file with merged list of affected stacks")
+@click.option('--affected-stacks-files',
+              required=False,
+              default="",
+              help="Comma or new line separated list of glob patterns of per-shard affected stacks files")
+@click.option('--journal-file',
+              required=False,
+              default="",
+              help="Path to output file with merged journal")
+@click.option('--journal-files',
+              required=False,
+              default="",
+              help="Comma or new line separated list of glob patterns of per-shard journal files")
+@click.option('--log-level',
+              default='INFO',
+              show_default=True,
+              required=False,
+              help="Log Level: [CRITICAL|ERROR|WARNING|INFO|DEBUG]")
+def merge_main(affected_components_file,
+               affected_components_files,
+               affected_stacks_file,
+               affected_stacks_files,
+               journal_file,
+               journal_files,
+               log_level):
+    """Merges outputs of sharded runs"""
+    logging.basicConfig(format='[%(asctime)s] %(levelname)-7s %(message)s',
+                        datefmt='%d-%m-%Y %H:%M:%S',
+                        level=logging.getLevelName(log_level))
+
+    affected = sharding.merge_affected_components_files(utils.parse_comma_or_new_line_separated_list(affected_components_files), affected_components_file)
+    logging.info(f"Merged affected components: {affected}")
+
+    if affected_stacks_files:
+        # lists of stacks are merged the same way as lists of components
+        affected_stacks = sharding.merge_affected_components_files(utils.parse_comma_or_new_line_separated_list(affected_stacks_files), affected_stacks_file)
+        logging.info(f"Merged affected stacks: {affected_stacks}")
+
+    if journal_file and journal_files:
+        sharding.merge_journal_files(utils.parse_comma_or_new_line_separated_list(journal_files), journal_file)
+
+
 if __name__ == "__main__":
-    # pylint: disable=no-value-for-parameter
-    cli_main()
+    # 'merge' subcommand is dispatched explicitly to keep 'main.py --option ...' invocation backward compatible
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        # pylint: disable=no-value-for-parameter
+        merge_main(sys.argv[2:])
+    else:
+        # pylint: disable=no-value-for-parameter
+        cli_main()
@@ -0,0 +1,129 @@
+import os
+import json
+import inspect
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List
+from component_updater import ComponentUpdater, ComponentUpdaterResponseState
+from github_provider import GitHubProvider, normalize_branch_component_name
+from tools_manager import ToolsManager
+from upstream_cache import UpstreamCache
+from tag_resolver import GitHubTagResolver
+from stack_indexer import write_affected_stacks
+from vendor_cache import VendorCache
+from workspace_manager import WorkspaceManager
+from config import Config, TAG_LOOKUP_GRAPHQL
+from utils import io
+
+if TYPE_CHECKING:
+    from github import Github
+
+CONFIG_PARAMETERS = [name for name in inspect.signature(Config.__init__).parameters if name != 'self']
+# outputs of every repo go to separate files unless repo sets its own
+PER_REPO_FILE_PARAMETERS = ['affected_components_file', 'journal_file', 'plan_file', 'outcome_cache_file', 'affected_stacks_file', 'stack_index_cache_file', 'report_file']
+
+
+class MultiRepoError(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+
+def load_repo_configs(repos_file: str, base_options: Dict[str, Any]) -> List[Config]:
+    """Builds Config of every infra repo in 'repos_file'. Repo settings override 'base_options', keys are option names like 'max-number-of-prs'.
+
+    repos:
+      - infra-repo-name: acme/infra-live
+        infra-repo-dir: /repos/infra-live
+        max-number-of-prs: 5
+    """
+    content = io.read_yaml_file(repos_file) or {}
+    repos = content.get('repos') if isinstance(content, dict) else None
+
+    if not isinstance(repos, list) or not repos:
+        raise MultiRepoError(f"'{repos_file}' should have non-empty 'repos' list")
+
+    configs = []
+
+    for index, repo in enumerate(repos):
+        if not isinstance(repo, dict):
+            raise MultiRepoError(f"Repo #{index} in '{repos_file}' should be a mapping")
+
+        repo_options = {key.replace('-', '_'): value for key, value in repo.items()}
+        unknown_options = sorted(set(repo_options) - set(CONFIG_PARAMETERS))
+
+        if unknown_options:
+            raise MultiRepoError(f"Repo #{index} in '{repos_file}' has unknown options: {', '.join(unknown_options)}")
+
+        if not repo_options.get('infra_repo_name') or not repo_options.get('infra_repo_dir'):
+            raise MultiRepoError(f"Repo #{index} in '{repos_file}' should have 'infra-repo-name' and 'infra-repo-dir'")
+
+        options = {name: value for name, value in base_options.items() if name in CONFIG_PARAMETERS}
+
+        for name in PER_REPO_FILE_PARAMETERS:
+            if name not in repo_options and options.get(name):
+                options[name] = build_per_repo_file_name(options[name], repo_options['infra_repo_name'])
+
+        for name, value in repo_options.items():
+            # lists are accepted where comma or new line separated lists are expected
+            options[name] = '\n'.join(value) if isinstance(value, list) else value
+
+        configs.append(Config(**options))
+
+    return configs
+
+
+def build_per_repo_file_name(file_name: str, infra_repo_name: str) -> str:
+    root, extension = os.path.splitext(file_name)
+    return f"{root}-{normalize_branch_component_name(infra_repo_name.replace('/', '-'))}{extension}"
+
+
+def update_repos(github: 'Github', tools_manager: ToolsManager, workspace_manager: WorkspaceManager, configs: List[Config]) -> bool:
+    """Updates components of every repo, sharing upstream repos, tag indexes and vendored trees between repos.
+
+    Every repo has its own GitHubProvider and PR budget. Failure of a repo doesn't stop other repos.
+    Returns False if any of the repos failed.
+    """
+    # upstream repos are fetched once for all infra repos, using fetch settings of the first repo
+    tag_resolver = GitHubTagResolver(github) if configs[0].tag_lookup == TAG_LOOKUP_GRAPHQL else None
+    upstream_cache = UpstreamCache(tools_manager, configs[0], workspace_manager, tag_resolver)
+    vendor_cache = VendorCache(workspace_manager)
+    failed_repos = []
+
+    for config in configs:
+        logging.info(f"Updating components of '{config.infra_repo_name}'")
+
+        try:
+            github_provider = GitHubProvider(config, github)
+            component_updater = ComponentUpdater(github_provider, tools_manager, config.infra_terraform_dirs, config, workspace_manager, upstream_cache, vendor_cache)
+            num_updated = 0
+            num_components = 0
+
+            for response in component_updater.iter_updates():
+                num_components += 1
+                num_updated += response.state == ComponentUpdaterResponseState.UPDATED
+
+            write_affected_stacks(config.infra_repo_dir,
+                                  json.loads(io.read_file_to_string(config.affected_components_file)),
+                                  config.affected_stacks_file,
+                                  config.stack_index_cache_file)
+        except SystemExit:
+            logging.error(f"Failed to update components of '{config.infra_repo_name}'")
+            failed_repos.append(config.infra_repo_name)
+            continue
+        except Exception:  # pylint: disable=broad-exception-caught
+            # e.g. GitHub, git, file system or YAML errors of one repo don't stop other repos
+            logging.exception(f"Failed to update components of '{config.infra_repo_name}'")
+            failed_repos.append(config.infra_repo_name)
+            continue
+        finally:
+            workspace_manager.reset()
+
+        logging.info(f"Updated {num_updated} of {num_components} components of '{config.infra_repo_name}'")
+
+    logging.info(f"Updated {len(configs) - len(failed_repos)} of {len(configs)} repos sharing {upstream_cache.num_repos} upstream repos")
+    vendor_cache.log_statistics()
+
+    if failed_repos:
+        logging.error(f"Failed repos: {', '.join(failed_repos)}")
+
+    return not failed_repos
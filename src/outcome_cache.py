@@ -0,0 +1,94 @@
+import os
+import json
+import logging
+import threading
+from typing import Dict, Optional
+from utils import io
+
+OUTCOME_CACHE_VERSION = 1
+
+
+class OutcomeCache:
+    """Outcomes of component updates persisted between runs.
+
+    Outcome of a component is reused while its 'component.yaml' content, the latest upstream tag and
+    vendoring setting stay the same. With 'revalidate' previous outcomes are ignored, but new ones are still saved.
+    """
+
+    def __init__(self, cache_file: str, revalidate: bool = False):
+        self.__cache_file = cache_file
+        self.__outcomes: Dict[str, dict] = {}
+        self.__lock = threading.Lock()
+        self.__num_hits = 0
+
+        if revalidate:
+            logging.info(f"Revalidating outcomes cached in '{cache_file}'")
+        else:
+            self.__load()
+
+    @property
+    def num_hits(self) -> int:
+        return self.__num_hits
+
+    def get(self, key: str, component_file: str, latest_tag: str, vendoring_enabled: bool) -> Optional[str]:
+        """Returns state name of the previous outcome, if nothing it depends on has changed"""
+        with self.__lock:
+            outcome = self.__outcomes.get(key)
+
+        if not outcome or outcome.get('latest_tag') != latest_tag or outcome.get('vendoring_enabled') != vendoring_enabled:
+            return None
+
+        if outcome.get('hash') != io.calc_file_md5_hash(component_file):
+            return None
+
+        with self.__lock:
+            self.__num_hits += 1
+
+        return outcome.get('state')
+
+    def put(self, key: str, component_file: str, latest_tag: str, vendoring_enabled: bool, state: str):
+        outcome = {
+            'hash': io.calc_file_md5_hash(component_file),
+            'latest_tag': latest_tag,
+            'vendoring_enabled': vendoring_enabled,
+            'state': state,
+        }
+
+        with self.__lock:
+            self.__outcomes[key] = outcome
+
+    def remove(self, key: str):
+        with self.__lock:
+            self.__outcomes.pop(key, None)
+
+    def save(self):
+        with self.__lock:
+            content = {'version': OUTCOME_CACHE_VERSION, 'outcomes': dict(self.__outcomes)}
+
+        cache_dir = os.path.dirname(os.path.abspath(self.__cache_file))
+        io.create_dirs(cache_dir)
+
+        # replaced atomically, so killed run never leaves truncated cache behind
+        tmp_file = f"{self.__cache_file}.tmp"
+        io.serialize_to_json_file(tmp_file, content)
+        os.replace(tmp_file, self.__cache_file)
+
+    def __load(self):
+        if not os.path.exists(self.__cache_file):
+            logging.info(f"Outcome cache '{self.__cache_file}' doesn't exist. Starting from scratch")
+            return
+
+        try:
+            with open(self.__cache_file, "r", encoding="utf-8") as file:
+                content = json.load(file)
+        except (OSError, json.JSONDecodeError) as error:
+            logging.warning(f"Ignoring unreadable outcome cache '{self.__cache_file}': {error}")
+            return
+
+        if not isinstance(content, dict) or content.get('version') != OUTCOME_CACHE_VERSION or not isinstance(content.get('outcomes'), dict):
+            logging.warning(f"Ignoring outcome cache '{self.__cache_file}' of unsupported format")
+            return
+
+        self.__outcomes = content['outcomes']
+
+        logging.info(f"Loaded {len(self.__outcomes)} outcomes from cache '{self.__cache_file}'")
@@ -0,0 +1,44 @@
+from typing import List
+from utils import io
+
+PLAN_FORMAT_JSON = 'json'
+PLAN_FORMAT_MARKDOWN = 'markdown'
+PLAN_FORMATS = [PLAN_FORMAT_JSON, PLAN_FORMAT_MARKDOWN]
+
+
+class ComponentPlan:
+    """Outdated component as reported by plan mode"""
+    def __init__(self, component: str, current_version: str, latest_version: str, bump: str):
+        self.component: str = component
+        self.current_version: str = current_version
+        self.latest_version: str = latest_version
+        self.bump: str = bump
+
+    def to_dict(self) -> dict:
+        return {
+            'component': self.component,
+            'current_version': self.current_version,
+            'latest_version': self.latest_version,
+            'bump': self.bump,
+        }
+
+    def __repr__(self):
+        attributes = ", ".join(f"{key}={value!r}" for key, value in self.to_dict().items())
+        return f"{self.__class__.__name__}({attributes})"
+
+
+def render_markdown(plans: List[ComponentPlan]) -> str:
+    lines = ['| Component | Current Version | Latest Version | Bump |',
+             '|-----------|-----------------|----------------|------|']
+
+    for plan in plans:
+        lines.append(f'| {plan.component} | {plan.current_version} | {plan.latest_version} | {plan.bump} |')
+
+    return '\n'.join(lines)
+
+
+def write_plan(plans: List[ComponentPlan], plan_file: str, plan_format: str):
+    if plan_format == PLAN_FORMAT_MARKDOWN:
+        io.save_string_to_file(plan_file, render_markdown(plans))
+    else:
+        io.serialize_to_json_file(plan_file, [plan.to_dict() for plan in plans])
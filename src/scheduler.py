@@ -0,0 +1,82 @@
+import re
+import fnmatch
+from enum import Enum
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+SCHEDULE_ALPHABETICAL = 'alphabetical'
+SCHEDULE_VERSION_GAP = 'version-gap'
+SCHEDULES = [SCHEDULE_VERSION_GAP, SCHEDULE_ALPHABETICAL]
+
+VERSION_PATTERN = re.compile(r"^v?(\d+)\.(\d+)\.(\d+)")
+
+T = TypeVar('T')
+
+
+class VersionBump(Enum):
+    NONE = 0
+    PATCH = 1
+    MINOR = 2
+    MAJOR = 3
+
+
+class VersionGap:
+    def __init__(self, current_version: str, latest_version: str):
+        current = self.__parse(current_version)
+        latest = self.__parse(latest_version)
+
+        self.bump: VersionBump = VersionBump.NONE
+        self.delta: Tuple[int, int, int] = (0, 0, 0)
+
+        if current is None or latest is None or latest <= current:
+            return
+
+        self.delta = (latest[0] - current[0], latest[1] - current[1], latest[2] - current[2])
+
+        if latest[0] != current[0]:
+            self.bump = VersionBump.MAJOR
+        elif latest[1] != current[1]:
+            self.bump = VersionBump.MINOR
+        else:
+            self.bump = VersionBump.PATCH
+
+    @staticmethod
+    def __parse(version: str) -> Optional[Tuple[int, int, int]]:
+        match = VERSION_PATTERN.match(version.strip()) if version else None
+        return (int(match.group(1)), int(match.group(2)), int(match.group(3))) if match else None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(bump={self.bump.name}, delta={self.delta})"
+
+
+class ComponentScheduler:
+    """Orders components so the PR budget is spent on the most important updates first.
+
+    Components matching earlier priority patterns go first. Within the same priority, 'version-gap' schedule puts
+    major bumps before minor and patch ones, and larger gaps first, while 'alphabetical' keeps discovery order.
+    """
+
+    def __init__(self, schedule: str = SCHEDULE_VERSION_GAP, priority: Optional[List[str]] = None):
+        self.__schedule = schedule
+        self.__priority = priority or []
+
+    def schedule(self, items: List[T], get_name: Callable[[T], str], get_version_gap: Callable[[T], VersionGap]) -> List[T]:
+        indexed = list(enumerate(items))
+
+        def sort_key(indexed_item):
+            index, item = indexed_item
+            priority = self.__get_priority(get_name(item))
+
+            if self.__schedule != SCHEDULE_VERSION_GAP:
+                return (priority, index)
+
+            gap = get_version_gap(item)
+            return (priority, -gap.bump.value, tuple(-delta for delta in gap.delta), index)
+
+        return [item for _, item in sorted(indexed, key=sort_key)]
+
+    def __get_priority(self, name: str) -> int:
+        for index, pattern in enumerate(self.__priority):
+            if fnmatch.fnmatch(name, pattern):
+                return index
+
+        return len(self.__priority)
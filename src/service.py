@@ -0,0 +1,179 @@
+import os
+import time
+import signal
+import queue
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from component_updater import ComponentUpdater, ComponentUpdaterResponseState
+from github_provider import GitHubProvider
+from tools_manager import ToolsManager
+from upstream_cache import UpstreamCache
+from workspace_manager import WorkspaceManager
+from config import Config
+
+TRIGGER_START = 'start'
+TRIGGER_INTERVAL = 'interval'
+TRIGGER_WEBHOOK = 'webhook'
+TRIGGER_QUEUE = 'queue'
+QUEUE_POLL_INTERVAL = 1
+
+
+class ComponentUpdaterService:
+    """Runs component updates on triggers in a long-running process.
+
+    Upstream clones, tag indexes, PR indexes and parsed components are kept between runs, so every run only
+    fetches new upstream tags and PRs changed since the previous run. Runs are triggered on start, every
+    'service_interval' seconds, by POST to the local webhook on 'service_port', or by files dropped into
+    'service_queue_dir'. Triggers that arrive while a run is in progress are coalesced into the next run.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self,
+                 component_updater: ComponentUpdater,
+                 github_provider: Optional[GitHubProvider],
+                 tools_manager: ToolsManager,
+                 upstream_cache: UpstreamCache,
+                 workspace_manager: WorkspaceManager,
+                 config: Config):
+        self.__component_updater = component_updater
+        self.__github_provider = github_provider
+        self.__tools_manager = tools_manager
+        self.__upstream_cache = upstream_cache
+        self.__workspace_manager = workspace_manager
+        self.__config = config
+        self.__triggers: queue.Queue = queue.Queue()
+        self.__stopped = threading.Event()
+        self.__http_server: Optional[ThreadingHTTPServer] = None
+        self.__num_runs = 0
+
+    @property
+    def num_runs(self) -> int:
+        return self.__num_runs
+
+    def trigger(self, reason: str):
+        self.__triggers.put(reason)
+
+    def stop(self):
+        self.__stopped.set()
+        self.__triggers.put(None)
+
+    def run(self, max_runs: Optional[int] = None):
+        self.__start_triggers()
+        self.trigger(TRIGGER_START)
+
+        try:
+            while not self.__stopped.is_set() and (max_runs is None or self.__num_runs < max_runs):
+                reasons = self.__wait_for_triggers()
+
+                if reasons:
+                    self.__run_once(reasons)
+        finally:
+            if self.__http_server:
+                self.__http_server.shutdown()
+
+    def __wait_for_triggers(self) -> List[str]:
+        try:
+            reason = self.__triggers.get(timeout=self.__config.service_interval or None)
+        except queue.Empty:
+            reason = TRIGGER_INTERVAL
+
+        reasons = [reason]
+
+        while not self.__triggers.empty():
+            reasons.append(self.__triggers.get_nowait())
+
+        return [reason for reason in reasons if reason is not None]
+
+    def __run_once(self, reasons: List[str]):
+        started_at = time.monotonic()
+        logging.info(f"Starting run triggered by: {', '.join(sorted(set(reasons)))}")
+
+        if self.__num_runs > 0:
+            self.__refresh()
+
+        self.__num_runs += 1
+
+        num_updated = 0
+        num_components = 0
+
+        try:
+            for response in self.__component_updater.iter_updates():
+                num_components += 1
+                num_updated += response.state == ComponentUpdaterResponseState.UPDATED
+        except SystemExit:
+            # updater exits on unrecoverable errors, in service mode only the current run fails
+            logging.error(f"Run #{self.__num_runs} failed")
+            return
+        except Exception:  # pylint: disable=broad-exception-caught
+            # e.g. GitHub, git or network errors, the service keeps running and retries on the next trigger
+            logging.exception(f"Run #{self.__num_runs} failed")
+            return
+
+        logging.info(f"Run #{self.__num_runs} finished in {time.monotonic() - started_at:.2f}s, {num_updated} of {num_components} components updated")
+
+    def __refresh(self):
+        if self.__tools_manager.is_git_repo(self.__config.infra_repo_dir) and not self.__tools_manager.git_pull(self.__config.infra_repo_dir):
+            logging.warning(f"Failed to pull '{self.__config.infra_repo_dir}'. Using current checkout")
+
+        if self.__github_provider:
+            self.__github_provider.refresh()
+
+        self.__upstream_cache.refresh()
+        self.__component_updater.refresh()
+        self.__workspace_manager.reset()
+
+    def __start_triggers(self):
+        if self.__config.service_port:
+            self.__http_server = ThreadingHTTPServer(('127.0.0.1', self.__config.service_port), self.__build_webhook_handler())
+            threading.Thread(target=self.__http_server.serve_forever, daemon=True).start()
+            logging.info(f"Listening for webhook triggers on http://127.0.0.1:{self.__config.service_port}/")
+
+        if self.__config.service_queue_dir:
+            os.makedirs(self.__config.service_queue_dir, exist_ok=True)
+            threading.Thread(target=self.__poll_queue_dir, daemon=True).start()
+            logging.info(f"Watching '{self.__config.service_queue_dir}' for queued triggers")
+
+    def __poll_queue_dir(self):
+        while not self.__stopped.is_set():
+            for entry in sorted(os.scandir(self.__config.service_queue_dir), key=lambda entry: entry.name):
+                if not entry.is_file() or entry.name.startswith('.'):
+                    continue
+
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+
+                self.trigger(f"{TRIGGER_QUEUE}:{entry.name}")
+
+            self.__stopped.wait(QUEUE_POLL_INTERVAL)
+
+    def __build_webhook_handler(self):
+        service = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def do_POST(self):  # pylint: disable=invalid-name
+                service.trigger(TRIGGER_WEBHOOK)
+                self.send_response(202)
+                self.end_headers()
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(f"runs: {service.num_runs}\n".encode("utf-8"))
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                logging.debug(f"Webhook: {format % args}")
+
+        return WebhookHandler
+
+
+def install_signal_handlers(service: ComponentUpdaterService):
+    def stop(signum, _):
+        logging.info(f"Received signal {signum}. Stopping after current run")
+        service.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
@@ -0,0 +1,54 @@
+import glob
+import json
+import hashlib
+import logging
+from typing import List
+from utils import io
+
+
+def get_shard(key: str, shard_count: int) -> int:
+    """Stable shard of a key. Unlike hash(), doesn't depend on the interpreter or PYTHONHASHSEED"""
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return int(digest[:16], 16) % shard_count
+
+
+def get_shard_budget(budget: int, shard_index: int, shard_count: int) -> int:
+    """Splits budget across shards, first shards get the remainder"""
+    return budget // shard_count + (1 if shard_index < budget % shard_count else 0)
+
+
+def find_files(patterns: List[str]) -> List[str]:
+    files = []
+
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+
+        if not matches:
+            logging.warning(f"No files found for '{pattern}'")
+
+        files.extend(file for file in matches if file not in files)
+
+    return files
+
+
+def merge_affected_components_files(patterns: List[str], output_file: str) -> List[str]:
+    affected = set()
+
+    for file in find_files(patterns):
+        logging.info(f"Merging affected components from '{file}'")
+        affected.update(json.loads(io.read_file_to_string(file)))
+
+    result = sorted(affected)
+    io.serialize_to_json_file(output_file, result)
+
+    return result
+
+
+def merge_journal_files(patterns: List[str], output_file: str):
+    with open(output_file, "w", encoding="utf-8") as output:
+        for file in find_files(patterns):
+            logging.info(f"Merging journal '{file}'")
+
+            for line in io.read_file_to_list_of_strings(file):
+                if line.strip():
+                    print(line, file=output)
@@ -0,0 +1,288 @@
+import os
+import re
+import json
+import fnmatch
+import logging
+import concurrent.futures
+from typing import Dict, List, Optional, Set
+import yaml
+from utils import io
+
+STACK_INDEX_CACHE_VERSION = 1
+STACK_FILE_EXTENSIONS = ('.yaml', '.yml', '.yaml.tmpl', '.yml.tmpl')
+DEFAULT_STACKS_BASE_PATH = 'stacks'
+DEFAULT_INCLUDED_PATHS = ['**/*']
+# handing a few files over to worker processes costs more than parsing them in place
+MIN_FILES_PER_WORKER = 16
+
+
+class StackLoader(yaml.SafeLoader):  # pylint: disable=too-many-ancestors
+    """Loads atmos YAML functions, e.g. '!terraform.output' or '!env', as empty values instead of failing on them"""
+
+
+StackLoader.add_multi_constructor('!', lambda loader, suffix, node: None)
+
+
+def parse_stack_file(stack_file: str) -> dict:
+    """Imports, vars and terraform component instances of a stack file. Unparsable files are treated as empty"""
+    try:
+        with open(stack_file, "r", encoding="utf-8") as file:
+            content = yaml.load(file, Loader=StackLoader)  # nosec B506
+    except (OSError, yaml.YAMLError) as error:
+        logging.warning(f"Failed to parse stack file '{stack_file}': {error}")
+        content = None
+
+    content = content if isinstance(content, dict) else {}
+
+    imports = []
+
+    for item in as_list(content.get('import')):
+        path = item.get('path') if isinstance(item, dict) else item
+
+        if isinstance(path, str) and path:
+            imports.append(path)
+
+    variables = {key: value for key, value in as_dict(content.get('vars')).items() if isinstance(value, (str, int, float, bool))}
+    instances = {}
+
+    for name, instance in as_dict(as_dict(content.get('components')).get('terraform')).items():
+        instance = as_dict(instance)
+        metadata = as_dict(instance.get('metadata'))
+        component = metadata.get('component') or instance.get('component')
+        inherits = [item for item in as_list(metadata.get('inherits')) if isinstance(item, str)]
+
+        # only attributes set by this file, so instances defined across several files are merged attribute by attribute
+        instances[str(name)] = {
+            'component': component if isinstance(component, str) else None,
+            'inherits': inherits or None,
+            'abstract': metadata.get('type') == 'abstract' if 'type' in metadata else None,
+        }
+
+    return {'imports': imports, 'vars': variables, 'components': instances}
+
+
+def as_dict(value) -> dict:
+    return value if isinstance(value, dict) else {}
+
+
+def as_list(value) -> list:
+    return value if isinstance(value, list) else []
+
+
+def matches_any(path: str, patterns: List[str]) -> bool:
+    # '**/' also matches files in the root of stacks dir, e.g. '**/_defaults.yaml' matches '_defaults.yaml'
+    return any(fnmatch.fnmatch(path, pattern) or (pattern.startswith('**/') and fnmatch.fnmatch(path, pattern[3:])) for pattern in patterns)
+
+
+class StackIndexer:
+    """Inverted index of terraform components to stacks that deploy them.
+
+    Every stack file is parsed once, in worker processes when there are many of them, and parsed files are
+    cached by content hash between runs. Stacks are files matching 'included_paths' and not 'excluded_paths'
+    of atmos.yaml, and they deploy components of all files they import, directly or transitively. Stacks are
+    named by 'name_pattern' when all its vars are set, otherwise by their file path without extension.
+    """
+
+    def __init__(self,
+                 stacks_dir: str,
+                 included_paths: Optional[List[str]] = None,
+                 excluded_paths: Optional[List[str]] = None,
+                 name_pattern: str = '',
+                 cache_file: str = '',
+                 max_workers: int = 0):
+        self.__stacks_dir = stacks_dir
+        self.__included_paths = included_paths or DEFAULT_INCLUDED_PATHS
+        self.__excluded_paths = excluded_paths or []
+        self.__name_pattern = name_pattern
+        self.__cache_file = cache_file
+        self.__max_workers = max_workers or os.cpu_count() or 1
+        self.__files: Dict[str, dict] = {}
+        self.__num_parsed_files = 0
+
+    @staticmethod
+    def from_atmos_config(infra_repo_dir: str, cache_file: str = '', max_workers: int = 0) -> 'StackIndexer':
+        atmos_config_file = os.path.join(infra_repo_dir, 'atmos.yaml')
+        atmos_config = as_dict(io.read_yaml_file(atmos_config_file)) if os.path.isfile(atmos_config_file) else {}
+        stacks_config = as_dict(atmos_config.get('stacks'))
+
+        stacks_dir = os.path.join(infra_repo_dir, atmos_config.get('base_path') or '', stacks_config.get('base_path') or DEFAULT_STACKS_BASE_PATH)
+
+        return StackIndexer(stacks_dir,
+                            [path for path in as_list(stacks_config.get('included_paths')) if isinstance(path, str)],
+                            [path for path in as_list(stacks_config.get('excluded_paths')) if isinstance(path, str)],
+                            stacks_config.get('name_pattern') or '',
+                            cache_file,
+                            max_workers)
+
+    @property
+    def num_parsed_files(self) -> int:
+        return self.__num_parsed_files
+
+    def build(self) -> Dict[str, List[str]]:
+        """Parses stack files that changed since the cached index and returns sorted stacks of every component"""
+        files = self.__list_stack_files()
+        cached_files = self.__load_cache()
+        hashes = {file: io.calc_file_md5_hash(os.path.join(self.__stacks_dir, file)) for file in files}
+
+        self.__files = {file: cached_files[file]['stack'] for file in files if cached_files.get(file, {}).get('hash') == hashes[file]}
+        self.__files.update(self.__parse([file for file in files if file not in self.__files]))
+
+        if self.__cache_file:
+            self.__save_cache({file: {'hash': hashes[file], 'stack': self.__files[file]} for file in files})
+
+        merged: Dict[str, dict] = {}
+        index: Dict[str, Set[str]] = {}
+        stack_files = [file for file in files if matches_any(file, self.__included_paths) and not matches_any(file, self.__excluded_paths)]
+
+        for stack_file in stack_files:
+            stack = self.__merge(stack_file, merged, set())
+            stack_name = self.__get_stack_name(stack_file, stack['vars'])
+
+            for name, instance in stack['components'].items():
+                if not instance['abstract']:
+                    index.setdefault(self.__get_component(name, stack['components'], set()), set()).add(stack_name)
+
+        logging.info(f"Indexed {len(index)} components in {len(stack_files)} stacks. Parsed {self.__num_parsed_files} of {len(files)} stack files")
+
+        return {component: sorted(stacks) for component, stacks in index.items()}
+
+    def get_affected_stacks(self, components: List[str]) -> List[str]:
+        index = self.build()
+        return sorted({stack for component in components for stack in index.get(component, [])})
+
+    def __list_stack_files(self) -> List[str]:
+        files = []
+
+        for root, dirs, names in os.walk(self.__stacks_dir):
+            dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+
+            for name in sorted(names):
+                if name.endswith(STACK_FILE_EXTENSIONS):
+                    files.append(os.path.relpath(os.path.join(root, name), self.__stacks_dir).replace(os.sep, '/'))
+
+        return files
+
+    def __parse(self, files: List[str]) -> Dict[str, dict]:
+        paths = [os.path.join(self.__stacks_dir, file) for file in files]
+        num_workers = min(self.__max_workers, len(files) // MIN_FILES_PER_WORKER)
+        self.__num_parsed_files += len(files)
+
+        if num_workers > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+                return dict(zip(files, executor.map(parse_stack_file, paths, chunksize=MIN_FILES_PER_WORKER)))
+
+        return {file: parse_stack_file(path) for file, path in zip(files, paths)}
+
+    def __merge(self, file: str, merged: Dict[str, dict], in_progress: Set[str]) -> dict:
+        """Vars and components of a file merged with everything it imports. Later imports and the file itself win"""
+        if file in merged:
+            return merged[file]
+
+        result: dict = {'vars': {}, 'components': {}}
+
+        if file in in_progress:
+            logging.warning(f"Stack file '{file}' imports itself. Ignoring the cyclic import")
+            return result
+
+        in_progress.add(file)
+
+        for path in self.__files[file]['imports']:
+            for imported_file in self.__resolve_import(file, path):
+                self.__merge_into(result, self.__merge(imported_file, merged, in_progress))
+
+        self.__merge_into(result, self.__files[file])
+        in_progress.discard(file)
+        merged[file] = result
+
+        return result
+
+    @staticmethod
+    def __merge_into(target: dict, source: dict):
+        target['vars'].update(source['vars'])
+
+        for name, instance in source['components'].items():
+            target_instance = target['components'].setdefault(name, {'component': None, 'inherits': None, 'abstract': None})
+            target_instance.update({key: value for key, value in instance.items() if value is not None})
+
+    def __resolve_import(self, file: str, path: str) -> List[str]:
+        # e.g. 'orgs/acme/_defaults', './_defaults.yaml' or 'catalog/vpc/*'
+        if path.startswith(('./', '../')):
+            path = os.path.normpath(os.path.join(os.path.dirname(file), path)).replace(os.sep, '/')
+
+        candidates = [path] if path.endswith(STACK_FILE_EXTENSIONS) else [f'{path}{extension}' for extension in STACK_FILE_EXTENSIONS]
+
+        if any(character in path for character in '*?['):
+            return [imported_file for imported_file in self.__files if imported_file != file and matches_any(imported_file, candidates)]
+
+        imported_files = [candidate for candidate in candidates if candidate in self.__files][:1]
+
+        if not imported_files:
+            logging.debug(f"Import '{path}' of stack file '{file}' not found")
+
+        return imported_files
+
+    @staticmethod
+    def __get_component(name: str, instances: Dict[str, dict], visited: Set[str]) -> str:
+        """Terraform component of an instance, set by the instance itself or by instances it inherits from"""
+        visited.add(name)
+        instance = instances[name]
+
+        if instance['component']:
+            return instance['component']
+
+        for inherited_name in instance['inherits'] or []:
+            if inherited_name in instances and inherited_name not in visited:
+                component = StackIndexer.__get_component(inherited_name, instances, visited)
+
+                if component != inherited_name:
+                    return component
+
+        return name
+
+    def __get_stack_name(self, stack_file: str, variables: dict) -> str:
+        # e.g. '{tenant}-{environment}-{stage}'
+        keys = re.findall(r'\{(\w+)\}', self.__name_pattern)
+
+        if keys and all(variables.get(key) not in (None, '') for key in keys):
+            return re.sub(r'\{(\w+)\}', lambda match: str(variables[match.group(1)]), self.__name_pattern)
+
+        for extension in STACK_FILE_EXTENSIONS:
+            if stack_file.endswith(extension):
+                return stack_file[:-len(extension)]
+
+        return stack_file
+
+    def __load_cache(self) -> Dict[str, dict]:
+        if not self.__cache_file or not os.path.exists(self.__cache_file):
+            return {}
+
+        try:
+            with open(self.__cache_file, "r", encoding="utf-8") as file:
+                content = json.load(file)
+        except (OSError, json.JSONDecodeError) as error:
+            logging.warning(f"Ignoring unreadable stack index cache '{self.__cache_file}': {error}")
+            return {}
+
+        if not isinstance(content, dict) or content.get('version') != STACK_INDEX_CACHE_VERSION or not isinstance(content.get('files'), dict):
+            logging.warning(f"Ignoring stack index cache '{self.__cache_file}' of unsupported format")
+            return {}
+
+        return content['files']
+
+    def __save_cache(self, files: Dict[str, dict]):
+        io.create_dirs(os.path.dirname(os.path.abspath(self.__cache_file)))
+
+        # replaced atomically, so killed run never leaves truncated cache behind
+        tmp_file = f"{self.__cache_file}.tmp"
+        io.serialize_to_json_file(tmp_file, {'version': STACK_INDEX_CACHE_VERSION, 'files': files})
+        os.replace(tmp_file, self.__cache_file)
+
+
+def write_affected_stacks(infra_repo_dir: str, affected_components: List[str], affected_stacks_file: str, cache_file: str = '') -> List[str]:
+    """Saves sorted names of stacks that deploy any of the affected components"""
+    affected_stacks = StackIndexer.from_atmos_config(infra_repo_dir, cache_file).get_affected_stacks(affected_components) if affected_components else []
+    io.serialize_to_json_file(affected_stacks_file, affected_stacks)
+
+    logging.info(f"Affected stacks: {affected_stacks}")
+
+    return affected_stacks
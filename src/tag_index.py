@@ -0,0 +1,76 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# release tags only: optional 'v' prefix, no pre-release part, build metadata is allowed
+SEMVER_RELEASE_TAG_PATTERN = re.compile(r"^v?(0|[1-9]\d*)\.(0|[1-9]\d*)\.(0|[1-9]\d*)(?:\+[0-9A-Za-z.-]+)?$")
+
+Version = Tuple[int, int, int]
+
+
+class TagIndex:
+    """Release tags of a single repo indexed in one pass.
+
+    Non-semver and pre-release tags are skipped. Besides the latest tag, the latest tag of every major and
+    minor version is kept, so constraint queries don't need another scan.
+    """
+
+    def __init__(self, tags: Iterable[str]):
+        self.__latest: Optional[Tuple[Version, str]] = None
+        self.__latest_by_major: Dict[int, Tuple[Version, str]] = {}
+        self.__latest_by_minor: Dict[Tuple[int, int], Tuple[Version, str]] = {}
+        self.__num_tags = 0
+        self.__num_skipped_tags = 0
+
+        for tag in tags:
+            self.__add(tag.strip().strip("'"))
+
+    @property
+    def latest(self) -> Optional[str]:
+        return self.__latest[1] if self.__latest else None
+
+    @property
+    def num_tags(self) -> int:
+        return self.__num_tags
+
+    @property
+    def num_skipped_tags(self) -> int:
+        return self.__num_skipped_tags
+
+    @property
+    def majors(self) -> List[int]:
+        return sorted(self.__latest_by_major.keys())
+
+    def latest_within_major(self, major: int) -> Optional[str]:
+        latest = self.__latest_by_major.get(major)
+        return latest[1] if latest else None
+
+    def latest_within_minor(self, major: int, minor: int) -> Optional[str]:
+        latest = self.__latest_by_minor.get((major, minor))
+        return latest[1] if latest else None
+
+    def __add(self, tag: str):
+        if not tag:
+            return
+
+        match = SEMVER_RELEASE_TAG_PATTERN.match(tag)
+
+        if not match:
+            self.__num_skipped_tags += 1
+            return
+
+        self.__num_tags += 1
+        version: Version = (int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+        if not self.__latest or version > self.__latest[0]:
+            self.__latest = (version, tag)
+
+        latest_within_major = self.__latest_by_major.get(version[0])
+        if not latest_within_major or version > latest_within_major[0]:
+            self.__latest_by_major[version[0]] = (version, tag)
+
+        latest_within_minor = self.__latest_by_minor.get(version[:2])
+        if not latest_within_minor or version > latest_within_minor[0]:
+            self.__latest_by_minor[version[:2]] = (version, tag)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(latest={self.latest!r}, num_tags={self.__num_tags}, num_skipped_tags={self.__num_skipped_tags})"
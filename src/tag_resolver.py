@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import re
+import logging
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+from tag_index import TagIndex
+
+if TYPE_CHECKING:
+    from github import Github
+
+REPOS_PER_QUERY = 100
+# max page size of GitHub GraphQL connections, repos with more tags are paged through
+TAGS_PER_PAGE = 100
+# e.g. 'github.com/cloudposse-terraform-components/aws-vpc.git', 'git::https://github.com/cloudposse/terraform-aws-components.git'
+GITHUB_URI_PATTERN = re.compile(r'^(?:git::)?(?:https://|ssh://)?(?:git@)?github\.com[/:]([\w.-]+)/([\w.-]+?)(?:\.git)?/?$')
+
+
+def parse_github_repo(uri_repo: str) -> Optional[Tuple[str, str]]:
+    """Owner and name of GitHub repo. Returns None if repo is not hosted on GitHub"""
+    match = GITHUB_URI_PATTERN.match(uri_repo or '')
+    return (match.group(1), match.group(2)) if match else None
+
+
+class GitHubTagResolver:
+    """Indexes tags of many GitHub repos with batched GraphQL queries, one query per REPOS_PER_QUERY repos.
+
+    Every query fetches one page of tags of each repo, repos with more tags are queried again until all their tags are fetched,
+    because the highest version might be tagged anywhere in the history, e.g. a back-ported patch release of an older major.
+    Repos that are not hosted on GitHub, don't exist or aren't accessible are not resolved, so they can be indexed with git instead.
+    """
+
+    def __init__(self, github: Github):
+        self.__github = github
+        self.__num_queries = 0
+
+    @property
+    def num_queries(self) -> int:
+        return self.__num_queries
+
+    def resolve(self, uri_repos: Iterable[str]) -> Dict[str, TagIndex]:
+        repos = {uri_repo: parse_github_repo(uri_repo) for uri_repo in dict.fromkeys(uri_repos)}
+        repos = [(uri_repo, repo) for uri_repo, repo in repos.items() if repo]
+        tags: Dict[str, List[str]] = {}
+        # (uri repo, (owner, name), cursor of the last fetched page)
+        pending = [(uri_repo, repo, None) for uri_repo, repo in repos]
+
+        while pending:
+            next_pending = []
+
+            for start in range(0, len(pending), REPOS_PER_QUERY):
+                batch = pending[start:start + REPOS_PER_QUERY]
+                pages = self.__resolve_batch(batch)
+
+                for uri_repo, repo, _ in batch:
+                    if uri_repo not in pages:
+                        # partially fetched tags might miss the latest version, so the repo is left for git
+                        tags.pop(uri_repo, None)
+                        continue
+
+                    names, end_cursor = pages[uri_repo]
+                    tags.setdefault(uri_repo, []).extend(names)
+
+                    if end_cursor:
+                        next_pending.append((uri_repo, repo, end_cursor))
+
+            pending = next_pending
+
+        logging.info(f"Indexed tags of {len(tags)} of {len(repos)} GitHub repos with GraphQL")
+
+        return {uri_repo: TagIndex(names) for uri_repo, names in tags.items()}
+
+    def __resolve_batch(self, repos) -> Dict[str, Tuple[List[str], Optional[str]]]:
+        """Fetches next page of tags of each repo. Returns tag names and cursor of the next page, if there is one, by uri repo"""
+        from github import GithubException  # pylint: disable=import-outside-toplevel
+
+        definitions = []
+        fields = []
+        variables = {}
+
+        for index, (_, (owner, name), cursor) in enumerate(repos):
+            definitions.extend([f'$owner{index}: String!', f'$name{index}: String!', f'$after{index}: String'])
+            fields.append(f'repo{index}: repository(owner: $owner{index}, name: $name{index}) {{ '
+                          f'refs(refPrefix: "refs/tags/", first: {TAGS_PER_PAGE}, after: $after{index}) {{ nodes {{ name }} pageInfo {{ hasNextPage endCursor }} }} }}')
+            variables[f'owner{index}'] = owner
+            variables[f'name{index}'] = name
+            variables[f'after{index}'] = cursor
+
+        query = f"query({', '.join(definitions)}) {{ {' '.join(fields)} }}"
+        requester = self.__github.requester
+
+        try:
+            # missing repos are reported as errors next to data of found ones, so the response is read without 'graphql_query' that raises on any error
+            _, result = requester.requestJsonAndCheck("POST", requester.graphql_url, input={'query': query, 'variables': variables})
+        except GithubException as error:
+            logging.warning(f"Failed to index tags of {len(repos)} repos with GraphQL: {error}")
+            return {}
+        finally:
+            self.__num_queries += 1
+
+        data = result.get('data') or {}
+        pages = {}
+
+        for index, (uri_repo, _, _) in enumerate(repos):
+            repository = data.get(f'repo{index}')
+
+            if repository and repository.get('refs'):
+                refs = repository['refs']
+                page_info = refs.get('pageInfo') or {}
+                pages[uri_repo] = ([node['name'] for node in refs['nodes']], page_info.get('endCursor') if page_info.get('hasNextPage') else None)
+
+        return pages
@@ -0,0 +1,67 @@
+# pylint: disable=wrong-import-position
+"""Benchmarks editing of 'spec.source.version' and 'spec.source.uri' in large component.yaml files.
+
+Compares the regex based rewrite (VERSION_PATTERN/URI_PATTERN) with ComponentYamlEditor.
+
+Usage: python src/tests/benchmarks/bench_component_yaml.py [number-of-lines ...]
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import component_yaml                                      # noqa: E402
+from atmos_component import VERSION_PATTERN, URI_PATTERN   # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 50_000]
+NEW_URI = 'github.com/cloudposse-terraform-components/aws-vpc.git//src?ref={{ .Version }}'
+NEW_VERSION = '2.0.0'
+
+
+def generate_manifest(number_of_lines: int) -> str:
+    """Generated manifests keep 'spec.source' at the end, after large mixins with their own 'source:' keys"""
+    lines = ["apiVersion: atmos/v1", "kind: ComponentVendorConfig", "spec:", "  mixins:"]
+
+    for i in range(number_of_lines // 4):
+        lines.append(f"    - uri: https://raw.githubusercontent.com/acme/mixins/{{{{ .Version }}}}/mixin-{i}.tf  # source: generated")
+        lines.append("      version: 1.0.0")
+        lines.append(f"      filename: mixin-{i}.tf")
+        lines.append("      # source: generated by templates")
+
+    lines.append("  source:")
+    lines.append("    uri: github.com/cloudposse/terraform-aws-components.git//modules/vpc?ref={{ .Version }}")
+    lines.append("    version: 1.107.0")
+    lines.append("    included_paths:")
+    lines.append('      - "**/**"')
+
+    return "\n".join(lines) + "\n"
+
+
+def edit_with_regex(content: str) -> str:
+    content = re.sub(URI_PATTERN, f"\\g<1>uri: {NEW_URI}", content, flags=re.DOTALL)
+    content = re.sub(VERSION_PATTERN, f"\\g<1>version: {NEW_VERSION}", content, flags=re.DOTALL)
+    return component_yaml.load_source(content)
+
+
+def edit_with_editor(content: str) -> dict:
+    editor = component_yaml.ComponentYamlEditor(content)
+    editor.set_source_value('uri', NEW_URI)
+    editor.set_source_value('version', NEW_VERSION)
+    return editor.source
+
+
+def main(sizes):
+    print(f"{'lines':>10} {'regex (s)':>12} {'editor (s)':>12}")
+
+    for size in sizes:
+        content = generate_manifest(size)
+        regex_time = min(timeit.repeat(lambda: edit_with_regex(content), number=1, repeat=3))  # pylint: disable=cell-var-from-loop
+        editor_time = min(timeit.repeat(lambda: edit_with_editor(content), number=1, repeat=3))  # pylint: disable=cell-var-from-loop
+        print(f"{size:>10} {regex_time:>12.4f} {editor_time:>12.4f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
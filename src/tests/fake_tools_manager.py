@@ -1,24 +1,35 @@
 import os
 import shutil
 import logging
+from typing import Dict, List, Optional
 from tools_manager import ToolsManager, ToolExecutionError
 from atmos_component import AtmosComponent
+from tag_index import TagIndex
+from utils import io
 
 
 TERRAFORM_COMPONENTS_REPO_PATH = 'src/tests/fixtures/terraform-aws-components'
 
 
 class FakeToolsManager(ToolsManager):
-    # pylint: disable=super-init-not-called
     def __init__(self, latest_tag, is_valid_git_repo: bool = True):
+        super().__init__('go-getter')
         self.latest_tag = latest_tag
         self.is_valid_git_repo: bool = is_valid_git_repo
+        self.num_batch_vendor_calls: int = 0
+        self.num_fetches: int = 0
+        self.num_tag_refreshes: int = 0
+        self.vendored_components: List[str] = []
 
     def atmos_vendor_component(self, component: AtmosComponent):
         logging.debug(f"Vendoring component:\n{component}")
+        self.vendored_components.append(f'{component.name}@{component.version}')
 
         source_file = os.path.join(os.getcwd(), TERRAFORM_COMPONENTS_REPO_PATH, str(component.version), 'modules', component.name)
 
+        # atmos vendoring replaces content of component dir, except 'component.yaml'
+        io.remove_dir_content(component.component_dir, [os.path.basename(component.component_file)])
+
         if os.path.exists(source_file):
             shutil.copytree(
                 source_file,
@@ -27,8 +38,32 @@ class FakeToolsManager(ToolsManager):
         else:
             raise ToolExecutionError(f"Component {component.name} not found in {source_file}")
 
+    def atmos_vendor_components(self, components: List[AtmosComponent]) -> Dict[str, Optional[ToolExecutionError]]:
+        self.num_batch_vendor_calls += 1
+        results: Dict[str, Optional[ToolExecutionError]] = {}
+
+        for component in components:
+            try:
+                self.atmos_vendor_component(component)
+                results[component.component_file] = None
+            except ToolExecutionError as error:
+                results[component.component_file] = error
+
+        return results
+
     def go_getter_pull_component_repo(self, component: AtmosComponent, destination_dir: str, download_dir: str):
         logging.debug(f"Fake pulling component repo with go_getter: {component.name}")
+        self.num_fetches += 1
+
+    def git_get_tag_index(self, git_dir: str) -> Optional[TagIndex]:
+        return TagIndex([self.latest_tag] if self.latest_tag else [])
+
+    def git_fetch_tags(self, git_dir: str) -> bool:
+        self.num_tag_refreshes += 1
+        return True
+
+    def git_pull(self, git_dir: str) -> bool:
+        return True
 
     def git_get_latest_tag(self, git_dir: str):
         return self.latest_tag
@@ -0,0 +1,134 @@
+# pylint: disable=redefined-outer-name
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+import pytest
+import jinja2
+from jinja2 import FileSystemLoader
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import component_yaml                         # noqa: E402
+from atmos_component import AtmosComponent    # noqa: E402
+from utils import io                          # noqa: E402
+
+
+TEMPLATES_DIR = 'src/tests/templates'
+TERRAFORM_DIR = 'components/terraform'
+DEFAULT_COMPONENT_TEMPLATE_FILE = 'component.yaml.j2'
+ATMOS_COMPONENT_FILE = 'component.yaml'
+
+
+@pytest.fixture
+def infra_dir():
+    return io.create_tmp_dir()
+
+
+def render_component(name: str, version: str, uri: str) -> str:
+    template = jinja2.Environment(loader=FileSystemLoader(TEMPLATES_DIR)).get_template(DEFAULT_COMPONENT_TEMPLATE_FILE)
+    return template.render(name=name, uri=uri, version=version)
+
+
+def create_component(infra_dir: str, name: str, version: str, uri: str) -> AtmosComponent:
+    component_dir = os.path.join(infra_dir, TERRAFORM_DIR, name)
+    io.create_dirs(component_dir)
+    component_file = os.path.join(component_dir, ATMOS_COMPONENT_FILE)
+    io.save_string_to_file(component_file, render_component(name, version, uri))
+    return AtmosComponent(infra_dir, TERRAFORM_DIR, component_file)
+
+
+def test_load_source_only():
+    content = render_component('vpc', '1.2.3', 'github.com/cloudposse/terraform-aws-components//modules/vpc?ref={{ .Version }}')
+
+    source = component_yaml.load_source(content)
+
+    assert source['version'] == '1.2.3'
+    assert source['uri'] == 'github.com/cloudposse/terraform-aws-components//modules/vpc?ref={{ .Version }}'
+    assert source['included_paths'] == ['**/**']
+
+
+@pytest.mark.parametrize("content", [
+    '',
+    'apiVersion: atmos/v1\n',
+    'spec: []\n',
+    'spec:\n  source:\n',
+])
+def test_load_source_missing(content: str):
+    assert component_yaml.load_source(content) == {}
+
+
+def test_load_source_duplicated_keys():
+    content = 'spec:\n  source:\n    version: 1.0.0\n    version: 2.0.0\n'
+
+    assert component_yaml.load_source(content) == component_yaml.load(content)['spec']['source']
+
+
+def test_update_version_keeps_source_in_sync(infra_dir: str):
+    component = create_component(infra_dir, 'vpc', '1.2.3', 'github.com/acme/components//modules/vpc?ref={{ .Version }}')
+
+    component.update_version('1.3.0')
+    component.persist()
+
+    assert component.version == '1.3.0'
+    assert component_yaml.load_source(io.read_file_to_string(component.component_file))['version'] == '1.3.0'
+
+
+def test_migrate_keeps_source_in_sync(infra_dir: str):
+    component = create_component(infra_dir, 'vpc', '1.2.3', 'github.com/cloudposse/terraform-aws-components.git//modules/vpc?ref={{ .Version }}')
+
+    component.migrate()
+    component.persist()
+
+    assert component.uri_repo == 'github.com/cloudposse-terraform-components/aws-vpc.git'
+    assert component.uri_path == 'src'
+
+    reloaded = AtmosComponent(infra_dir, TERRAFORM_DIR, component.component_file)
+    assert reloaded.uri_repo == component.uri_repo
+    assert reloaded.uri_path == component.uri_path
+
+
+def test_editor_preserves_formatting():
+    content = ("spec:\n"
+               "  source:\n"
+               "    uri: 'github.com/acme/components//modules/vpc?ref={{ .Version }}'  # upstream\n"
+               "    version: \"1.2.3\" # pinned\n"
+               "    included_paths:\n"
+               "      - \"**/**\"\n")
+
+    editor = component_yaml.ComponentYamlEditor(content)
+
+    assert editor.set_source_value('uri', 'github.com/acme/aws-vpc.git//src?ref={{ .Version }}')
+    assert editor.set_source_value('version', '1.10.0')
+
+    assert editor.content == ("spec:\n"
+                              "  source:\n"
+                              "    uri: 'github.com/acme/aws-vpc.git//src?ref={{ .Version }}'  # upstream\n"
+                              "    version: \"1.10.0\" # pinned\n"
+                              "    included_paths:\n"
+                              "      - \"**/**\"\n")
+    assert component_yaml.load_source(editor.content) == editor.source
+
+
+def test_editor_ignores_mixins_source():
+    content = ("spec:\n"
+               "  source:\n"
+               "    version: 1.2.3\n"
+               "  mixins:\n"
+               "    - uri: https://example.com/context.tf\n"
+               "      version: 1.0.0\n"
+               "      filename: context.tf\n")
+
+    editor = component_yaml.ComponentYamlEditor(content)
+
+    assert editor.set_source_value('version', '2.0.0')
+    assert editor.content == content.replace('version: 1.2.3', 'version: 2.0.0')
+
+
+def test_editor_does_not_edit_block_scalar():
+    content = "spec:\n  source:\n    version: |\n      1.2.3\n"
+
+    editor = component_yaml.ComponentYamlEditor(content)
+
+    assert not editor.set_source_value('version', '2.0.0')
+    assert editor.content == content
@@ -4,19 +4,22 @@
 from typing import List
 import unittest.mock as mock
 import os
+import json
 import sys
 import shutil
+import subprocess
 import pytest
 import jinja2
 from jinja2 import FileSystemLoader
-from tests.fake_tools_manager import FakeToolsManager
+from tests.fake_tools_manager import FakeToolsManager, TERRAFORM_COMPONENTS_REPO_PATH
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from component_updater import ComponentUpdater, ComponentUpdaterResponse, ComponentUpdaterResponseState  # noqa: E402
-from github_provider import GitHubProvider                                                               # noqa: E402
+from github_provider import GitHubProvider, PullRequestCreationResponse                                  # noqa: E402
 from utils import io                                                                                     # noqa: E402
-from config import Config                                                                                # noqa: E402
+from grouping import GROUP_BY_ALL                                                                        # noqa: E402
+from config import Config, PUBLISH_MODE_GIT, PR_CREATION_MODE_GRAPHQL                                    # noqa: E402
 
 
 TEMPLATES_DIR = 'src/tests/templates'
@@ -279,7 +282,8 @@ def test_no_changes_found(config: Config):
     response = responses[0]
 
     assert response.state == ComponentUpdaterResponseState.NO_CHANGES_FOUND
-    assert os.path.exists(os.path.join(response.component.infra_repo_dir, TERRAFORM_DIR, response.component.name, 'main.tf'))
+    # infra repo copy of component without changes isn't needed after its chunk and is released
+    assert not os.path.exists(os.path.join(response.component.infra_repo_dir, TERRAFORM_DIR, response.component.name, 'main.tf'))
 
 
 def test_multiple_components_updated(config: Config):
@@ -299,6 +303,24 @@ def test_multiple_components_updated(config: Config):
     assert responses[1].state == ComponentUpdaterResponseState.UPDATED
 
 
+def test_component_repo_fetched_once(config: Config):
+    # setup
+    config.skip_component_repo_fetching = False
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_1)
+
+    tools_manager = FakeToolsManager(TAG_3)
+    component_updater = ComponentUpdater(prep_github_provider(config), tools_manager, config.infra_terraform_dirs, config)
+
+    # test
+    responses = component_updater.update()
+
+    # validate
+    assert len(responses) == 2
+    assert tools_manager.num_fetches == 1
+
+
 def test_some_components_updated(config: Config):
     # setup
     prepare_infra_repo(config.infra_repo_dir)
@@ -316,6 +338,29 @@ def test_some_components_updated(config: Config):
     assert responses[1].state == ComponentUpdaterResponseState.UPDATED
 
 
+
+def test_file_removed_upstream(config: Config):
+    # setup
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_3)
+    # component is vendored in infra repo with files of its current version
+    shutil.copytree(os.path.join(TERRAFORM_COMPONENTS_REPO_PATH, TAG_3, 'modules', 'test_component_01'),
+                    os.path.join(config.infra_repo_dir, TERRAFORM_DIR, 'test_component_01'),
+                    dirs_exist_ok=True)
+
+    github_provider = prep_github_provider(config)
+    component_updater = ComponentUpdater(github_provider, FakeToolsManager(TAG_2), config.infra_terraform_dirs, config)
+
+    # test
+    responses = component_updater.update()
+
+    # validate
+    assert responses[0].state == ComponentUpdaterResponseState.UPDATED
+    _, files_to_update, files_to_remove, _, _ = github_provider.create_branch_and_push_all_changes.call_args[0]
+    assert os.path.join(TERRAFORM_DIR, 'test_component_01', 'output.tf') not in files_to_update
+    assert files_to_remove == [os.path.join(TERRAFORM_DIR, 'test_component_01', 'output.tf')]
+
+
 def test_some_vendored_and_some_not(config: Config):
     # setup
     config.vendoring_enabled = False
@@ -338,6 +383,144 @@ def test_some_vendored_and_some_not(config: Config):
     assert responses[1].state == ComponentUpdaterResponseState.COMPONENT_VENDORED_BUT_VENDORING_DISABLED
 
 
+def test_outcome_cache_skips_unchanged_components(config: Config):
+    # setup
+    config.outcome_cache_file = os.path.join(io.create_tmp_dir(), 'outcomes.json')
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+    shutil.copyfile(os.path.join(os.getcwd(), 'src/tests/fixtures/terraform-aws-components/', TAG_1, 'modules/test_component_01/main.tf'),
+                    os.path.join(config.infra_repo_dir, TERRAFORM_DIR, 'test_component_01', 'main.tf'))
+
+    ComponentUpdater(prep_github_provider(config), FakeToolsManager(TAG_2), config.infra_terraform_dirs, config).update()
+
+    # test
+    config.journal_file = os.path.join(io.create_tmp_dir(), 'journal.ndjson')
+    tools_manager = FakeToolsManager(TAG_2)
+    responses = ComponentUpdater(prep_github_provider(config), tools_manager, config.infra_terraform_dirs, config).update()
+
+    # validate
+    assert responses[0].state == ComponentUpdaterResponseState.NO_CHANGES_FOUND
+    assert tools_manager.vendored_components == []
+    # cached outcome is journaled once
+    assert len(io.read_file_to_string(config.journal_file).splitlines()) == 1
+
+    # new upstream tag invalidates cached outcome
+    tools_manager = FakeToolsManager(TAG_3)
+    responses = ComponentUpdater(prep_github_provider(config), tools_manager, config.infra_terraform_dirs, config).update()
+
+    assert responses[0].state == ComponentUpdaterResponseState.UPDATED
+    assert tools_manager.vendored_components
+
+
+def test_outcome_cache_revalidation(config: Config):
+    # setup
+    config.outcome_cache_file = os.path.join(io.create_tmp_dir(), 'outcomes.json')
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+    shutil.copyfile(os.path.join(os.getcwd(), 'src/tests/fixtures/terraform-aws-components/', TAG_1, 'modules/test_component_01/main.tf'),
+                    os.path.join(config.infra_repo_dir, TERRAFORM_DIR, 'test_component_01', 'main.tf'))
+
+    ComponentUpdater(prep_github_provider(config), FakeToolsManager(TAG_2), config.infra_terraform_dirs, config).update()
+
+    # test
+    config.revalidate = True
+    tools_manager = FakeToolsManager(TAG_2)
+    responses = ComponentUpdater(prep_github_provider(config), tools_manager, config.infra_terraform_dirs, config).update()
+
+    # validate
+    assert responses[0].state == ComponentUpdaterResponseState.NO_CHANGES_FOUND
+    assert tools_manager.vendored_components
+
+
+def test_git_publish_mode_pushes_branches_before_opening_prs(config: Config):
+    # setup
+    config.dry_run = False
+    config.publish_mode = PUBLISH_MODE_GIT
+    remote_dir = io.create_tmp_dir()
+    git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+    subprocess.run(['git', 'init', '-q', '--bare', remote_dir], check=True)
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_1)
+    for command in [['init', '-q'], ['add', '-A'], ['commit', '-q', '-m', 'init'], ['remote', 'add', 'origin', remote_dir]]:
+        subprocess.run(git + command, cwd=config.infra_repo_dir, check=True)
+
+    github_provider = prep_github_provider(config)
+    pushed_branches = []
+    github_provider.open_pr = mock.MagicMock(side_effect=lambda repo_dir, branch_name, original_component, updated_component: (
+        pushed_branches.append(subprocess.run(['git', 'branch', '--list'], cwd=remote_dir, check=True, capture_output=True).stdout.decode().split()),
+        PullRequestCreationResponse(branch_name, '', '', []))[1])
+
+    component_updater = ComponentUpdater(github_provider, FakeToolsManager(TAG_3), config.infra_terraform_dirs, config)
+
+    # test
+    responses = component_updater.update()
+
+    # validate
+    assert [response.state for response in responses] == [ComponentUpdaterResponseState.UPDATED, ComponentUpdaterResponseState.UPDATED]
+    github_provider.create_branch_and_push_all_changes.assert_not_called()
+    # both branches are on remote before the first PR is opened
+    assert pushed_branches[0] == [f'component-update/test_component_01/{TAG_3}', f'component-update/test_component_02/{TAG_3}']
+    # commits are made without touching the infra repo checkout
+    assert subprocess.run(['git', 'status', '--porcelain'], cwd=config.infra_repo_dir, check=True, capture_output=True).stdout == b''
+
+
+def test_graphql_pr_creation_mode_opens_prs_in_one_batch(config: Config):
+    # setup
+    config.pr_creation_mode = PR_CREATION_MODE_GRAPHQL
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_1)
+
+    github_provider = prep_github_provider(config)
+    github_provider.open_pr = mock.MagicMock()
+    github_provider.open_prs = mock.MagicMock(side_effect=lambda repo_dir, updates: [PullRequestCreationResponse(branch_name, '', '', []) for branch_name, _, _ in updates])
+    config.vendoring_batch_size = 1
+
+    component_updater = ComponentUpdater(github_provider, FakeToolsManager(TAG_3), config.infra_terraform_dirs, config)
+
+    # test
+    responses = component_updater.update()
+
+    # validate
+    assert [response.state for response in responses] == [ComponentUpdaterResponseState.UPDATED, ComponentUpdaterResponseState.UPDATED]
+    github_provider.open_pr.assert_not_called()
+    github_provider.open_prs.assert_called_once()
+    branches = [response.pull_request_creation_response.branch for response in responses]
+    assert branches == [f'component-update/test_component_01/{TAG_3}', f'component-update/test_component_02/{TAG_3}']
+
+
+def test_components_grouped_in_one_branch(config: Config):
+    # setup
+    config.group_by = GROUP_BY_ALL
+    config.max_number_of_prs = 1
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_1)
+
+    github_provider = prep_github_provider(config)
+    component_updater = ComponentUpdater(github_provider, FakeToolsManager(TAG_3), config.infra_terraform_dirs, config)
+
+    # test
+    responses = component_updater.update()
+
+    # validate
+    assert [response.state for response in responses] == [ComponentUpdaterResponseState.UPDATED, ComponentUpdaterResponseState.UPDATED]
+    assert responses[0].branch_name == responses[1].branch_name
+    assert responses[0].branch_name.startswith('component-update/group-all/')
+
+    github_provider.create_branch_and_push_all_changes.assert_called_once()
+    repo_dir, files_to_update, _, branch_name, _ = github_provider.create_branch_and_push_all_changes.call_args[0]
+    assert branch_name == responses[0].branch_name
+    for name in ['test_component_01', 'test_component_02']:
+        assert os.path.join(TERRAFORM_DIR, name, 'main.tf') in files_to_update
+        assert os.path.exists(os.path.join(repo_dir, TERRAFORM_DIR, name, 'main.tf'))
+
+    pull_request_creation_response = responses[0].pull_request_creation_response
+    assert pull_request_creation_response is responses[1].pull_request_creation_response
+    assert 'test_component_01' in pull_request_creation_response.body and 'test_component_02' in pull_request_creation_response.body
+
+
 def test_missing_component(config: Config):
     # setup
     prepare_infra_repo(config.infra_repo_dir)
@@ -353,6 +536,166 @@ def test_missing_component(config: Config):
     assert responses[0].state == ComponentUpdaterResponseState.FAILED_TO_VENDOR_COMPONENT
 
 
+def test_batch_vendoring(config: Config):
+    # setup
+    config.vendoring_batch_size = 10
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'missing_component', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_1)
+
+    tools_manager = FakeToolsManager(TAG_3)
+    component_updater = ComponentUpdater(prep_github_provider(config), tools_manager, config.infra_terraform_dirs, config)
+
+    # test
+    responses = component_updater.update()
+
+    # validate
+    assert tools_manager.num_batch_vendor_calls == 1
+    assert len(responses) == 3
+    assert responses[0].state == ComponentUpdaterResponseState.FAILED_TO_VENDOR_COMPONENT
+    assert responses[1].state == ComponentUpdaterResponseState.UPDATED
+    assert responses[2].state == ComponentUpdaterResponseState.UPDATED
+    assert os.path.exists(os.path.join(responses[1].component.infra_repo_dir, TERRAFORM_DIR, responses[1].component.name, 'output.tf'))
+
+
+def test_batch_vendoring_max_number_of_prs(config: Config):
+    # setup
+    config.vendoring_batch_size = 10
+    config.max_number_of_prs = 1
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_1)
+
+    component_updater = ComponentUpdater(prep_github_provider(config), FakeToolsManager(TAG_3), config.infra_terraform_dirs, config)
+
+    # test
+    responses = component_updater.update()
+
+    # validate
+    assert len(responses) == 2
+    assert responses[0].state == ComponentUpdaterResponseState.UPDATED
+    assert responses[1].state == ComponentUpdaterResponseState.MAX_PRS_REACHED
+
+
+def test_max_number_of_prs_spent_on_most_outdated_components(config: Config):
+    # setup
+    config.vendoring_batch_size = 10
+    config.max_number_of_prs = 1
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_2)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_1)
+
+    tools_manager = FakeToolsManager(TAG_3)
+    component_updater = ComponentUpdater(prep_github_provider(config), tools_manager, config.infra_terraform_dirs, config)
+
+    # test
+    responses = component_updater.update()
+
+    # validate
+    assert len(responses) == 2
+    assert responses[0].state == ComponentUpdaterResponseState.MAX_PRS_REACHED
+    assert responses[1].state == ComponentUpdaterResponseState.UPDATED
+    # component out of budget is not vendored at all
+    assert tools_manager.num_batch_vendor_calls == 1
+
+
+def test_priority_overrides_version_gap(config: Config):
+    # setup
+    config.max_number_of_prs = 1
+    config.priority = ['test_component_01']
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_2)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_1)
+
+    component_updater = ComponentUpdater(prep_github_provider(config), FakeToolsManager(TAG_3), config.infra_terraform_dirs, config)
+
+    # test
+    responses = component_updater.update()
+
+    # validate
+    assert responses[0].state == ComponentUpdaterResponseState.UPDATED
+    assert responses[1].state == ComponentUpdaterResponseState.MAX_PRS_REACHED
+
+
+def test_resume_skips_settled_components(config: Config):
+    # setup
+    config.journal_file = os.path.join(io.create_tmp_dir(), 'journal.ndjson')
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'missing_component', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_3)
+
+    component_updater = ComponentUpdater(prep_github_provider(config), FakeToolsManager(TAG_3), config.infra_terraform_dirs, config)
+    component_updater.update()
+
+    # without resume, journal of previous update doesn't make the same updater skip anything
+    assert len(component_updater.update()) == 3
+
+    config.resume = True
+    component_updater = ComponentUpdater(prep_github_provider(config), FakeToolsManager(TAG_3), config.infra_terraform_dirs, config)
+
+    # test
+    responses = component_updater.update()
+
+    # validate
+    assert len(responses) == 1
+    assert responses[0].component.name == 'missing_component'
+    assert responses[0].state == ComponentUpdaterResponseState.FAILED_TO_VENDOR_COMPONENT
+    assert json.loads(io.read_file_to_string(config.affected_components_file)) == ['test_component_01']
+
+
+def test_responses_are_streamed_as_they_finish(config: Config):
+    # setup
+    config.report_file = os.path.join(io.create_tmp_dir(), 'report.ndjson')
+    config.infra_terraform_dirs = [TERRAFORM_DIR, 'components/terraform-extra']
+    prepare_infra_repo(config.infra_repo_dir)
+    for name in ['test_component_01', 'test_component_02']:
+        create_component(config.infra_repo_dir, name, TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_03', '')
+    shutil.move(os.path.join(config.infra_repo_dir, TERRAFORM_DIR, 'test_component_02'), os.path.join(config.infra_repo_dir, 'components/terraform-extra/test_component_02'))
+
+    updates = ComponentUpdater(prep_github_provider(config), FakeToolsManager(TAG_3), config.infra_terraform_dirs, config).iter_updates()
+
+    # test
+    first_response = next(updates)
+
+    # validate
+    # component without version is done before anything is vendored, and is already in the report
+    assert first_response.component.name == 'test_component_03'
+    assert len(io.read_file_to_list_of_strings(config.report_file)) == 1
+
+    assert [response.component.name for response in updates] == ['test_component_01', 'test_component_02']
+
+    records = [json.loads(line) for line in io.read_file_to_list_of_strings(config.report_file)]
+    assert [(record['component'], record['state']) for record in records] == [('test_component_03', 'NO_VERSION_FOUND_IN_SOURCE_YAML'),
+                                                                              ('test_component_01', 'UPDATED'),
+                                                                              ('test_component_02', 'UPDATED')]
+    # affected components of every terraform dir are kept
+    assert json.loads(io.read_file_to_string(config.affected_components_file)) == ['test_component_01', 'test_component_02']
+
+
+def test_sharding(config: Config):
+    # setup
+    prepare_infra_repo(config.infra_repo_dir)
+    for name in ['test_component_01', 'test_component_02', 'test_component_03', 'test_component_04']:
+        create_component(config.infra_repo_dir, name, TAG_3)
+
+    names = []
+
+    for shard_index in range(2):
+        config.shard_index = shard_index
+        config.shard_count = 2
+        component_updater = ComponentUpdater(prep_github_provider(config), FakeToolsManager(TAG_3), config.infra_terraform_dirs, config)
+
+        # test
+        names.append([response.component.name for response in component_updater.update()])
+
+    # validate
+    assert not set(names[0]) & set(names[1])
+    assert sorted(names[0] + names[1]) == ['test_component_01', 'test_component_02', 'test_component_03', 'test_component_04']
+
+
 @pytest.mark.parametrize("include, exclude, expected_updated_components", [
     ([''], [''], []),
     (['*'], [''], ['test_component_01', 'test_component_02', 'test_component_03']),
@@ -430,3 +773,44 @@ def test_updated_title_body_and_labels(config: Config):
     assert response.pull_request_creation_response.title == "Updated `test_component_01` to version 10.2.1"
     assert response.pull_request_creation_response.body == 'Updated `test_component_01` to version 10.2.1'
     assert response.pull_request_creation_response.labels == ['component-update', 'auto-update', 'infra']
+
+
+def test_plan(config: Config):
+    # setup
+    config.plan = True
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_2)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_03', TAG_3)
+
+    tools_manager = FakeToolsManager(TAG_3)
+    component_updater = ComponentUpdater(None, tools_manager, config.infra_terraform_dirs, config)
+
+    # test
+    plans = component_updater.plan()
+
+    # validate
+    assert [plan.to_dict() for plan in plans] == [
+        {'component': 'test_component_02', 'current_version': TAG_1, 'latest_version': TAG_3, 'bump': 'major'},
+        {'component': 'test_component_01', 'current_version': TAG_2, 'latest_version': TAG_3, 'bump': 'major'},
+    ]
+    assert tools_manager.num_batch_vendor_calls == 0
+
+
+def test_plan_with_v_prefixed_tags(config: Config):
+    # setup
+    config.plan = True
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_3)
+
+    tools_manager = FakeToolsManager(f'v{TAG_3}')
+    component_updater = ComponentUpdater(None, tools_manager, config.infra_terraform_dirs, config)
+
+    # test
+    plans = component_updater.plan()
+
+    # validate
+    assert [plan.to_dict() for plan in plans] == [
+        {'component': 'test_component_01', 'current_version': TAG_1, 'latest_version': f'v{TAG_3}', 'bump': 'major'},
+    ]
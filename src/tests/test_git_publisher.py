@@ -0,0 +1,106 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from git_publisher import GitPublisher      # noqa: E402
+from tools_manager import ToolsManager      # noqa: E402
+from utils import io                        # noqa: E402
+
+GIT = ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+
+
+def git(repo_dir: str, *arguments: str) -> str:
+    return subprocess.run(GIT + list(arguments), cwd=repo_dir, check=True, capture_output=True).stdout.decode('utf-8')
+
+
+def prepare_repo() -> str:
+    """Clone of a local bare remote with one commit"""
+    remote_dir = io.create_tmp_dir()
+    git(remote_dir, 'init', '-q', '--bare')
+
+    repo_dir = io.create_tmp_dir()
+    git(repo_dir, 'clone', '-q', remote_dir, '.')
+    io.create_dirs(os.path.join(repo_dir, 'components', 'vpc'))
+    io.save_string_to_file(os.path.join(repo_dir, 'components', 'vpc', 'main.tf'), 'old')
+    io.save_string_to_file(os.path.join(repo_dir, 'components', 'vpc', 'outputs.tf'), 'outputs')
+    git(repo_dir, 'add', '-A')
+    git(repo_dir, 'commit', '-q', '-m', 'init')
+    git(repo_dir, 'push', '-q', 'origin', 'HEAD')
+
+    return repo_dir
+
+
+def prepare_worktree(repo_dir: str, content: str) -> str:
+    worktree_dir = io.create_tmp_dir()
+    io.copy_dirs(repo_dir, worktree_dir)
+    io.save_string_to_file(os.path.join(worktree_dir, 'components', 'vpc', 'main.tf'), content)
+    io.save_string_to_file(os.path.join(worktree_dir, 'components', 'vpc', 'versions.tf'), 'versions')
+    os.remove(os.path.join(worktree_dir, 'components', 'vpc', 'outputs.tf'))
+    return worktree_dir
+
+
+def test_commits_are_pushed_in_one_push():
+    repo_dir = prepare_repo()
+    tools_manager = ToolsManager('go-getter')
+    publisher = GitPublisher(tools_manager, repo_dir)
+    head = git(repo_dir, 'rev-parse', 'HEAD').strip()
+
+    for version in ['1.0.0', '2.0.0']:
+        publisher.commit(prepare_worktree(repo_dir, version),
+                         ['components/vpc/main.tf', 'components/vpc/versions.tf'],
+                         ['components/vpc/outputs.tf'],
+                         f'component-update/vpc/{version}',
+                         f'Update vpc to {version}')
+
+    # working tree, index and local branches of infra repo are untouched
+    assert git(repo_dir, 'status', '--porcelain') == ''
+    assert git(repo_dir, 'branch', '--list', 'component-update/*') == ''
+
+    errors = publisher.push()
+
+    assert errors == {'component-update/vpc/1.0.0': None, 'component-update/vpc/2.0.0': None}
+    assert publisher.pending_branches == []
+    assert len([execution for execution in tools_manager.executions if execution.command[1] == 'push']) == 1
+
+    git(repo_dir, 'fetch', '-q', 'origin')
+    assert git(repo_dir, 'show', 'origin/component-update/vpc/2.0.0:components/vpc/main.tf') == '2.0.0\n'
+    assert git(repo_dir, 'ls-tree', '--name-only', 'origin/component-update/vpc/1.0.0', 'components/vpc/').split() == ['components/vpc/main.tf', 'components/vpc/versions.tf']
+    assert git(repo_dir, 'rev-parse', 'origin/component-update/vpc/1.0.0^').strip() == head
+
+
+def test_rejected_branch_is_reported():
+    repo_dir = prepare_repo()
+    publisher = GitPublisher(ToolsManager('go-getter'), repo_dir)
+
+    # branch on remote that isn't an ancestor of new commit rejects non-fast-forward push
+    git(repo_dir, 'commit', '-q', '--allow-empty', '-m', 'other')
+    git(repo_dir, 'push', '-q', 'origin', 'HEAD:refs/heads/component-update/vpc/1.0.0')
+    git(repo_dir, 'reset', '-q', '--hard', 'HEAD^')
+
+    for version in ['1.0.0', '2.0.0']:
+        publisher.commit(prepare_worktree(repo_dir, version), ['components/vpc/main.tf'], [], f'component-update/vpc/{version}', f'Update vpc to {version}')
+
+    errors = publisher.push()
+
+    assert errors['component-update/vpc/1.0.0']
+    assert errors['component-update/vpc/2.0.0'] is None
+
+
+def test_commits_are_based_on_current_head_after_refresh():
+    repo_dir = prepare_repo()
+    publisher = GitPublisher(ToolsManager('go-getter'), repo_dir)
+
+    publisher.commit(prepare_worktree(repo_dir, '1.0.0'), ['components/vpc/main.tf'], [], 'component-update/vpc/1.0.0', 'Update vpc to 1.0.0')
+
+    # e.g. infra repo pulled between runs of the service
+    git(repo_dir, 'commit', '-q', '--allow-empty', '-m', 'merged')
+    head = git(repo_dir, 'rev-parse', 'HEAD').strip()
+    publisher.refresh()
+
+    commit = publisher.commit(prepare_worktree(repo_dir, '2.0.0'), ['components/vpc/main.tf'], [], 'component-update/vpc/2.0.0', 'Update vpc to 2.0.0')
+
+    assert git(repo_dir, 'rev-parse', f'{commit}^').strip() == head
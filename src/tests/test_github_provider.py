@@ -0,0 +1,232 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+import subprocess
+import unittest.mock as mock
+from datetime import datetime, timedelta, timezone
+from github import GithubException
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from github_provider import GitHubProvider  # noqa: E402
+from config import Config                   # noqa: E402
+from utils import io                        # noqa: E402
+
+
+def create_pull_request(number: int, branch_name: str):
+    pull_request = mock.MagicMock()
+    pull_request.number = number
+    pull_request.head.ref = branch_name
+    return pull_request
+
+
+def prep_github_provider(pull_requests, check_remote_branches: bool = False):
+    config = Config('test/repo', io.create_tmp_dir(), 'components/terraform', True, 10, '*', '', '', False)
+    config.check_remote_branches = check_remote_branches
+    github = mock.MagicMock()
+    github.get_repo.return_value.get_pulls.return_value = pull_requests
+    return GitHubProvider(config, github), github.get_repo.return_value
+
+
+def test_open_prs_index():
+    github_provider, repo = prep_github_provider([create_pull_request(1, 'component-update/vpc/1.0.0'),
+                                                  create_pull_request(2, 'component-update/vpc/1.1.0'),
+                                                  create_pull_request(3, 'component-update/eks-cluster/2.0.0'),
+                                                  create_pull_request(4, 'feature/vpc')])
+
+    assert github_provider.get_num_open_prs() == 3
+    assert github_provider.get_num_open_prs('vpc') == 2
+    assert [pull_request.number for pull_request in github_provider.get_open_prs_for_component('eks-cluster')] == [3]
+    assert github_provider.get_open_prs_for_component('rds') == []
+    assert sorted(github_provider.get_open_prs_components()) == ['eks-cluster', 'vpc']
+
+    # open PRs are listed only once
+    assert repo.get_pulls.call_args_list.count(mock.call(state='open')) == 1
+
+
+def test_open_prs_index_updated_on_close():
+    pull_request = create_pull_request(1, 'component-update/vpc/1.0.0')
+    github_provider, _ = prep_github_provider([pull_request, create_pull_request(2, 'component-update/vpc/1.1.0')])
+
+    assert github_provider.get_num_open_prs('vpc') == 2
+
+    github_provider.close_pr(pull_request, 'Closing')
+
+    assert [pull_request.number for pull_request in github_provider.get_open_prs_for_component('vpc')] == [2]
+    assert github_provider.get_num_open_prs() == 1
+
+
+def test_state_is_loaded_lazily():
+    github_provider, repo = prep_github_provider([])
+
+    repo.get_pulls.assert_not_called()
+    assert not github_provider.pr_for_branch_exists('component-update/vpc/1.0.0')
+    repo.get_pulls.assert_called_once_with(state='all')
+
+
+def test_close_prs_reports_partial_failures():
+    pull_requests = [create_pull_request(number, f'component-update/vpc/1.{number}.0') for number in range(1, 4)]
+    pull_requests[1].create_issue_comment.side_effect = GithubException(500, 'Server error', None)
+    github_provider, _ = prep_github_provider(pull_requests)
+
+    results = github_provider.close_prs(pull_requests, 'Closing')
+
+    assert [(result.pull_request.number, result.closed) for result in results] == [(1, True), (2, False), (3, True)]
+    assert 'Server error' in results[1].error
+    for pull_request in pull_requests:
+        pull_request.edit.assert_called_once_with(state='closed')
+
+
+def test_close_prs_reports_connection_errors():
+    pull_requests = [create_pull_request(number, f'component-update/vpc/1.{number}.0') for number in range(1, 4)]
+    pull_requests[1].edit.side_effect = ConnectionError('Connection reset by peer')
+    github_provider, _ = prep_github_provider(pull_requests)
+    assert github_provider.get_num_open_prs('vpc') == 3
+
+    results = github_provider.close_prs(pull_requests, 'Closing')
+
+    assert [(result.pull_request.number, result.closed) for result in results] == [(1, True), (2, False), (3, True)]
+    assert 'Connection reset by peer' in results[1].error
+    # only PRs that were actually closed are dropped from open PRs
+    assert [pull_request.number for pull_request in github_provider.get_open_prs_for_component('vpc')] == [2]
+
+
+def test_refresh_applies_changed_prs():
+    github_provider, repo = prep_github_provider([create_pull_request(1, 'component-update/vpc/1.0.0')])
+    assert github_provider.get_num_open_prs('vpc') == 1
+    assert github_provider.pr_for_branch_exists('component-update/vpc/1.0.0')
+
+    closed = create_pull_request(1, 'component-update/vpc/1.0.0')
+    closed.state = 'closed'
+    closed.updated_at = datetime.now(timezone.utc)
+    opened = create_pull_request(2, 'component-update/rds/2.0.0')
+    opened.state = 'open'
+    opened.updated_at = datetime.now(timezone.utc)
+    stale = create_pull_request(3, 'component-update/eks/3.0.0')
+    stale.state = 'open'
+    stale.updated_at = datetime.now(timezone.utc) - timedelta(days=1)
+    repo.get_pulls.return_value = [opened, closed, stale]
+
+    github_provider.refresh()
+
+    assert github_provider.get_num_open_prs('vpc') == 0
+    assert github_provider.get_num_open_prs('rds') == 1
+    assert github_provider.get_num_open_prs('eks') == 0
+    assert github_provider.pr_for_branch_exists('component-update/rds/2.0.0')
+
+
+def test_branch_index_is_limited_to_update_branches():
+    repo_dir = io.create_tmp_dir()
+    git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+    subprocess.run(['git', 'init', '-q', repo_dir], check=True)
+    subprocess.run(git + ['commit', '-q', '--allow-empty', '-m', 'init'], cwd=repo_dir, check=True)
+    for branch in ['component-update/vpc/1.0.0', 'feature/component-update']:
+        subprocess.run(['git', 'branch', branch], cwd=repo_dir, check=True)
+    # packed refs are read as well as loose ones
+    subprocess.run(['git', 'pack-refs', '--all'], cwd=repo_dir, check=True)
+    subprocess.run(['git', 'update-ref', 'refs/remotes/origin/component-update/rds/2.0.0', 'HEAD'], cwd=repo_dir, check=True)
+    subprocess.run(['git', 'update-ref', 'refs/remotes/origin/main', 'HEAD'], cwd=repo_dir, check=True)
+
+    github_provider, _ = prep_github_provider([])
+
+    assert github_provider.get_branches(repo_dir) == {'component-update/vpc/1.0.0', 'origin/component-update/rds/2.0.0'}
+
+
+def test_branch_exists_checks_remote():
+    github_provider, repo = prep_github_provider([])
+    repo.get_branch.side_effect = lambda name: mock.MagicMock() if name == 'component-update/vpc/1.0.0' else (_ for _ in ()).throw(GithubException(404, 'Not Found', None))
+
+    assert not github_provider.branch_exists('component-update/vpc/1.0.0')
+
+    github_provider, repo = prep_github_provider([], check_remote_branches=True)
+    repo.get_branch.side_effect = lambda name: mock.MagicMock() if name == 'component-update/vpc/1.0.0' else (_ for _ in ()).throw(GithubException(404, 'Not Found', None))
+
+    assert github_provider.branch_exists('component-update/vpc/1.0.0')
+    assert not github_provider.branch_exists('component-update/vpc/1.1.0')
+    # found remote branch is added to the index
+    assert github_provider.branch_exists('component-update/vpc/1.0.0')
+    assert repo.get_branch.call_count == 2
+
+
+def create_component(name: str, version: str):
+    component = mock.MagicMock()
+    component.name = name
+    component.version = version
+    component.raw_version = version
+    component.uri_repo = 'github.com/cloudposse/terraform-aws-components.git'
+    component.uri_path = f'modules/{name}'
+    return component
+
+
+def test_prs_opened_with_batched_graphql_mutations():
+    github_provider, repo = prep_github_provider([])
+    config = github_provider._GitHubProvider__config  # pylint: disable=protected-access
+    config.pr_labels = ['component-update', 'automated']
+    subprocess.run(['git', 'init', '-q', '-b', 'main', config.infra_repo_dir], check=True)
+
+    github = github_provider._GitHubProvider__github  # pylint: disable=protected-access
+    github.requester.graphql_query.return_value = ({}, {'data': {'repository': {'id': 'R_1', 'label0': {'id': 'LA_1'}, 'label1': None}}})
+    repo.create_label.return_value.node_id = 'LA_2'
+    github.create_from_raw_data.side_effect = lambda klass, raw_data: create_pull_request(raw_data['number'], raw_data['head']['ref'])
+    mutations = []
+
+    def run_mutation(method, url, input):  # pylint: disable=redefined-builtin
+        mutations.append(input)
+        variables = input['variables']
+        data = {alias: {'pullRequest': {'id': f"PR_{int(alias[2:])}", 'number': 100 + len(mutations) * 10 + int(alias[2:]), 'url': '', 'title': ''}}
+                for alias in variables if alias.startswith('pr') and variables[alias]['headRefName'] != 'component-update/c2/1.0.0'}
+        errors = [{'path': [alias], 'message': 'A pull request already exists'} for alias in variables
+                  if alias.startswith('pr') and variables[alias]['headRefName'] == 'component-update/c2/1.0.0']
+        return {}, {'data': data, 'errors': errors}
+
+    github.requester.requestJsonAndCheck.side_effect = run_mutation
+
+    updates = [(f'component-update/c{index}/1.0.0', create_component(f'c{index}', '0.1.0'), create_component(f'c{index}', '1.0.0')) for index in range(23)]
+    assert github_provider.get_num_open_prs() == 0
+    responses = github_provider.open_prs(config.infra_repo_dir, updates)
+
+    # 3 batches of PRs and one more mutation to label the last batch, ids are resolved once
+    assert len(mutations) == 4
+    assert github.requester.graphql_query.call_count == 1
+    repo.create_label.assert_called_once_with('automated', 'ededed')
+    repo.create_pull.assert_not_called()
+
+    assert [response.branch for response in responses] == [branch_name for branch_name, _, _ in updates]
+    assert responses[2].pull_request is None
+    assert responses[2].error == 'A pull request already exists'
+    assert all(response.pull_request.head.ref == response.branch for index, response in enumerate(responses) if index != 2)
+    assert mutations[0]['variables']['pr0']['baseRefName'] == 'main'
+    assert 'labels0' not in mutations[0]['variables']
+    assert mutations[1]['variables']['labels0']['labelIds'] == ['LA_1', 'LA_2']
+    assert len([alias for alias in mutations[3]['variables'] if alias.startswith('labels')]) == 3
+
+    # created PRs are indexed as open update PRs
+    assert github_provider.get_num_open_prs() == 22
+
+
+def test_failed_mutation_doesnt_stop_next_batches():
+    github_provider, _ = prep_github_provider([])
+    config = github_provider._GitHubProvider__config  # pylint: disable=protected-access
+    subprocess.run(['git', 'init', '-q', '-b', 'main', config.infra_repo_dir], check=True)
+
+    github = github_provider._GitHubProvider__github  # pylint: disable=protected-access
+    github.requester.graphql_query.return_value = ({}, {'data': {'repository': {'id': 'R_1'}}})
+    github.create_from_raw_data.side_effect = lambda klass, raw_data: create_pull_request(raw_data['number'], raw_data['head']['ref'])
+
+    def run_mutation(method, url, input):  # pylint: disable=redefined-builtin
+        variables = input['variables']
+
+        if variables['pr0']['headRefName'] == 'component-update/c0/1.0.0':
+            raise GithubException(502, 'Bad Gateway', None)
+
+        return {}, {'data': {alias: {'pullRequest': {'id': f'PR_{alias}', 'number': 100 + int(alias[2:]), 'url': '', 'title': ''}} for alias in variables}}
+
+    github.requester.requestJsonAndCheck.side_effect = run_mutation
+
+    updates = [(f'component-update/c{index}/1.0.0', create_component(f'c{index}', '0.1.0'), create_component(f'c{index}', '1.0.0')) for index in range(15)]
+    responses = github_provider.open_prs(config.infra_repo_dir, updates)
+
+    # PRs of the failed batch have error set, PRs of the next batch are opened
+    assert all(response.pull_request is None and 'Bad Gateway' in response.error for response in responses[:10])
+    assert all(response.pull_request.head.ref == response.branch for response in responses[10:])
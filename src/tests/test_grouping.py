@@ -0,0 +1,37 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+import unittest.mock as mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from grouping import ComponentGrouper, GROUP_BY_ALL, GROUP_BY_GLOB, GROUP_BY_NONE, GROUP_BY_UPSTREAM, build_group_digest  # noqa: E402
+
+
+def create_component(name: str, uri_repo: str = 'github.com/cloudposse/terraform-aws-components.git'):
+    component = mock.MagicMock()
+    component.name = name
+    component.uri_repo = uri_repo
+    return component
+
+
+def test_groups():
+    assert ComponentGrouper(GROUP_BY_NONE).get_group(create_component('vpc')) is None
+    assert not ComponentGrouper(GROUP_BY_NONE).enabled
+    assert ComponentGrouper(GROUP_BY_ALL).get_group(create_component('vpc')) == 'all'
+
+    grouper = ComponentGrouper(GROUP_BY_UPSTREAM)
+    assert grouper.get_group(create_component('vpc')) == 'cloudposse-terraform-aws-components'
+    assert grouper.get_group(create_component('vpc', 'git::https://github.com/cloudposse/terraform-aws-components.git')) == 'cloudposse-terraform-aws-components'
+    assert grouper.get_group(create_component('vpc', 'git@github.com:acme/Modules.git')) == 'acme-modules'
+
+    grouper = ComponentGrouper(GROUP_BY_GLOB, ['eks/*', 'rds*'])
+    assert grouper.get_group(create_component('eks/cluster')) == 'eks'
+    assert grouper.get_group(create_component('rds-primary')) == 'rds'
+    assert grouper.get_group(create_component('vpc')) is None
+
+
+def test_group_digest_is_stable():
+    assert build_group_digest([('vpc', '1.0.0'), ('eks', '2.0.0')]) == build_group_digest([('eks', '2.0.0'), ('vpc', '1.0.0')])
+    assert build_group_digest([('vpc', '1.0.0')]) != build_group_digest([('vpc', '1.1.0')])
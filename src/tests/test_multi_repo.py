@@ -0,0 +1,111 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+import unittest.mock as mock
+import pytest
+from tests.fake_tools_manager import FakeToolsManager
+from tests.test_component_updater import prepare_infra_repo, create_component, prep_github_provider, TERRAFORM_DIR, TAG_1, TAG_3
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import multi_repo                               # noqa: E402
+from multi_repo import MultiRepoError           # noqa: E402
+from workspace_manager import WorkspaceManager  # noqa: E402
+from utils import io                            # noqa: E402
+
+BASE_OPTIONS = {
+    'infra_repo_name': '',
+    'infra_repo_dir': '',
+    'infra_terraform_dirs': TERRAFORM_DIR,
+    'vendoring_enabled': True,
+    'max_number_of_prs': 10,
+    'include': '*',
+    'exclude': '',
+    'go_getter_tool': '',
+    'dry_run': True,
+    'affected_components_file': 'affected.json',
+    'log_level': 'INFO',
+}
+
+
+def write_repos_file(repos) -> str:
+    repos_file = os.path.join(io.create_tmp_dir(), 'repos.yaml')
+    io.serialize_to_yaml_file(repos_file, {'repos': repos})
+    return repos_file
+
+
+def test_load_repo_configs():
+    repos_file = write_repos_file([{'infra-repo-name': 'acme/infra-a', 'infra-repo-dir': '/repos/a', 'max-number-of-prs': 2, 'exclude': ['vpc', 'eks/*']},
+                                   {'infra-repo-name': 'acme/infra-b', 'infra-repo-dir': '/repos/b', 'affected-components-file': 'b.json'}])
+
+    configs = multi_repo.load_repo_configs(repos_file, BASE_OPTIONS)
+
+    assert [config.infra_repo_name for config in configs] == ['acme/infra-a', 'acme/infra-b']
+    assert [config.max_number_of_prs for config in configs] == [2, 10]
+    assert configs[0].exclude == ['vpc', 'eks/*']
+    assert [config.affected_components_file for config in configs] == ['affected-acme-infra-a.json', 'b.json']
+
+
+@pytest.mark.parametrize("repos", [
+    [],
+    [{'infra-repo-name': 'acme/infra-a'}],
+    [{'infra-repo-name': 'acme/infra-a', 'infra-repo-dir': '/repos/a', 'unknown-option': 1}],
+])
+def test_load_repo_configs_validation(repos):
+    with pytest.raises(MultiRepoError):
+        multi_repo.load_repo_configs(write_repos_file(repos), BASE_OPTIONS)
+
+
+def test_update_repos_shares_upstream_repos():
+    # setup
+    repos = []
+
+    for name in ('infra-a', 'infra-b'):
+        infra_repo_dir = io.create_tmp_dir()
+        prepare_infra_repo(infra_repo_dir)
+        create_component(infra_repo_dir, 'test_component_01', TAG_1)
+        create_component(infra_repo_dir, 'test_component_02', TAG_1)
+        repos.append({'infra-repo-name': f'acme/{name}',
+                      'infra-repo-dir': infra_repo_dir,
+                      'affected-components-file': os.path.join(infra_repo_dir, 'affected.json')})
+
+    configs = multi_repo.load_repo_configs(write_repos_file(repos), BASE_OPTIONS)
+    tools_manager = FakeToolsManager(TAG_3)
+
+    # test
+    with mock.patch.object(multi_repo, 'GitHubProvider', side_effect=lambda config, _: prep_github_provider(config)):
+        succeeded = multi_repo.update_repos(mock.MagicMock(), tools_manager, WorkspaceManager(io.create_tmp_dir()), configs)
+
+    # validate
+    assert succeeded
+    assert tools_manager.num_fetches == 1
+    # every component version is vendored once for both repos
+    assert sorted(tools_manager.vendored_components) == [f'test_component_01@{TAG_1}', f'test_component_01@{TAG_3}', f'test_component_02@{TAG_1}', f'test_component_02@{TAG_3}']
+    for config in configs:
+        assert io.read_file_to_string(config.affected_components_file).count('test_component') == 2
+
+
+def test_failed_repo_doesnt_stop_other_repos():
+    # setup
+    repos = []
+
+    for name in ('infra-a', 'infra-b'):
+        infra_repo_dir = io.create_tmp_dir()
+        prepare_infra_repo(infra_repo_dir)
+        create_component(infra_repo_dir, 'test_component_01', TAG_1)
+        repos.append({'infra-repo-name': f'acme/{name}',
+                      'infra-repo-dir': infra_repo_dir,
+                      'affected-components-file': os.path.join(infra_repo_dir, 'affected.json')})
+
+    # stacks of the first repo can't be indexed
+    io.save_string_to_file(os.path.join(repos[0]['infra-repo-dir'], 'atmos.yaml'), 'stacks: [')
+    configs = multi_repo.load_repo_configs(write_repos_file(repos), BASE_OPTIONS)
+
+    # test
+    with mock.patch.object(multi_repo, 'GitHubProvider', side_effect=lambda config, _: prep_github_provider(config)):
+        succeeded = multi_repo.update_repos(mock.MagicMock(), FakeToolsManager(TAG_3), WorkspaceManager(io.create_tmp_dir()), configs)
+
+    # validate
+    assert not succeeded
+    assert os.path.exists(configs[1].affected_stacks_file)
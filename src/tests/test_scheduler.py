@@ -0,0 +1,43 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scheduler import ComponentScheduler, VersionBump, VersionGap, SCHEDULE_ALPHABETICAL, SCHEDULE_VERSION_GAP  # noqa: E402
+
+
+@pytest.mark.parametrize("current_version, latest_version, expected_bump", [
+    ('1.2.3', '2.0.0', VersionBump.MAJOR),
+    ('v1.2.3', '1.3.0', VersionBump.MINOR),
+    ('1.2.3', 'v1.2.4', VersionBump.PATCH),
+    ('1.2.3', '1.2.3', VersionBump.NONE),
+    ('2.0.0', '1.9.9', VersionBump.NONE),
+    ('main', '1.0.0', VersionBump.NONE),
+])
+def test_version_gap(current_version: str, latest_version: str, expected_bump: VersionBump):
+    assert VersionGap(current_version, latest_version).bump == expected_bump
+
+
+def schedule(scheduler: ComponentScheduler, components):
+    return [name for name, _, _ in scheduler.schedule(components, lambda item: item[0], lambda item: VersionGap(item[1], item[2]))]
+
+
+def test_version_gap_schedule():
+    components = [('a', '1.2.3', '1.2.4'), ('b', '1.2.3', '1.5.0'), ('c', '1.2.3', '2.0.0'), ('d', '1.2.3', '1.3.0'), ('e', '0.1.0', '2.0.0')]
+
+    assert schedule(ComponentScheduler(SCHEDULE_VERSION_GAP), components) == ['e', 'c', 'b', 'd', 'a']
+
+
+def test_alphabetical_schedule():
+    components = [('a', '1.2.3', '1.2.4'), ('b', '1.2.3', '2.0.0')]
+
+    assert schedule(ComponentScheduler(SCHEDULE_ALPHABETICAL), components) == ['a', 'b']
+
+
+def test_priority_goes_first():
+    components = [('eks/cluster', '1.0.0', '2.0.0'), ('vpc', '1.0.0', '1.0.1'), ('rds', '1.0.0', '1.1.0')]
+
+    assert schedule(ComponentScheduler(SCHEDULE_VERSION_GAP, ['vpc', 'rds*']), components) == ['vpc', 'rds', 'eks/cluster']
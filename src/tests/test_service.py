@@ -0,0 +1,70 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+from tests.fake_tools_manager import FakeToolsManager
+from tests.test_component_updater import prepare_infra_repo, create_component, prep_github_provider, TERRAFORM_DIR, TAG_1, TAG_3
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from component_updater import ComponentUpdater    # noqa: E402
+from service import ComponentUpdaterService       # noqa: E402
+from upstream_cache import UpstreamCache          # noqa: E402
+from workspace_manager import WorkspaceManager    # noqa: E402
+from config import Config                         # noqa: E402
+from utils import io                              # noqa: E402
+
+
+def test_service_keeps_caches_warm_between_runs():
+    # setup
+    config = Config('test/repo', io.create_tmp_dir(), TERRAFORM_DIR, True, 10, '*', '', '', True)
+    config.service_queue_dir = io.create_tmp_dir()
+    # queued trigger might be coalesced with the start one, interval makes sure second run happens anyway
+    config.service_interval = 1
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+    create_component(config.infra_repo_dir, 'test_component_02', TAG_1)
+    io.save_string_to_file(os.path.join(config.service_queue_dir, 'trigger'), '')
+
+    github_provider = prep_github_provider(config)
+    tools_manager = FakeToolsManager(TAG_3)
+    workspace_manager = WorkspaceManager(io.create_tmp_dir())
+    upstream_cache = UpstreamCache(tools_manager, config, workspace_manager)
+    component_updater = ComponentUpdater(github_provider, tools_manager, config.infra_terraform_dirs, config, workspace_manager, upstream_cache)
+    service = ComponentUpdaterService(component_updater, github_provider, tools_manager, upstream_cache, workspace_manager, config)
+
+    # test
+    service.run(max_runs=2)
+
+    # validate
+    assert service.num_runs == 2
+    assert not os.listdir(config.service_queue_dir)
+    # upstream repo is fetched once, then only new tags are fetched into it
+    assert tools_manager.num_fetches == 1
+    assert tools_manager.num_tag_refreshes == 1
+
+
+def test_service_survives_failed_runs():
+    # setup
+    config = Config('test/repo', io.create_tmp_dir(), TERRAFORM_DIR, True, 10, '*', '', '', True)
+    config.service_interval = 1
+    config.journal_file = os.path.join(io.create_tmp_dir(), 'journal.jsonl')
+    config.resume = True
+    prepare_infra_repo(config.infra_repo_dir)
+    create_component(config.infra_repo_dir, 'test_component_01', TAG_1)
+
+    github_provider = prep_github_provider(config)
+    tools_manager = FakeToolsManager(TAG_3)
+    workspace_manager = WorkspaceManager(io.create_tmp_dir())
+    upstream_cache = UpstreamCache(tools_manager, config, workspace_manager)
+    component_updater = ComponentUpdater(github_provider, tools_manager, config.infra_terraform_dirs, config, workspace_manager, upstream_cache)
+    service = ComponentUpdaterService(component_updater, github_provider, tools_manager, upstream_cache, workspace_manager, config)
+    github_provider.create_branch_and_push_all_changes.side_effect = [None, OSError('connection reset'), None]
+
+    # test
+    service.run(max_runs=3)
+
+    # validate
+    assert service.num_runs == 3
+    # later runs don't skip the component journaled as updated by the first one, and failure of the second run doesn't stop the service
+    assert github_provider.create_branch_and_push_all_changes.call_count == 3
@@ -0,0 +1,43 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import sharding      # noqa: E402
+from utils import io  # noqa: E402
+
+
+def test_get_shard_is_stable():
+    assert sharding.get_shard('vpc', 4) == sharding.get_shard('vpc', 4)
+    assert {sharding.get_shard(f'component-{i}', 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_get_shard_budget():
+    assert [sharding.get_shard_budget(10, index, 4) for index in range(4)] == [3, 3, 2, 2]
+    assert [sharding.get_shard_budget(1, index, 3) for index in range(3)] == [1, 0, 0]
+
+
+def test_merge_affected_components_files():
+    shards_dir = io.create_tmp_dir()
+    io.serialize_to_json_file(os.path.join(shards_dir, 'affected-0.json'), ['vpc', 'eks/cluster'])
+    io.serialize_to_json_file(os.path.join(shards_dir, 'affected-1.json'), ['rds', 'vpc'])
+    output_file = os.path.join(shards_dir, 'affected.json')
+
+    affected = sharding.merge_affected_components_files([os.path.join(shards_dir, 'affected-*.json')], output_file)
+
+    assert affected == ['eks/cluster', 'rds', 'vpc']
+    assert json.loads(io.read_file_to_string(output_file)) == affected
+
+
+def test_merge_journal_files():
+    shards_dir = io.create_tmp_dir()
+    io.save_string_to_file(os.path.join(shards_dir, 'journal-0.ndjson'), '{"key": "a"}')
+    io.save_string_to_file(os.path.join(shards_dir, 'journal-1.ndjson'), '{"key": "b"}\n')
+    output_file = os.path.join(shards_dir, 'journal.ndjson')
+
+    sharding.merge_journal_files([os.path.join(shards_dir, 'journal-*.ndjson')], output_file)
+
+    assert io.read_file_to_list_of_strings(output_file) == ['{"key": "a"}', '{"key": "b"}']
@@ -0,0 +1,92 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from stack_indexer import StackIndexer, write_affected_stacks, MIN_FILES_PER_WORKER  # noqa: E402
+from utils import io                                                                 # noqa: E402
+
+ATMOS_CONFIG = """
+stacks:
+  base_path: stacks
+  included_paths:
+    - "orgs/**/*"
+  excluded_paths:
+    - "**/_defaults.yaml"
+  name_pattern: "{tenant}-{environment}-{stage}"
+"""
+
+
+def prepare_infra_repo() -> str:
+    """Two stacks importing a catalog of 'vpc' and 'eks/cluster' instances, dev deploys 'eks/cluster' only through inheritance"""
+    repo_dir = io.create_tmp_dir()
+    files = {
+        'atmos.yaml': ATMOS_CONFIG,
+        'stacks/catalog/vpc.yaml': "components:\n  terraform:\n    vpc:\n      vars:\n        enabled: true\n",
+        'stacks/catalog/eks.yaml': "components:\n  terraform:\n    eks/defaults:\n      metadata:\n        type: abstract\n        component: eks/cluster\n",
+        'stacks/orgs/acme/_defaults.yaml': "vars:\n  tenant: plat\n",
+        'stacks/orgs/acme/dev.yaml': "import:\n  - orgs/acme/_defaults\n  - catalog/*\n"
+                                     "vars:\n  environment: use1\n  stage: dev\n"
+                                     "components:\n  terraform:\n    eks:\n      metadata:\n        inherits:\n          - eks/defaults\n"
+                                     "    cluster-name: !terraform.output eks cluster_name\n",
+        'stacks/orgs/acme/prod.yaml': "import:\n  - path: ./_defaults.yaml\n  - catalog/vpc\n"
+                                      "vars:\n  environment: use1\n",
+    }
+
+    for file, content in files.items():
+        io.create_dirs(os.path.dirname(os.path.join(repo_dir, file)))
+        io.save_string_to_file(os.path.join(repo_dir, file), content)
+
+    return repo_dir
+
+
+def test_components_are_indexed_through_imports():
+    repo_dir = prepare_infra_repo()
+
+    index = StackIndexer.from_atmos_config(repo_dir).build()
+
+    # prod doesn't set 'stage' of name pattern, so it's named by its file
+    assert index['vpc'] == ['orgs/acme/prod', 'plat-use1-dev']
+    assert index['eks/cluster'] == ['plat-use1-dev']
+    assert 'eks/defaults' not in index
+
+
+def test_affected_stacks_are_written():
+    repo_dir = prepare_infra_repo()
+    affected_stacks_file = os.path.join(io.create_tmp_dir(), 'affected_stacks.json')
+
+    assert write_affected_stacks(repo_dir, ['eks/cluster', 'rds'], affected_stacks_file) == ['plat-use1-dev']
+    assert write_affected_stacks(repo_dir, [], affected_stacks_file) == []
+    assert io.read_file_to_string(affected_stacks_file).strip() == '[]'
+
+
+def test_only_changed_files_are_parsed_again():
+    repo_dir = prepare_infra_repo()
+    cache_file = os.path.join(io.create_tmp_dir(), 'stack-index.json')
+
+    indexer = StackIndexer.from_atmos_config(repo_dir, cache_file)
+    indexer.build()
+    assert indexer.num_parsed_files == 5
+
+    io.save_string_to_file(os.path.join(repo_dir, 'stacks', 'catalog', 'vpc.yaml'), "components:\n  terraform:\n    vpc-flow-logs:\n      vars: {}\n")
+
+    indexer = StackIndexer.from_atmos_config(repo_dir, cache_file)
+    index = indexer.build()
+
+    assert indexer.num_parsed_files == 1
+    assert 'vpc' not in index
+    assert index['vpc-flow-logs'] == ['orgs/acme/prod', 'plat-use1-dev']
+
+
+def test_stack_files_are_parsed_in_worker_processes():
+    repo_dir = io.create_tmp_dir()
+    num_stacks = MIN_FILES_PER_WORKER * 2
+
+    for index in range(num_stacks):
+        io.save_string_to_file(os.path.join(repo_dir, f'stack-{index}.yaml'), f"components:\n  terraform:\n    vpc:\n      metadata:\n        component: vpc-{index % 2}\n")
+
+    index = StackIndexer(repo_dir, max_workers=2).build()
+
+    assert len(index['vpc-0']) == len(index['vpc-1']) == num_stacks // 2
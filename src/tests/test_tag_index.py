@@ -0,0 +1,37 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tag_index import TagIndex    # noqa: E402
+
+
+TAGS = ['0.1.0', 'v1.9.0', 'v1.10.0', '1.10.1-rc1', '2.0.0-alpha', 'release-2024', 'latest', '1.2', "'1.10.2'", '']
+
+
+def test_latest_tag():
+    tag_index = TagIndex(TAGS)
+
+    assert tag_index.latest == '1.10.2'
+    assert tag_index.num_tags == 4
+    assert tag_index.num_skipped_tags == 5
+
+
+def test_no_release_tags():
+    tag_index = TagIndex(['latest', '1.0.0-rc1'])
+
+    assert tag_index.latest is None
+    assert tag_index.majors == []
+
+
+def test_constraint_queries():
+    tag_index = TagIndex(TAGS + ['2.3.4+build.1'])
+
+    assert tag_index.latest == '2.3.4+build.1'
+    assert tag_index.majors == [0, 1, 2]
+    assert tag_index.latest_within_major(1) == '1.10.2'
+    assert tag_index.latest_within_major(3) is None
+    assert tag_index.latest_within_minor(1, 9) == 'v1.9.0'
+    assert tag_index.latest_within_minor(0, 1) == '0.1.0'
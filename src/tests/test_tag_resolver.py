@@ -0,0 +1,94 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+import unittest.mock as mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tag_resolver import GitHubTagResolver, parse_github_repo, REPOS_PER_QUERY  # noqa: E402
+from upstream_cache import UpstreamCache                                          # noqa: E402
+from utils import io                                                             # noqa: E402
+from config import Config                                                         # noqa: E402
+from tests.fake_tools_manager import FakeToolsManager                             # noqa: E402
+
+
+def prep_github():
+    """GitHub client whose GraphQL endpoint knows every repo except 'missing'"""
+    github = mock.MagicMock()
+
+    def run_query(verb, url, input):  # pylint: disable=redefined-builtin
+        data = {}
+
+        for key, value in input['variables'].items():
+            if key.startswith('name'):
+                index = key[len('name'):]
+                data[f'repo{index}'] = None if value == 'missing' else {'refs': {'nodes': [{'name': 'v1.0.0'}, {'name': f'{value}-latest'}, {'name': '1.2.0'}]}}
+
+        return {}, {'data': data}
+
+    github.requester.requestJsonAndCheck.side_effect = run_query
+
+    return github
+
+
+def test_parse_github_repo():
+    assert parse_github_repo('github.com/cloudposse-terraform-components/aws-vpc.git') == ('cloudposse-terraform-components', 'aws-vpc')
+    assert parse_github_repo('git::https://github.com/cloudposse/terraform-aws-components.git') == ('cloudposse', 'terraform-aws-components')
+    assert parse_github_repo('git@github.com:cloudposse/terraform-aws-components') == ('cloudposse', 'terraform-aws-components')
+    assert parse_github_repo('gitlab.com/cloudposse/terraform-aws-components.git') is None
+    assert parse_github_repo('') is None
+
+
+def test_repos_are_resolved_in_batches():
+    github = prep_github()
+    resolver = GitHubTagResolver(github)
+    uri_repos = [f'github.com/org/repo-{index}.git' for index in range(REPOS_PER_QUERY + 50)]
+
+    tag_indexes = resolver.resolve(uri_repos + ['github.com/org/missing.git', 'gitlab.com/org/repo.git'])
+
+    assert resolver.num_queries == 2
+    assert github.requester.requestJsonAndCheck.call_count == 2
+    assert sorted(tag_indexes.keys()) == sorted(uri_repos)
+    assert tag_indexes['github.com/org/repo-0.git'].latest == '1.2.0'
+
+
+def test_tags_are_paged_through():
+    github = mock.MagicMock()
+    pages = {None: (['3.0.0', '2.1.0'], 'cursor-1'), 'cursor-1': (['1.0.0', '3.0.1'], None)}
+
+    def run_query(verb, url, input):  # pylint: disable=redefined-builtin
+        variables = input['variables']
+
+        if variables['name0'] == 'broken' and variables['after0']:
+            return {}, {'data': {'repo0': None}, 'errors': [{'path': ['repo0'], 'message': 'Timeout'}]}
+
+        names, end_cursor = pages[variables['after0']]
+        refs = {'nodes': [{'name': name} for name in names], 'pageInfo': {'hasNextPage': end_cursor is not None, 'endCursor': end_cursor}}
+        return {}, {'data': {'repo0': {'refs': refs}}}
+
+    github.requester.requestJsonAndCheck.side_effect = run_query
+    resolver = GitHubTagResolver(github)
+
+    # back-ported patch release is on the last page
+    assert resolver.resolve(['github.com/org/vpc.git'])['github.com/org/vpc.git'].latest == '3.0.1'
+    assert resolver.num_queries == 2
+
+    # partially fetched repo is left for git
+    assert resolver.resolve(['github.com/org/broken.git']) == {}
+
+
+def test_unresolved_repos_are_fetched_with_git():
+    config = Config('test/repo', io.create_tmp_dir(), 'components/terraform', True, 10, '*', '', '', True)
+    config.components_download_dir = io.create_tmp_dir()
+    tools_manager = FakeToolsManager('2.0.0')
+    upstream_cache = UpstreamCache(tools_manager, config, mock.MagicMock(), GitHubTagResolver(prep_github()))
+
+    components = [mock.MagicMock(uri_repo=uri_repo) for uri_repo in ['github.com/org/vpc.git', 'github.com/org/missing.git']]
+    upstream_cache.prefetch([component.uri_repo for component in components])
+
+    assert upstream_cache.get_tag_index(components[0]).latest == '1.2.0'
+    assert tools_manager.num_fetches == 0
+
+    assert upstream_cache.get_tag_index(components[1]).latest == '2.0.0'
+    assert tools_manager.num_fetches == 1
@@ -0,0 +1,147 @@
+# pylint: disable=redefined-outer-name
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from atmos_component import AtmosComponent    # noqa: E402
+from tools_manager import ToolsManager, ToolExecutionError    # noqa: E402
+from utils import io                          # noqa: E402
+
+
+TERRAFORM_DIR = 'components/terraform'
+COMPONENT_YAML = ("spec:\n"
+                  "  source:\n"
+                  "    uri: github.com/acme/aws-vpc.git//src?ref={{{{ .Version }}}}\n"
+                  "    version: {version}\n")
+
+
+def create_component(infra_dir: str, name: str, content: str) -> AtmosComponent:
+    component_dir = os.path.join(infra_dir, TERRAFORM_DIR, name)
+    io.create_dirs(component_dir)
+    component_file = os.path.join(component_dir, 'component.yaml')
+    io.save_string_to_file(component_file, content)
+    return AtmosComponent(infra_dir, TERRAFORM_DIR, component_file)
+
+
+def create_upstream_repo(tags) -> str:
+    repo_dir = io.create_tmp_dir()
+    git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+
+    subprocess.run(['git', 'init', '-q', repo_dir], check=True)
+    subprocess.run(['git', 'config', 'uploadpack.allowFilter', 'true'], cwd=repo_dir, check=True)
+
+    for tag in tags:
+        for module in ('module_a', 'module_b'):
+            io.create_dirs(os.path.join(repo_dir, 'modules', module))
+            io.save_string_to_file(os.path.join(repo_dir, 'modules', module, 'main.tf'), f'# {module} {tag}')
+
+        subprocess.run(['git', 'add', '-A'], cwd=repo_dir, check=True)
+        subprocess.run(git + ['commit', '-q', '-m', tag], cwd=repo_dir, check=True)
+        subprocess.run(['git', 'tag', tag], cwd=repo_dir, check=True)
+
+    return repo_dir
+
+
+def test_build_vendor_manifest():
+    working_dir = io.create_tmp_dir()
+    original = create_component(io.create_tmp_dir(), 'vpc', COMPONENT_YAML.format(version='v1.2.3') + "    excluded_paths:\n      - '*.md'\n")
+    updated = create_component(io.create_tmp_dir(), 'vpc', COMPONENT_YAML.format(version='v1.3.0'))
+
+    manifest = ToolsManager('go-getter').build_vendor_manifest([original, updated], working_dir)
+
+    assert manifest['kind'] == 'AtmosVendorConfig'
+    assert manifest['spec']['sources'] == [
+        {
+            'component': 'vpc-0',
+            'source': 'github.com/acme/aws-vpc.git//src?ref={{ .Version }}',
+            'version': 'v1.2.3',
+            'targets': [os.path.relpath(original.component_dir, working_dir)],
+            'excluded_paths': ['*.md'],
+        },
+        {
+            'component': 'vpc-1',
+            'source': 'github.com/acme/aws-vpc.git//src?ref={{ .Version }}',
+            'version': 'v1.3.0',
+            'targets': [os.path.relpath(updated.component_dir, working_dir)],
+        },
+    ]
+
+
+def test_run_with_explicit_env():
+    tools_manager = ToolsManager('go-getter')
+
+    execution = tools_manager.run([sys.executable, '-c', 'import os; print(os.environ["TOOL_TEST_VAR"])'], env={'TOOL_TEST_VAR': 'value'})
+
+    assert execution.returncode == 0
+    assert execution.stdout.decode().strip() == 'value'
+    assert execution.output_size == len(execution.stdout)
+    assert 'TOOL_TEST_VAR' not in os.environ
+    assert tools_manager.executions == [execution]
+
+
+def test_run_timeout():
+    tools_manager = ToolsManager('go-getter', timeout=1)
+
+    with pytest.raises(ToolExecutionError):
+        tools_manager.run([sys.executable, '-c', 'import time; time.sleep(10)'])
+
+    assert tools_manager.executions[0].returncode == -1
+
+
+def test_run_concurrency_is_capped_per_tool():
+    tools_manager = ToolsManager('go-getter', concurrency=1)
+    command = [sys.executable, '-c', 'import time; time.sleep(0.5)']
+
+    started_at = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(lambda _: tools_manager.run(command), range(2)))
+
+    assert time.monotonic() - started_at >= 1
+    assert len(tools_manager.executions) == 2
+
+
+def test_git_partial_clone_component_repo():
+    upstream_dir = create_upstream_repo(['1.0.0', '1.1.0'])
+    download_dir = io.create_tmp_dir()
+    infra_dir = io.create_tmp_dir()
+    tools_manager = ToolsManager('go-getter')
+
+    component_yaml = "spec:\n  source:\n    uri: file://{upstream_dir}//modules/{module}?ref={{{{ .Version }}}}\n    version: 1.0.0\n"
+    component_a = create_component(infra_dir, 'module_a', component_yaml.format(upstream_dir=upstream_dir, module='module_a'))
+    component_b = create_component(infra_dir, 'module_b', component_yaml.format(upstream_dir=upstream_dir, module='module_b'))
+
+    assert component_a.uri_repo == f'file://{upstream_dir}'
+    assert component_a.uri_path == 'modules/module_a'
+
+    tools_manager.git_partial_clone_component_repo(component_a, 'upstream', download_dir)
+
+    repo_dir = os.path.join(download_dir, 'upstream')
+    assert tools_manager.is_git_repo(repo_dir)
+    assert os.path.isfile(os.path.join(repo_dir, 'modules', 'module_a', 'main.tf'))
+    assert not os.path.exists(os.path.join(repo_dir, 'modules', 'module_b'))
+    assert tools_manager.run(['git', 'config', 'remote.origin.partialclonefilter'], cwd=repo_dir).stdout.decode().strip() == 'blob:none'
+    assert tools_manager.git_get_latest_tag(repo_dir) == '1.1.0'
+
+    tools_manager.git_partial_clone_component_repo(component_b, 'upstream', download_dir)
+
+    assert os.path.isfile(os.path.join(repo_dir, 'modules', 'module_b', 'main.tf'))
+    assert len([execution for execution in tools_manager.executions if execution.command[:2] == ['git', 'clone']]) == 1
+
+
+def test_git_ls_remote_tag_index():
+    upstream_dir = create_upstream_repo(['1.0.0', 'v1.2.0', 'not-a-version'])
+    tools_manager = ToolsManager('go-getter')
+
+    tag_index = tools_manager.git_ls_remote_tag_index(f'file://{upstream_dir}')
+
+    assert tag_index.latest == 'v1.2.0'
+    assert tag_index.num_skipped_tags == 1
+    assert tools_manager.git_ls_remote_tag_index(f'file://{upstream_dir}-missing') is None
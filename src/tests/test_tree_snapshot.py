@@ -0,0 +1,47 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tree_snapshot import TreeSnapshot  # noqa: E402
+from utils import io                    # noqa: E402
+
+
+def create_tree(files):
+    root_dir = io.create_tmp_dir()
+
+    for path, content in files.items():
+        io.create_dirs(os.path.dirname(os.path.join(root_dir, path)))
+        io.save_string_to_file(os.path.join(root_dir, path), content)
+
+    return root_dir
+
+
+def test_snapshot_captures_files_recursively():
+    root_dir = create_tree({'main.tf': 'a', 'modules/vpc/main.tf': 'b', '.hidden': 'c', '.terraform/lock': 'd'})
+    os.makedirs(os.path.join(root_dir, 'empty'))
+
+    snapshot = TreeSnapshot(root_dir)
+
+    assert snapshot.paths == {'main.tf', os.path.join('modules', 'vpc', 'main.tf')}
+    assert snapshot.get('main.tf').size == 2
+    assert 'main.tf' in snapshot
+    assert len(TreeSnapshot(os.path.join(root_dir, 'missing'))) == 0
+
+
+def test_changed_paths_compares_size_before_hash():
+    original = TreeSnapshot(create_tree({'same.tf': 'a', 'resized.tf': 'a', 'edited.tf': 'a', 'removed.tf': 'a'}))
+    updated = TreeSnapshot(create_tree({'same.tf': 'a', 'resized.tf': 'abc', 'edited.tf': 'b', 'new.tf': 'a'}))
+
+    with mock.patch('utils.io.calc_file_md5_hash', wraps=io.calc_file_md5_hash) as calc_hash:
+        assert updated.changed_paths(original) == {'resized.tf', 'edited.tf'}
+        # 'same.tf' and 'edited.tf' are hashed in both snapshots, 'resized.tf' is never read
+        assert calc_hash.call_count == 4
+        updated.changed_paths(original)
+        assert calc_hash.call_count == 4
+
+    assert updated.paths - original.paths == {'new.tf'}
+    assert original.paths - updated.paths == {'removed.tf'}
@@ -0,0 +1,71 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from vendor_cache import VendorCache              # noqa: E402
+from workspace_manager import WorkspaceManager    # noqa: E402
+from atmos_component import AtmosComponent        # noqa: E402
+from utils import io                              # noqa: E402
+
+TERRAFORM_DIR = 'components/terraform'
+COMPONENT_YAML = """apiVersion: atmos/v1
+kind: ComponentVendorConfig
+spec:
+  source:
+    uri: github.com/cloudposse/terraform-aws-components.git//modules/vpc?ref={{ .Version }}
+    version: 1.0.0
+"""
+
+
+def create_component(local_files: dict) -> AtmosComponent:
+    repo_dir = io.create_tmp_dir()
+    component_dir = os.path.join(repo_dir, TERRAFORM_DIR, 'vpc')
+    io.create_dirs(component_dir)
+    io.save_string_to_file(os.path.join(component_dir, 'component.yaml'), COMPONENT_YAML)
+
+    for file, content in local_files.items():
+        io.save_string_to_file(os.path.join(component_dir, file), content)
+
+    return AtmosComponent(repo_dir, TERRAFORM_DIR, os.path.join(component_dir, 'component.yaml'))
+
+
+def vendor(component: AtmosComponent, upstream_files: dict):
+    """Replaces component dir content with upstream files, like 'atmos vendor pull' does"""
+    io.remove_dir_content(component.component_dir, ['component.yaml'])
+
+    for file, content in upstream_files.items():
+        io.save_string_to_file(os.path.join(component.component_dir, file), content)
+
+
+def read_files(component: AtmosComponent) -> dict:
+    return {file: io.read_file_to_string(os.path.join(component.component_dir, file)).strip()
+            for file in sorted(os.listdir(component.component_dir)) if file != 'component.yaml'}
+
+
+def test_restore_replaces_component_dir_content():
+    vendor_cache = VendorCache(WorkspaceManager(io.create_tmp_dir()))
+    first_component = create_component({'main.tf': 'local', 'backend.tf': 'first'})
+    second_component = create_component({'main.tf': 'local', 'outputs.tf': 'previous version'})
+
+    assert not vendor_cache.restore(first_component)
+    vendor(first_component, {'main.tf': 'upstream'})
+    vendor_cache.store(first_component)
+
+    assert vendor_cache.restore(second_component)
+    # files which upstream doesn't provide are gone, so they show up as removed
+    assert read_files(second_component) == {'main.tf': 'upstream'}
+
+
+def test_components_with_mixins_are_not_cached():
+    vendor_cache = VendorCache(WorkspaceManager(io.create_tmp_dir()))
+    component = create_component({})
+    io.save_string_to_file(component.component_file, COMPONENT_YAML + "  mixins:\n    - uri: https://example.com/context.tf\n      filename: context.tf\n")
+    component = AtmosComponent(component.infra_repo_dir, TERRAFORM_DIR, component.component_file)
+
+    vendor(component, {'main.tf': 'upstream'})
+    vendor_cache.store(component)
+
+    assert not vendor_cache.restore(component)
@@ -0,0 +1,95 @@
+# pylint: disable=wrong-import-position
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from workspace_manager import WorkspaceManager, RUN_DIR_PREFIX, OWNER_FILE  # noqa: E402
+from utils import io                                                        # noqa: E402
+
+
+def fill(workspace: str, size: int):
+    io.save_string_to_file(os.path.join(workspace, 'data'), 'x' * (size - 1))
+
+
+def test_scope_releases_and_reuses_workspaces():
+    workspace_manager = WorkspaceManager(io.create_tmp_dir())
+
+    with workspace_manager.scope():
+        released = workspace_manager.create()
+        retained = workspace_manager.create()
+        fill(released, 100)
+        fill(retained, 100)
+        workspace_manager.retain(retained)
+
+    assert os.listdir(released) == []
+    assert os.path.exists(os.path.join(retained, 'data'))
+    assert workspace_manager.peak_usage == 200
+
+    with workspace_manager.scope():
+        assert workspace_manager.create() == released
+
+
+def test_quota_evicts_oldest_retained_workspaces():
+    workspace_manager = WorkspaceManager(io.create_tmp_dir(), quota=250)
+    workspaces = []
+
+    for _ in range(3):
+        with workspace_manager.scope():
+            workspace = workspace_manager.create()
+            fill(workspace, 100)
+            workspace_manager.retain(workspace)
+            workspaces.append(workspace)
+
+    assert not os.path.exists(workspaces[0])
+    assert os.path.exists(workspaces[1])
+    assert os.path.exists(workspaces[2])
+    assert workspace_manager.num_evicted == 1
+
+
+def test_pinned_workspaces_are_not_evicted():
+    workspace_manager = WorkspaceManager(io.create_tmp_dir(), quota=150)
+
+    with workspace_manager.scope():
+        pinned_workspace = workspace_manager.create()
+        fill(pinned_workspace, 100)
+        workspace_manager.pin(pinned_workspace)
+
+    with workspace_manager.scope():
+        workspace = workspace_manager.create()
+        fill(workspace, 100)
+        workspace_manager.retain(workspace)
+
+    assert os.path.exists(pinned_workspace)
+    assert not os.path.exists(workspace)
+
+    workspace_manager.unpin(pinned_workspace)
+
+    with workspace_manager.scope():
+        workspace = workspace_manager.create()
+        fill(workspace, 100)
+        workspace_manager.retain(workspace)
+
+    assert not os.path.exists(pinned_workspace)
+
+
+def test_cleanup_and_stale_run_dirs():
+    root_dir = io.create_tmp_dir()
+    stale_run_dir = os.path.join(root_dir, f'{RUN_DIR_PREFIX}stale')
+    io.create_dirs(stale_run_dir)
+    # owner file nobody holds a lock on
+    io.save_string_to_file(os.path.join(stale_run_dir, OWNER_FILE), str(os.getpid()))
+
+    workspace_manager = WorkspaceManager(root_dir)
+    components_dir = workspace_manager.get('components')
+
+    assert not os.path.exists(stale_run_dir)
+    # run dir of a live run is kept, whatever pid namespace the run is in
+    WorkspaceManager(root_dir)
+    assert os.path.exists(workspace_manager.run_dir)
+    assert workspace_manager.get('components') == components_dir
+
+    workspace_manager.cleanup()
+
+    assert not os.path.exists(workspace_manager.run_dir)
@@ -1,10 +1,17 @@
 import os
+import time
 import logging
+import threading
 import subprocess
-import semver
-import shutil
+from typing import Dict, List, Optional
 
 from atmos_component import AtmosComponent
+from tag_index import TagIndex
+from utils import io
+
+VENDOR_MANIFEST = 'component-updater-vendor.yaml'
+DEFAULT_TOOL_TIMEOUT = 900
+DEFAULT_TOOL_CONCURRENCY = 4
 
 
 class ToolExecutionError(Exception):
@@ -13,43 +20,97 @@ class ToolExecutionError(Exception):
         super().__init__(message)
 
 
+class ToolExecution:
+    def __init__(self, command: List[str], returncode: int, duration: float, stdout: bytes, stderr: bytes):
+        self.command: List[str] = command
+        self.tool: str = os.path.basename(command[0])
+        self.returncode: int = returncode
+        self.duration: float = duration
+        self.stdout: bytes = stdout
+        self.stderr: bytes = stderr
+        self.output_size: int = len(stdout) + len(stderr)
+
+    @property
+    def error_message(self) -> str:
+        # atmos doesn't report error to stderr
+        return self.stderr.decode("utf-8") if self.stderr else self.stdout.decode("utf-8")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(command={' '.join(self.command)!r}, returncode={self.returncode}, duration={self.duration:.2f}s, output_size={self.output_size})"
+
+
 class ToolsManager:
-    def __init__(self, go_getter_tool: str):
+    def __init__(self, go_getter_tool: str, timeout: int = DEFAULT_TOOL_TIMEOUT, concurrency: int = DEFAULT_TOOL_CONCURRENCY):
         self.__go_getter_tool = go_getter_tool
+        self.__timeout = timeout
+        self.__concurrency = concurrency
+        self.__semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self.__executions: List[ToolExecution] = []
+        self.__lock = threading.Lock()
+
+    @property
+    def executions(self) -> List[ToolExecution]:
+        with self.__lock:
+            return list(self.__executions)
+
+    def run(self, command: List[str], cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None, stdin: Optional[bytes] = None) -> ToolExecution:
+        """Runs a tool with explicit env and timeout. Number of concurrently running processes is capped per tool"""
+        tool = os.path.basename(command[0])
+
+        logging.debug(f"Executing: '{' '.join(command)}' ... ")
+
+        with self.__get_semaphore(tool):
+            started_at = time.monotonic()
 
-    def atmos_vendor_component(self, component: AtmosComponent):
-        # Delete all files in the component folder except the component.yaml file
-        # Until atmos issue would be solved https://github.com/cloudposse/atmos/issues/821
-        component_folder = os.path.dirname(component.component_file)
-        for filename in os.listdir(component_folder):
-            file_path = os.path.join(component_folder, filename)
-            if file_path == component.component_file:
-                continue
             try:
-                if os.path.isfile(file_path) or os.path.islink(file_path):
-                    os.unlink(file_path)
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path)
-            except Exception as e:
-                logging.error('Failed to delete {file_path}. Reason: {e}')
-
-        os.environ['ATMOS_COMPONENTS_TERRAFORM_BASE_PATH'] = component.infra_terraform_dir
-        # Atmos requires stacks configuration even for vendoring.
-        # Set defaults so vendoring works without a full atmos.yaml.
-        for var, default in [('ATMOS_STACKS_BASE_PATH', 'stacks'),
-                             ('ATMOS_STACKS_INCLUDED_PATHS', 'orgs/**/*'),
-                             ('ATMOS_STACKS_NAME_PATTERN', '{tenant}-{environment}-{stage}')]:
-            if var not in os.environ:
-                os.environ[var] = default
+                response = subprocess.run(command, input=stdin, capture_output=True, cwd=cwd, env=env, timeout=self.__timeout or None, check=False)
+            except subprocess.TimeoutExpired as error:
+                execution = ToolExecution(command, -1, time.monotonic() - started_at, error.stdout or b'', error.stderr or b'')
+                self.__record(execution)
+                raise ToolExecutionError(f"'{' '.join(command)}' timed out after {self.__timeout} seconds")
+
+            execution = ToolExecution(command, response.returncode, time.monotonic() - started_at, response.stdout or b'', response.stderr or b'')
+
+        self.__record(execution)
+
+        return execution
+
+    def log_statistics(self):
+        statistics: Dict[str, List[ToolExecution]] = {}
+
+        for execution in self.executions:
+            statistics.setdefault(execution.tool, []).append(execution)
+
+        for tool, executions in sorted(statistics.items()):
+            failed = len([execution for execution in executions if execution.returncode != 0])
+            duration = sum(execution.duration for execution in executions)
+            output_size = sum(execution.output_size for execution in executions)
+            logging.info(f"Tool '{tool}': {len(executions)} executions, {failed} failed, {duration:.2f}s total, {output_size} bytes of output")
+
+    def __get_semaphore(self, tool: str) -> threading.BoundedSemaphore:
+        with self.__lock:
+            if tool not in self.__semaphores:
+                self.__semaphores[tool] = threading.BoundedSemaphore(max(self.__concurrency, 1))
+
+            return self.__semaphores[tool]
+
+    def __record(self, execution: ToolExecution):
+        logging.debug(f"Finished: {execution}")
+
+        with self.__lock:
+            self.__executions.append(execution)
+
+    def atmos_vendor_component(self, component: AtmosComponent):
+        self.__clean_component_dir(component)
+
         command = ["atmos", "vendor", "pull", "-c", component.name]
 
         logging.info(f"Executing '{' '.join(command)}' for component version '{component.version}' ... ")
 
-        response = subprocess.run(command, capture_output=True, cwd=component.infra_repo_dir, check=False)
+        response = self.run(command, cwd=component.infra_repo_dir, env=self.__build_atmos_env(component.infra_terraform_dir))
 
         if response.returncode != 0:
-            # atmos doesn't report error to stderr
-            error_message = response.stderr.decode("utf-8") if response.stderr else response.stdout.decode("utf-8")
+            error_message = response.error_message
             logging.error(error_message)
             logging.debug(f"Component: {component}")
             # log to debug the file at infra_terraform_dir/component.name/component.yaml
@@ -61,12 +122,117 @@ class ToolsManager:
 
         logging.info(f"Successfully vendored component: {component.name}")
 
+    def atmos_vendor_components(self, components: List[AtmosComponent]) -> Dict[str, Optional[ToolExecutionError]]:
+        """Vendors components with a single 'atmos vendor pull' using a generated vendor manifest.
+
+        Components that use mixins, or that were not vendored by the batch run, are vendored one by one
+        with 'atmos_vendor_component' to get an error for each of them.
+        Returns vendoring error (or None on success) for each component keyed by component file.
+        """
+        results: Dict[str, Optional[ToolExecutionError]] = {}
+        batch = [component for component in components if not component.has_mixins]
+        batch_succeeded = False
+
+        if batch:
+            # atmos runs from the infra repo of the first component, the manifest is placed next to it,
+            # so targets are relative both to the working dir and to the manifest
+            working_dir = batch[0].infra_repo_dir
+            manifest_file = os.path.join(working_dir, VENDOR_MANIFEST)
+            io.serialize_to_yaml_file(manifest_file, self.build_vendor_manifest(batch, working_dir))
+
+            for component in batch:
+                self.__clean_component_dir(component)
+
+            env = self.__build_atmos_env(batch[0].infra_terraform_dir)
+            env['ATMOS_VENDOR_BASE_PATH'] = VENDOR_MANIFEST
+
+            command = ["atmos", "vendor", "pull"]
+
+            logging.info(f"Executing '{' '.join(command)}' for {len(batch)} components ... ")
+
+            try:
+                response = self.run(command, cwd=working_dir, env=env)
+                batch_succeeded = response.returncode == 0
+
+                if not batch_succeeded:
+                    logging.warning(f"Batch vendoring failed, vendoring components one by one: {response.error_message}")
+            except ToolExecutionError as error:
+                logging.warning(f"Batch vendoring failed, vendoring components one by one: {error.message}")
+            finally:
+                os.remove(manifest_file)
+
+        for component in components:
+            if batch_succeeded and component in batch and self.__is_component_dir_populated(component):
+                logging.info(f"Successfully vendored component: {component.name}")
+                results[component.component_file] = None
+                continue
+
+            try:
+                self.atmos_vendor_component(component)
+                results[component.component_file] = None
+            except ToolExecutionError as error:
+                results[component.component_file] = error
+
+        return results
+
+    def build_vendor_manifest(self, components: List[AtmosComponent], manifest_dir: str) -> dict:
+        sources = []
+
+        for index, component in enumerate(components):
+            source = component.source
+            # component names have to be unique within the manifest, while the same component might be vendored in several versions
+            vendor_source = {
+                'component': f'{component.normalized_name}-{index}',
+                'source': source.get('uri'),
+                'version': component.raw_version,
+                'targets': [os.path.relpath(component.component_dir, manifest_dir)],
+            }
+
+            for key in ('included_paths', 'excluded_paths'):
+                if source.get(key):
+                    vendor_source[key] = source.get(key)
+
+            sources.append(vendor_source)
+
+        return {
+            'apiVersion': 'atmos/v1',
+            'kind': 'AtmosVendorConfig',
+            'metadata': {
+                'name': 'component-updater',
+                'description': 'Components vendored by atmos component updater',
+            },
+            'spec': {
+                'sources': sources,
+            },
+        }
+
+    def __clean_component_dir(self, component: AtmosComponent):
+        # Delete all files in the component folder except the component.yaml file
+        # Until atmos issue would be solved https://github.com/cloudposse/atmos/issues/821
+        try:
+            io.remove_dir_content(component.component_dir, [os.path.basename(component.component_file)])
+        except Exception as e:
+            logging.error(f'Failed to clean {component.component_dir}. Reason: {e}')
+
+    def __is_component_dir_populated(self, component: AtmosComponent) -> bool:
+        return any(filename != os.path.basename(component.component_file) for filename in os.listdir(component.component_dir))
+
+    def __build_atmos_env(self, infra_terraform_dir: str) -> Dict[str, str]:
+        env = dict(os.environ)
+        env['ATMOS_COMPONENTS_TERRAFORM_BASE_PATH'] = infra_terraform_dir
+        # Atmos requires stacks configuration even for vendoring.
+        # Set defaults so vendoring works without a full atmos.yaml.
+        for var, default in [('ATMOS_STACKS_BASE_PATH', 'stacks'),
+                             ('ATMOS_STACKS_INCLUDED_PATHS', 'orgs/**/*'),
+                             ('ATMOS_STACKS_NAME_PATTERN', '{tenant}-{environment}-{stage}')]:
+            env.setdefault(var, default)
+
+        return env
+
     def diff(self, file1: str, file2: str):
         command = ["diff", file1, file2]
 
-        logging.debug(f"Executing: '{' '.join(command)}' ... ")
-
-        response = subprocess.run(command, capture_output=True, check=False)
+        response = self.run(command)
 
         if response.returncode != 0:
             error_message = response.stderr.decode("utf-8")
@@ -79,9 +245,7 @@ class ToolsManager:
     def go_getter_pull_component_repo(self, component: AtmosComponent, destination_dir: str, download_dir: str):
         command = [self.__go_getter_tool, component.uri_repo, destination_dir]
 
-        logging.debug(f"Executing: '{' '.join(command)}' ... ")
-
-        response = subprocess.run(command, capture_output=True, cwd=download_dir, check=False)
+        response = self.run(command, cwd=download_dir)
 
         if response.returncode != 0:
             error_message = response.stderr.decode("utf-8")
@@ -89,29 +253,93 @@ class ToolsManager:
 
         logging.debug(f"Pulled whole component repo successfully: {component.uri_repo}")
 
-    def git_get_latest_tag(self, git_dir: str):
-        command = ["git", "for-each-ref", "--sort=-version:refname", "--format", "'%(refname:short)'", "refs/tags"]
+    def git_partial_clone_component_repo(self, component: AtmosComponent, destination_dir: str, download_dir: str):
+        """Clones component repo without file contents and checks out only the component's 'uri_path'.
 
-        logging.debug(f"Executing: '{' '.join(command)}' ... ")
+        Blobs are fetched lazily by git, so files of other paths or tags are downloaded only when they are checked out.
+        Repo that was already cloned during the run only gets 'uri_path' added to its sparse checkout.
+        """
+        repo_dir = os.path.join(download_dir, destination_dir)
+
+        if not self.is_git_repo(repo_dir):
+            url = self.build_git_url(component.uri_repo)
+            self.__run_git(["git", "clone", "--filter=blob:none", "--sparse", url, destination_dir], download_dir)
+
+        self.__run_git(["git", "sparse-checkout", "add", component.uri_path.strip('/')], repo_dir)
+
+        logging.debug(f"Partially cloned component repo successfully: {component.uri_repo}//{component.uri_path}")
+
+    def build_git_url(self, uri_repo: str) -> str:
+        # go-getter forced getter, e.g. 'git::https://github.com/cloudposse/terraform-aws-components.git'
+        url = uri_repo.split('::', 1)[1] if '::' in uri_repo else uri_repo
+
+        # go-getter detects GitHub shorthand, e.g. 'github.com/cloudposse/terraform-aws-components.git'
+        if url.startswith('github.com/'):
+            url = f'https://{url}'
+
+        return url
 
-        response = subprocess.run(command, capture_output=True, cwd=git_dir, check=False)
+    def __run_git(self, command: List[str], cwd: str):
+        response = self.run(command, cwd=cwd)
+
+        if response.returncode != 0:
+            raise ToolExecutionError(response.stderr.decode("utf-8"))
+
+    def git_get_tag_index(self, git_dir: str) -> Optional[TagIndex]:
+        command = ["git", "for-each-ref", "--format", "%(refname:short)", "refs/tags"]
+
+        response = self.run(command, cwd=git_dir)
 
         if response.returncode != 0:
             error_message = response.stderr.decode("utf-8")
             logging.error(error_message)
             return None
 
-        tags = response.stdout.decode().split("\n")
-        for tag in tags:
-            try:
-                normalized_tag = tag.strip("'").strip('v')
-                semver.parse(normalized_tag)
-                return tag.strip("'")
-            except Exception as e:
-                logging.info(f"{e}")
-                continue
+        tag_index = TagIndex(response.stdout.decode().split("\n"))
+
+        logging.debug(f"Indexed tags in '{git_dir}': {tag_index}")
+
+        return tag_index
+
+    def git_ls_remote_tag_index(self, uri_repo: str) -> Optional[TagIndex]:
+        """Indexes tags of remote repo without fetching it. Returns None if 'uri_repo' is not a reachable git repo"""
+        command = ["git", "ls-remote", "--tags", "--refs", self.build_git_url(uri_repo)]
+
+        response = self.run(command, env=dict(os.environ, GIT_TERMINAL_PROMPT='0'))
+
+        if response.returncode != 0:
+            logging.debug(f"Failed to list remote tags of '{uri_repo}': {response.stderr.decode('utf-8')}")
+            return None
 
-        return None
+        # e.g. '<sha>\trefs/tags/1.2.3'
+        tags = [line.split('refs/tags/', 1)[1] for line in response.stdout.decode().split("\n") if 'refs/tags/' in line]
+        tag_index = TagIndex(tags)
+
+        logging.debug(f"Indexed remote tags of '{uri_repo}': {tag_index}")
+
+        return tag_index
+
+    def git_fetch_tags(self, git_dir: str) -> bool:
+        response = self.run(["git", "fetch", "--tags", "--force", "--quiet"], cwd=git_dir, env=dict(os.environ, GIT_TERMINAL_PROMPT='0'))
+
+        if response.returncode != 0:
+            logging.error(response.error_message)
+            return False
+
+        return True
+
+    def git_pull(self, git_dir: str) -> bool:
+        response = self.run(["git", "pull", "--ff-only", "--quiet"], cwd=git_dir, env=dict(os.environ, GIT_TERMINAL_PROMPT='0'))
+
+        if response.returncode != 0:
+            logging.error(response.error_message)
+            return False
+
+        return True
+
+    def git_get_latest_tag(self, git_dir: str):
+        tag_index = self.git_get_tag_index(git_dir)
+        return tag_index.latest if tag_index else None
 
     def is_git_repo(self, repo_dir: str) -> bool:
         return os.path.exists(os.path.join(repo_dir, '.git'))
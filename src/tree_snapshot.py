@@ -0,0 +1,106 @@
+import os
+from typing import Dict, FrozenSet, Iterator, Optional
+from utils import io
+
+
+class TreeEntry:
+    """File captured by a snapshot. Content hash is computed on first use and cached"""
+
+    def __init__(self, path: str, relative_path: str, size: int, mode: int):
+        self.__path = path
+        self.__relative_path = relative_path
+        self.__size = size
+        self.__mode = mode
+        self.__hash: Optional[str] = None
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    @property
+    def relative_path(self) -> str:
+        return self.__relative_path
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    @property
+    def mode(self) -> int:
+        return self.__mode
+
+    @property
+    def hash(self) -> str:
+        if self.__hash is None:
+            self.__hash = io.calc_file_md5_hash(self.__path)
+
+        return self.__hash
+
+    def has_same_content(self, other: 'TreeEntry') -> bool:
+        # sizes are known from the scan, so files of different size are never read
+        return self.__size == other.size and self.hash == other.hash
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(relative_path={self.__relative_path!r}, size={self.__size}, mode={oct(self.__mode)})"
+
+
+class TreeSnapshot:
+    """Files of a directory tree captured with a single 'os.scandir' pass.
+
+    Paths are relative to the root dir. Hidden files and directories are skipped, same as 'glob' does.
+    The snapshot is not updated when the tree changes afterwards.
+    """
+
+    def __init__(self, root_dir: str):
+        self.__root_dir = root_dir
+        self.__entries: Dict[str, TreeEntry] = {}
+
+        if os.path.isdir(root_dir):
+            self.__scan(root_dir, '')
+
+        self.__paths: FrozenSet[str] = frozenset(self.__entries)
+
+    @property
+    def root_dir(self) -> str:
+        return self.__root_dir
+
+    @property
+    def paths(self) -> FrozenSet[str]:
+        return self.__paths
+
+    def get(self, relative_path: str) -> Optional[TreeEntry]:
+        return self.__entries.get(relative_path)
+
+    def changed_paths(self, other: 'TreeSnapshot') -> FrozenSet[str]:
+        """Paths present in both snapshots whose content differs"""
+        return frozenset(path for path in self.__paths & other.paths if not self.__entries[path].has_same_content(other.get(path)))
+
+    def __contains__(self, relative_path: str) -> bool:
+        return relative_path in self.__entries
+
+    def __iter__(self) -> Iterator[TreeEntry]:
+        return iter(self.__entries.values())
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __scan(self, dir_path: str, relative_dir: str):
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+
+                relative_path = os.path.join(relative_dir, entry.name) if relative_dir else entry.name
+
+                try:
+                    if entry.is_dir():
+                        self.__scan(entry.path, relative_path)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        self.__entries[relative_path] = TreeEntry(entry.path, relative_path, stat.st_size, stat.st_mode)
+                except FileNotFoundError:
+                    # removed while scanning
+                    continue
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(root_dir={self.__root_dir!r}, files={len(self.__entries)})"
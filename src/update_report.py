@@ -0,0 +1,80 @@
+import os
+import json
+import threading
+from typing import List
+from utils import io
+
+
+class UpdateReportWriter:
+    """NDJSON report of component update outcomes, one JSON record per line.
+
+    The report is started from scratch on 'open' and every record is flushed as soon as it's written,
+    so consumers can follow the report while the run goes.
+    """
+
+    def __init__(self, report_file: str):
+        self.__report_file = report_file
+        self.__file = None
+        self.__num_records = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def num_records(self) -> int:
+        return self.__num_records
+
+    def open(self):
+        io.create_dirs(os.path.dirname(os.path.abspath(self.__report_file)))
+        self.__file = open(self.__report_file, "w", encoding="utf-8")  # pylint: disable=consider-using-with
+        self.__num_records = 0
+
+    def write(self, record: dict):
+        with self.__lock:
+            self.__file.write(json.dumps(record) + "\n")
+            self.__file.flush()
+            self.__num_records += 1
+
+    def close(self):
+        if self.__file:
+            self.__file.close()
+            self.__file = None
+
+    def __enter__(self) -> 'UpdateReportWriter':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class AffectedComponentsWriter:
+    """JSON list of affected components that is rewritten on every new component.
+
+    The list is replaced atomically, so readers never see a partially written file, and it always holds
+    components affected so far, also when the run is killed.
+    """
+
+    def __init__(self, affected_components_file: str):
+        self.__affected_components_file = affected_components_file
+        self.__affected: List[str] = []
+        self.__lock = threading.Lock()
+        self.__save()
+
+    @property
+    def affected(self) -> List[str]:
+        with self.__lock:
+            return list(self.__affected)
+
+    def add(self, component_name: str):
+        with self.__lock:
+            if component_name in self.__affected:
+                return
+
+            self.__affected.append(component_name)
+            self.__save()
+
+    def __save(self):
+        io.create_dirs(os.path.dirname(os.path.abspath(self.__affected_components_file)))
+
+        tmp_file = f"{self.__affected_components_file}.tmp"
+        io.serialize_to_json_file(tmp_file, self.__affected)
+        os.replace(tmp_file, self.__affected_components_file)
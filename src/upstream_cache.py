@@ -0,0 +1,108 @@
+import os
+import logging
+import threading
+from typing import Dict, List, Optional
+from atmos_component import AtmosComponent
+from tools_manager import ToolsManager
+from tag_index import TagIndex
+from config import Config, FETCH_MODE_PARTIAL_CLONE
+from workspace_manager import WorkspaceManager
+from tag_resolver import GitHubTagResolver
+
+
+class UpstreamCache:
+    """Component repos fetched during the run and their tag indexes.
+
+    Every upstream repo is fetched and indexed once, no matter how many components point to it.
+    'refresh' brings already fetched repos up to date, so the cache can be kept warm between runs.
+    With a tag resolver, 'prefetch' indexes tags of many GitHub repos at once and such repos are not fetched at all.
+    """
+
+    def __init__(self, tools_manager: ToolsManager, config: Config, workspace_manager: WorkspaceManager, tag_resolver: Optional[GitHubTagResolver] = None):
+        self.__tools_manager = tools_manager
+        self.__tag_resolver = tag_resolver
+        self.__config = config
+        self.__workspace_manager = workspace_manager
+        self.__tag_indexes: Dict[str, Optional[TagIndex]] = {}
+        self.__repo_dirs: Dict[str, str] = {}
+        self.__lock = threading.RLock()
+
+    @property
+    def num_repos(self) -> int:
+        return len(self.__tag_indexes)
+
+    def get_tag_index(self, component: AtmosComponent) -> Optional[TagIndex]:
+        """Fetches component repo and indexes its tags once. Returns None if component repo is not a git repo"""
+        with self.__lock:
+            if component.uri_repo in self.__tag_indexes:
+                return self.__tag_indexes[component.uri_repo]
+
+            if self.__config.plan and not self.__config.skip_component_repo_fetching:
+                # plan mode needs tags only, listing them remotely is much cheaper than fetching the repo
+                tag_index = self.__tools_manager.git_ls_remote_tag_index(component.uri_repo)
+
+                if tag_index is not None:
+                    self.__tag_indexes[component.uri_repo] = tag_index
+                    return tag_index
+
+            repo_dir = self.__fetch_component_repo(component) if not self.__config.skip_component_repo_fetching else self.__get_components_download_dir()
+
+            self.__repo_dirs[component.uri_repo] = repo_dir
+            self.__tag_indexes[component.uri_repo] = self.__index_repo(repo_dir)
+
+            return self.__tag_indexes[component.uri_repo]
+
+    def prefetch(self, uri_repos: List[str]):
+        """Indexes tags of not yet indexed repos with the tag resolver. Repos it can't resolve are fetched with git on first use"""
+        if not self.__tag_resolver:
+            return
+
+        with self.__lock:
+            uri_repos = [uri_repo for uri_repo in dict.fromkeys(uri_repos) if uri_repo and uri_repo not in self.__tag_indexes]
+
+        if not uri_repos:
+            return
+
+        tag_indexes = self.__tag_resolver.resolve(uri_repos)
+
+        with self.__lock:
+            for uri_repo, tag_index in tag_indexes.items():
+                self.__tag_indexes.setdefault(uri_repo, tag_index)
+
+    def refresh(self):
+        """Fetches new tags of already fetched repos. Repos indexed remotely are listed again on next use"""
+        with self.__lock:
+            for uri_repo in list(self.__tag_indexes.keys()):
+                repo_dir = self.__repo_dirs.get(uri_repo)
+
+                if repo_dir is None:
+                    del self.__tag_indexes[uri_repo]
+                    continue
+
+                if self.__tag_indexes[uri_repo] is None:
+                    continue
+
+                if not self.__config.skip_component_repo_fetching and not self.__tools_manager.git_fetch_tags(repo_dir):
+                    logging.warning(f"Failed to fetch new tags of '{uri_repo}'. It will be fetched again")
+                    del self.__tag_indexes[uri_repo]
+                    continue
+
+                self.__tag_indexes[uri_repo] = self.__index_repo(repo_dir)
+
+    def __index_repo(self, repo_dir: str) -> Optional[TagIndex]:
+        if not self.__tools_manager.is_git_repo(repo_dir):
+            return None
+
+        return self.__tools_manager.git_get_tag_index(repo_dir) or TagIndex([])
+
+    def __fetch_component_repo(self, component: AtmosComponent):
+        normalized_repo_path = component.uri_repo.replace('/', '-') if component.uri_repo else ''
+        components_download_dir = self.__get_components_download_dir()
+        if self.__config.fetch_mode == FETCH_MODE_PARTIAL_CLONE:
+            self.__tools_manager.git_partial_clone_component_repo(component, normalized_repo_path, components_download_dir)
+        else:
+            self.__tools_manager.go_getter_pull_component_repo(component, normalized_repo_path, components_download_dir)
+        return os.path.join(components_download_dir, normalized_repo_path)
+
+    def __get_components_download_dir(self) -> str:
+        return self.__config.components_download_dir or self.__workspace_manager.get('components')
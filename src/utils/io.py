@@ -4,6 +4,7 @@ import tempfile
 import shutil
 import glob
 import hashlib
+import yaml
 
 
 def save_string_to_file(file, string):
@@ -34,6 +35,21 @@ def copy_dirs(src_dir, dst_dir):
     shutil.copytree(src_dir, dst_dir, dirs_exist_ok=True)
 
 
+def remove_dir_content(dir_path: str, exclude=None):
+    exclude = exclude or []
+
+    for filename in os.listdir(dir_path):
+        if filename in exclude:
+            continue
+
+        file_path = os.path.join(dir_path, filename)
+
+        if os.path.isfile(file_path) or os.path.islink(file_path):
+            os.unlink(file_path)
+        elif os.path.isdir(file_path):
+            shutil.rmtree(file_path)
+
+
 def create_tmp_dir():
     return tempfile.mkdtemp()
 
@@ -61,3 +77,26 @@ def append_line_to_file(file_name, line):
 def serialize_to_json_file(file_path, data, indent=4):
     with open(file_path, "w", encoding="utf-8") as file:
         json.dump(data, file, indent=indent)
+
+
+def serialize_to_yaml_file(file_path, data):
+    with open(file_path, "w", encoding="utf-8") as file:
+        yaml.safe_dump(data, file, sort_keys=False)
+
+
+def get_dir_size(dir_path: str) -> int:
+    size = 0
+
+    for root, _, files in os.walk(dir_path):
+        for file in files:
+            try:
+                size += os.lstat(os.path.join(root, file)).st_size
+            except FileNotFoundError:
+                pass
+
+    return size
+
+
+def read_yaml_file(file_path):
+    with open(file_path, "r", encoding="utf-8") as file:
+        return yaml.safe_load(file)
@@ -1,5 +1,7 @@
 import re
-from typing import List
+import logging
+import threading
+from typing import Any, Callable, List
 
 
 def parse_comma_or_new_line_separated_list(items: str) -> List[str]:
@@ -12,3 +14,40 @@ def parse_comma_or_new_line_separated_list(items: str) -> List[str]:
                 results.append(item)
 
     return results
+
+
+class LazyValue:
+    """Value that is loaded on first use. 'prefetch' starts loading it in background, so first use only waits for the rest of it"""
+
+    def __init__(self, loader: Callable[[], Any]):
+        self.__loader = loader
+        self.__lock = threading.Lock()
+        self.__loaded = False
+        self.__value = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__loaded
+
+    def get(self) -> Any:
+        with self.__lock:
+            if not self.__loaded:
+                self.__value = self.__loader()
+                self.__loaded = True
+
+            return self.__value
+
+    def prefetch(self):
+        threading.Thread(target=self.__prefetch, daemon=True).start()
+
+    def reset(self):
+        with self.__lock:
+            self.__loaded = False
+            self.__value = None
+
+    def __prefetch(self):
+        try:
+            self.get()
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            # loading is retried on first use, which reports the error
+            logging.debug(f"Failed to prefetch value: {error}")
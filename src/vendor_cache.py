@@ -0,0 +1,80 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Optional
+from atmos_component import AtmosComponent
+from workspace_manager import WorkspaceManager
+from utils import io
+
+
+class VendorCache:
+    """Vendored component trees keyed by component source, so the same source is vendored once per run.
+
+    Files pulled from upstream are fully defined by 'spec.source' of 'component.yaml', so they can be reused by
+    other components with the same source, including components of other infra repos. Vendoring clears component
+    dir first, so the stored tree holds only upstream files, and 'restore' clears component dir the same way.
+    Components with mixins are not cached, because mixins are vendored from their own sources.
+    """
+
+    def __init__(self, workspace_manager: WorkspaceManager):
+        self.__workspace_manager = workspace_manager
+        self.__lock = threading.Lock()
+        self.__num_hits = 0
+        self.__num_misses = 0
+
+    @property
+    def num_hits(self) -> int:
+        return self.__num_hits
+
+    def get_key(self, component: AtmosComponent) -> Optional[str]:
+        if component.has_mixins:
+            return None
+
+        return hashlib.sha256(json.dumps(component.source, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def restore(self, component: AtmosComponent) -> bool:
+        """Replaces component dir content with cached upstream files. Returns False if component source wasn't vendored yet"""
+        cache_dir = self.__get_cache_dir(component)
+
+        if not cache_dir or not os.path.isdir(cache_dir):
+            with self.__lock:
+                self.__num_misses += 1
+            return False
+
+        # same as vendoring, files of the previous version must not survive, so files removed upstream are detected
+        io.remove_dir_content(component.component_dir, [os.path.basename(component.component_file)])
+        io.copy_dirs(cache_dir, component.component_dir)
+
+        with self.__lock:
+            self.__num_hits += 1
+
+        logging.info(f"Reused vendored tree of component '{component.name}' version '{component.version}'")
+
+        return True
+
+    def store(self, component: AtmosComponent):
+        """Stores upstream files of freshly vendored component, unless its source is cached already"""
+        cache_dir = self.__get_cache_dir(component)
+
+        if not cache_dir or os.path.isdir(cache_dir):
+            return
+
+        # copied aside and renamed, so concurrent readers never see partially copied tree
+        tmp_dir = f"{cache_dir}.{threading.get_ident()}.tmp"
+        shutil.copytree(component.component_dir, tmp_dir, ignore=shutil.ignore_patterns(os.path.basename(component.component_file)))
+
+        try:
+            os.rename(tmp_dir, cache_dir)
+        except OSError:
+            # stored by another thread in the meantime
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def log_statistics(self):
+        logging.info(f"Vendor cache: {self.__num_hits} hits, {self.__num_misses} misses")
+
+    def __get_cache_dir(self, component: AtmosComponent) -> Optional[str]:
+        key = self.get_key(component)
+        return os.path.join(self.__workspace_manager.get('vendored'), key) if key else None
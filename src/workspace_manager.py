@@ -0,0 +1,242 @@
+import os
+import fcntl
+import shutil
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from utils import io
+
+RUN_DIR_PREFIX = 'component-updater-'
+OWNER_FILE = 'owner.pid'
+
+
+class Workspace:
+    def __init__(self, path: str, sequence: int, name: Optional[str] = None):
+        self.path: str = path
+        self.sequence: int = sequence
+        self.name: Optional[str] = name
+        self.retained: bool = False
+        self.pinned: bool = False
+        self.size: Optional[int] = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path={self.path!r}, name={self.name!r}, retained={self.retained}, pinned={self.pinned}, size={self.size})"
+
+
+class WorkspaceManager:
+    """Owns scratch directories of a run.
+
+    All workspaces live under a single run directory that is removed by 'cleanup'. Workspaces created within
+    'scope' are released when the scope exits, unless they were retained. Released directories are emptied and
+    reused by later workspaces. Retained workspaces are kept until the end of the run, but the oldest of them are
+    evicted when disk usage exceeds the quota. Pinned workspaces are never evicted.
+
+    Every run holds a lock on the owner file of its run directory. Run directories whose owner file isn't locked
+    were left by runs that crashed and are removed on start. Unlike process ids, locks are visible across
+    containers sharing the workspace dir.
+    """
+
+    def __init__(self, root_dir: str = '', quota: int = 0):
+        self.__root_dir = root_dir or tempfile.gettempdir()
+        self.__quota = quota
+        self.__lock = threading.Lock()
+        self.__workspaces: Dict[str, Workspace] = {}
+        self.__named_workspaces: Dict[str, Workspace] = {}
+        self.__free_dirs: List[str] = []
+        self.__scopes: List[List[Workspace]] = []
+        self.__sequence = 0
+        self.__num_created = 0
+        self.__num_reused = 0
+        self.__num_evicted = 0
+        self.__peak_usage = 0
+
+        io.create_dirs(self.__root_dir)
+        self.__remove_stale_run_dirs()
+
+        self.__run_dir = tempfile.mkdtemp(prefix=RUN_DIR_PREFIX, dir=self.__root_dir)
+        # lock is held for the life of the process and is released by the OS when the process dies
+        self.__owner_file = open(os.path.join(self.__run_dir, OWNER_FILE), "w", encoding="utf-8")  # pylint: disable=consider-using-with
+        fcntl.flock(self.__owner_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.__owner_file.write(str(os.getpid()))
+        self.__owner_file.flush()
+
+    @property
+    def run_dir(self) -> str:
+        return self.__run_dir
+
+    @property
+    def peak_usage(self) -> int:
+        return self.__peak_usage
+
+    @property
+    def num_evicted(self) -> int:
+        return self.__num_evicted
+
+    def create(self) -> str:
+        with self.__lock:
+            if self.__free_dirs:
+                path = self.__free_dirs.pop()
+                self.__num_reused += 1
+            else:
+                path = tempfile.mkdtemp(dir=self.__run_dir)
+                self.__num_created += 1
+
+            workspace = self.__register(path)
+
+            if self.__scopes:
+                self.__scopes[-1].append(workspace)
+
+            return path
+
+    def get(self, name: str) -> str:
+        """Workspace shared by the whole run, e.g. download dir of component repos"""
+        with self.__lock:
+            if name not in self.__named_workspaces:
+                path = os.path.join(self.__run_dir, name)
+                io.create_dirs(path)
+                self.__named_workspaces[name] = self.__register(path, name)
+
+            return self.__named_workspaces[name].path
+
+    def retain(self, path: str):
+        """Keeps workspace after its scope exits. Retained workspaces can be evicted when quota is exceeded"""
+        with self.__lock:
+            workspace = self.__workspaces.get(path)
+
+            if workspace:
+                workspace.retained = True
+                workspace.size = io.get_dir_size(path)
+
+    def pin(self, path: str):
+        """Keeps workspace after its scope exits and protects it from eviction until it's unpinned or released"""
+        with self.__lock:
+            workspace = self.__workspaces.get(path)
+
+            if workspace:
+                workspace.retained = True
+                workspace.pinned = True
+
+    def unpin(self, path: str):
+        """Turns pinned workspace into a retained one"""
+        with self.__lock:
+            workspace = self.__workspaces.get(path)
+
+            if workspace:
+                workspace.pinned = False
+                workspace.size = io.get_dir_size(path)
+
+    def release(self, path: str):
+        with self.__lock:
+            self.__release(path)
+
+    @contextmanager
+    def scope(self) -> Iterator[None]:
+        with self.__lock:
+            self.__scopes.append([])
+
+        try:
+            yield
+        finally:
+            with self.__lock:
+                workspaces = self.__scopes.pop()
+                # scope exit is when most of workspaces exist, so it's a good place to measure usage
+                self.__update_usage()
+
+                for workspace in workspaces:
+                    if not workspace.retained:
+                        self.__release(workspace.path)
+
+                self.__enforce_quota()
+
+    def reset(self):
+        """Releases all workspaces except named ones, so a long-running process can start over with warm named workspaces"""
+        with self.__lock:
+            self.__update_usage()
+
+            for workspace in list(self.__workspaces.values()):
+                if not workspace.name:
+                    self.__release(workspace.path)
+
+    def cleanup(self):
+        with self.__lock:
+            self.__update_usage()
+            shutil.rmtree(self.__run_dir, ignore_errors=True)
+            self.__owner_file.close()
+            self.__workspaces.clear()
+            self.__named_workspaces.clear()
+            self.__free_dirs.clear()
+
+    def log_statistics(self):
+        logging.info(f"Workspaces: {self.__num_created} created, {self.__num_reused} reused, {self.__num_evicted} evicted, "
+                     f"peak disk usage {self.__peak_usage / 1024 / 1024:.2f}MB")
+
+    def __register(self, path: str, name: Optional[str] = None) -> Workspace:
+        self.__sequence += 1
+        workspace = Workspace(path, self.__sequence, name)
+        self.__workspaces[path] = workspace
+        return workspace
+
+    def __release(self, path: str):
+        workspace = self.__workspaces.get(path)
+
+        if not workspace or workspace.name:
+            return
+
+        del self.__workspaces[path]
+        io.remove_dir_content(path)
+        self.__free_dirs.append(path)
+
+    def __update_usage(self) -> int:
+        usage = 0
+
+        for workspace in self.__workspaces.values():
+            usage += workspace.size if workspace.size is not None else io.get_dir_size(workspace.path)
+
+        self.__peak_usage = max(self.__peak_usage, usage)
+
+        return usage
+
+    def __enforce_quota(self):
+        if self.__quota <= 0:
+            return
+
+        usage = self.__update_usage()
+
+        if usage <= self.__quota:
+            return
+
+        evictable = [workspace for workspace in self.__workspaces.values() if workspace.retained and not workspace.pinned]
+
+        for workspace in sorted(evictable, key=lambda workspace: workspace.sequence):
+            logging.info(f"Disk usage {usage} bytes exceeds quota of {self.__quota} bytes. Evicting workspace '{workspace.path}'")
+            usage -= workspace.size or 0
+            del self.__workspaces[workspace.path]
+            shutil.rmtree(workspace.path, ignore_errors=True)
+            self.__num_evicted += 1
+
+            if usage <= self.__quota:
+                return
+
+        logging.warning(f"Disk usage {usage} bytes exceeds quota of {self.__quota} bytes, but all workspaces are in use")
+
+    def __remove_stale_run_dirs(self):
+        for entry in os.scandir(self.__root_dir):
+            if not entry.is_dir() or not entry.name.startswith(RUN_DIR_PREFIX):
+                continue
+
+            try:
+                owner_file = open(os.path.join(entry.path, OWNER_FILE), "r+", encoding="utf-8")  # pylint: disable=consider-using-with
+            except OSError:
+                continue
+
+            with owner_file:
+                try:
+                    fcntl.flock(owner_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # owner run is still alive
+                    continue
+
+                logging.info(f"Removing workspaces left by previous run: '{entry.path}'")
+                shutil.rmtree(entry.path, ignore_errors=True)